@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # desligado por padrão (MiddlewareNotUsed); ver EPI_INSTRUMENTACAO abaixo
+    'epi_admin.middleware.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +53,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Instrumentação por requisição (header Server-Timing com consultas SQL e
+# tempos de view/template; log JSON das requisições acima do limite).
+EPI_INSTRUMENTACAO = os.environ.get('EPI_INSTRUMENTACAO') == '1'
+EPI_INSTRUMENTACAO_LIMITE_MS = int(os.environ.get('EPI_INSTRUMENTACAO_LIMITE_MS', '500'))
+
 ROOT_URLCONF = 'controle_epi.urls'
 
 TEMPLATES = [
@@ -73,12 +81,62 @@ WSGI_APPLICATION = 'controle_epi.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil escolhido por DJANGO_DB_PROFILE:
+# - sqlite (padrão): o db.sqlite3 de desenvolvimento, sem ajustes;
+# - sqlite-wal: SQLite para produção com alguns workers do gunicorn. WAL deixa
+#   leituras e a escrita em paralelo, transações IMMEDIATE pegam o lock de
+#   escrita no BEGIN (esperando até o busy_timeout em vez de falhar com
+#   "database is locked") e a conexão é reaproveitada entre requisições. Os
+#   PRAGMAs de EPI_SQLITE_PRAGMAS são aplicados a cada conexão nova
+#   (receiver de connection_created em epi_admin/signals.py);
+# - postgres: servidor PostgreSQL (requer psycopg), com conexões persistentes
+#   ou, com DJANGO_DB_POOL=1, o pool do psycopg (pip install "psycopg[pool]").
+DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'sqlite')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DJANGO_DB_NAME') or BASE_DIR / 'db.sqlite3',
     }
 }
+EPI_SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'sqlite-wal':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    })
+    EPI_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 20000,  # ms; mesmo valor do 'timeout' acima
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,  # negativo = KiB (64 MB por conexão)
+        'temp_store': 'MEMORY',
+    }
+elif DB_PROFILE == 'postgres':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DJANGO_DB_NAME', 'controle_epi'),
+        'USER': os.environ.get('DJANGO_DB_USER', 'controle_epi'),
+        'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+        'HOST': os.environ.get('DJANGO_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DJANGO_DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if os.environ.get('DJANGO_DB_POOL') == '1':
+        # o pool não convive com CONN_MAX_AGE: cada requisição devolve a conexão ao pool
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {'min_size': 2, 'max_size': int(os.environ.get('DJANGO_DB_POOL_MAX', '10'))},
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = 600
+elif DB_PROFILE != 'sqlite':
+    raise ValueError(f'DJANGO_DB_PROFILE inválido: {DB_PROFILE!r} (use sqlite, sqlite-wal ou postgres)')
 
 
 # Password validation
@@ -128,12 +186,66 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Authentication: allow login by email (custom backend) while keeping default backend
+# (ModelBackend with the session user and permissions cached, see epi_admin.auth_backends)
 AUTHENTICATION_BACKENDS = [
     'epi_admin.auth_backends.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
+    'epi_admin.auth_backends.CachedModelBackend',
 ]
 
+# Tempo máximo (segundos) que o usuário da sessão e suas permissões ficam no
+# cache; alterações feitas no mesmo processo invalidam na hora. Com vários
+# processos o cache precisa ser compartilhado (DJANGO_CACHE_DIR, abaixo): no
+# cache local, um usuário desativado continua valendo nos outros processos
+# por até esse tempo.
+EPI_AUTH_CACHE_TIMEOUT = 60
+
+# Segundos que um email de login desconhecido fica em cache negativo (0 desativa)
+EPI_LOGIN_NEGATIVE_CACHE_TIMEOUT = int(os.environ.get('EPI_LOGIN_NEGATIVE_CACHE_TIMEOUT', '0'))
+
+# Cache do Django (usuários da sessão, fragmentos das listas e detalhes).
+# Padrão: memória local de cada processo. Com vários workers, DJANGO_CACHE_DIR
+# usa um cache em arquivos, compartilhado pelos processos da máquina, para que
+# a invalidação alcance todos. Nos dois casos o número de
+# entradas é limitado (EPI_CACHE_MAX_ENTRIES); acima disso as mais antigas
+# são descartadas.
+_CACHE_OPTIONS = {'MAX_ENTRIES': int(os.environ.get('EPI_CACHE_MAX_ENTRIES', '5000')), 'CULL_FREQUENCY': 4}
+if os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+        'OPTIONS': _CACHE_OPTIONS,
+    }}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': _CACHE_OPTIONS,
+    }}
+
+# Segundos que um fragmento renderizado (epi_admin.fragmentos) fica em cache. As
+# alterações o invalidam na hora. 0 desativa o cache de fragmentos.
+EPI_FRAGMENTOS_TIMEOUT = int(os.environ.get('EPI_FRAGMENTOS_TIMEOUT', '300'))
+# O cache de fragmentos só é usado com um cache compartilhado (DJANGO_CACHE_DIR):
+# na memória local de cada processo a invalidação não alcança os outros, que
+# serviriam páginas antigas. Com um único processo (runserver, testes),
+# EPI_FRAGMENTOS_CACHE_LOCAL=1 o liga também na memória local.
+EPI_FRAGMENTOS_CACHE_LOCAL = os.environ.get('EPI_FRAGMENTOS_CACHE_LOCAL') == '1'
+
+# Fila de tarefas em segundo plano (epi_admin.tarefas, manage.py run_worker): espera
+# antes da 1ª nova tentativa de uma tarefa que falhou (dobra a cada falha, até o
+# máximo) e tempo sem concluir após o qual uma tarefa em execução volta para a fila.
+EPI_TAREFAS_ESPERA = int(os.environ.get('EPI_TAREFAS_ESPERA', '30'))
+EPI_TAREFAS_ESPERA_MAXIMA = int(os.environ.get('EPI_TAREFAS_ESPERA_MAXIMA', '3600'))
+EPI_TAREFAS_TIMEOUT = int(os.environ.get('EPI_TAREFAS_TIMEOUT', '3600'))
+
 # Redirects after login/logout
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'  # after login go to root (redirects to colaborador list)
 LOGOUT_REDIRECT_URL = '/?logged_out=1'
+
+# Email (alertas de validade de EPI). Em desenvolvimento as mensagens vão para o console;
+# em produção defina DJANGO_EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend e EMAIL_HOST etc.
+EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DJANGO_DEFAULT_FROM_EMAIL', 'controle_epi@senai.sc.com')
+
+# Setor cujos gerentes recebem os alertas de itens em estoque vencendo (None = todos os gerentes)
+EPI_ALERTAS_ESTOQUE_SETOR = os.environ.get('EPI_ALERTAS_ESTOQUE_SETOR') or None
@@ -1,10 +1,23 @@
 from django.contrib import admin as django_admin
+from django.utils import timezone
+
 from controle_epi.admin_site import admin_site
-from .models import Colaborador, Gerente, EPI, Emprestimo
 
+from . import busca
+from .models import Colaborador, Gerente, EPI, Emprestimo, Tarefa
 
-class ColaboradorAdmin(django_admin.ModelAdmin):
-    list_display = ('id', 'nome', 'sobrenome', 'setor', 'cpf')
+
+class BuscaIndexadaAdmin(django_admin.ModelAdmin):
+    """Caixa de busca do admin pelo índice de epi_admin.busca em vez de icontains."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return busca.filtrar(queryset, search_term), False
+
+
+class ColaboradorAdmin(BuscaIndexadaAdmin):
+    list_display = ('id', 'nome', 'sobrenome', 'setor', 'cpf', 'emprestimos_abertos', 'emprestimos_total')
     search_fields = ('nome', 'sobrenome', 'cpf', 'setor')
 
 
@@ -13,20 +26,36 @@ class GerenteAdmin(django_admin.ModelAdmin):
     search_fields = ('nome', 'sobrenome', 'cpf', 'setor')
 
 
-class EPIAdmin(django_admin.ModelAdmin):
-    list_display = ('id', 'nomeAparelho', 'categoria', 'quantidade', 'validade')
+class EPIAdmin(BuscaIndexadaAdmin):
+    list_display = ('id', 'nomeAparelho', 'categoria', 'quantidade', 'validade', 'emprestimos_abertos', 'emprestimos_total')
     search_fields = ('nomeAparelho', 'categoria')
     list_filter = ('categoria',)
 
 
-class EmprestimoAdmin(django_admin.ModelAdmin):
+class EmprestimoAdmin(BuscaIndexadaAdmin):
     list_display = ('id', 'colaborador', 'epi_nome', 'data_emprestimo', 'data_devolucao')
     search_fields = ('colaborador__nome', 'epi_nome__nomeAparelho')
     list_filter = ('data_emprestimo', 'data_devolucao', 'data_prevista',)
 
 
+class TarefaAdmin(django_admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'tentativas', 'max_tentativas', 'executar_em', 'concluida_em', 'created_by')
+    list_filter = ('status', 'tipo')
+    readonly_fields = ('trabalhador', 'iniciada_em', 'concluida_em', 'resultado', 'erro', 'created_at', 'updated_at')
+    actions = ('repetir',)
+
+    @django_admin.action(description='Executar de novo as tarefas selecionadas')
+    def repetir(self, request, queryset):
+        agora = timezone.now()
+        n = queryset.exclude(status=Tarefa.EXECUTANDO).update(
+            status=Tarefa.PENDENTE, tentativas=0, executar_em=agora, trabalhador='', erro='', updated_at=agora,
+        )
+        self.message_user(request, f'{n} tarefa(s) de volta à fila.')
+
+
 # Register models with the custom admin site (so only superusers can access it)
 admin_site.register(Colaborador, ColaboradorAdmin)
 admin_site.register(Gerente, GerenteAdmin)
 admin_site.register(EPI, EPIAdmin)
 admin_site.register(Emprestimo, EmprestimoAdmin)
+admin_site.register(Tarefa, TarefaAdmin)
@@ -0,0 +1,159 @@
+"""Log de alterações (feed "mudanças desde o cursor") para sincronização incremental.
+
+Cada criação, alteração ou exclusão de Colaborador, EPI e Emprestimo grava
+uma linha em Alteracao, cuja chave é um número de sequência crescente:
+
+- ``save()``/``delete()`` pelos sinais post_save/post_delete;
+- as mudanças de estoque (``UPDATE`` de ``EPI.quantidade`` em
+  ``epi_admin.estoque``) e os caminhos em massa (lote de empréstimos,
+  importação, dados sintéticos), que não disparam sinais, chamando
+  ``registrar`` explicitamente.
+
+A linha é gravada na mesma transação da alteração: um rollback desfaz as
+duas. O feed (``pagina``) devolve as alterações depois de um cursor, em
+lotes, com os dados atuais de cada objeto lidos de uma vez por modelo; o
+custo de uma sincronização cresce com o número de alterações, não com o
+tamanho das tabelas.
+
+No SQLite a chave é AUTOINCREMENT e as escritas são serializadas, então a
+sequência segue a ordem dos commits. No PostgreSQL duas transações
+concorrentes podem fazer commit fora da ordem das chaves; um cliente que
+leia exatamente entre os dois commits pularia a alteração de número menor.
+"""
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from . import api
+from .models import Alteracao
+from .pagination import encode_cursor, janela_keyset
+
+
+CRIADO, ALTERADO, APAGADO = Alteracao.CRIADO, Alteracao.ALTERADO, Alteracao.APAGADO
+
+# recurso da API com os campos de cada modelo no feed
+RECURSOS = {recurso.model._meta.model_name: recurso for recurso in (api.COLABORADORES, api.EPIS, api.EMPRESTIMOS)}
+
+
+def _coluna(nome):
+    return connection.ops.quote_name(Alteracao._meta.get_field(nome).column)
+
+
+def registrar(model, ids, operacao):
+    """Grava ``operacao`` para cada chave de ``ids`` (objetos de ``model``).
+
+    Um INSERT com executemany, qualquer que seja o número de objetos.
+    """
+    ids = [pk for pk in ids if pk is not None]
+    if not ids:
+        return
+    modelo = model._meta.model_name
+    agora = connection.ops.adapt_datetimefield_value(timezone.now())
+    sql = 'INSERT INTO {} ({}) VALUES (%s, %s, %s, %s)'.format(
+        connection.ops.quote_name(Alteracao._meta.db_table),
+        ', '.join(_coluna(nome) for nome in ('modelo', 'objeto_id', 'operacao', 'created_at')),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(modelo, pk, operacao, agora) for pk in ids])
+
+
+def ultima_chave(model):
+    """Maior chave atual de ``model`` (0 se vazio), para ``registrar_inseridos``."""
+    return model._default_manager.aggregate(ultima=Max('pk'))['ultima'] or 0
+
+
+def registrar_inseridos(model, depois_de):
+    """Registra como criados os objetos de ``model`` com chave maior que ``depois_de``.
+
+    Para INSERTs diretos em massa, que não devolvem as chaves: um único
+    ``INSERT ... SELECT``, sem trazer as chaves para o Python. Chamar na mesma
+    transação dos INSERTs, com ``depois_de`` lido antes deles.
+    """
+    sql = 'INSERT INTO {} ({}) SELECT %s, {}, %s, %s FROM {} WHERE {} > %s ORDER BY {}'.format(
+        connection.ops.quote_name(Alteracao._meta.db_table),
+        ', '.join(_coluna(nome) for nome in ('modelo', 'objeto_id', 'operacao', 'created_at')),
+        connection.ops.quote_name(model._meta.pk.column),
+        connection.ops.quote_name(model._meta.db_table),
+        connection.ops.quote_name(model._meta.pk.column),
+        connection.ops.quote_name(model._meta.pk.column),
+    )
+    agora = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model._meta.model_name, CRIADO, agora, depois_de])
+
+
+def _consultas_dados(linhas):
+    """``(modelo, colunas, queryset)`` dos objetos das ``linhas`` que ainda podem existir; uma consulta por modelo."""
+    por_modelo = defaultdict(set)
+    for linha in linhas:
+        if linha['operacao'] != APAGADO:
+            por_modelo[linha['modelo']].add(linha['objeto_id'])
+    for modelo, ids in por_modelo.items():
+        recurso = RECURSOS[modelo]
+        colunas = recurso.colunas()
+        queryset = recurso.model._default_manager.filter(pk__in=ids)
+        yield modelo, colunas, queryset.values(*dict.fromkeys(['pk', *colunas.values()]))
+
+
+def _dados(modelo, colunas, valores):
+    return (modelo, valores['pk']), {campo: valores[coluna] for campo, coluna in colunas.items()}
+
+
+def _janela(limite, cursor):
+    queryset = Alteracao.objects.values('pk', 'modelo', 'objeto_id', 'operacao', 'created_at')
+    direcao, _, janela = janela_keyset(queryset, ('pk',), limite, cursor)
+    if direcao != 'n':
+        raise ValueError('cursor inválido')
+    return janela
+
+
+def _resultado(linhas, dados, limite, cursor):
+    has_more = len(linhas) > limite
+    linhas = linhas[:limite]
+    return {
+        'results': [
+            {
+                'seq': linha['pk'],
+                'modelo': linha['modelo'],
+                'id': linha['objeto_id'],
+                'operacao': linha['operacao'],
+                'created_at': linha['created_at'],
+                'dados': dados.get((linha['modelo'], linha['objeto_id'])),
+            }
+            for linha in linhas
+        ],
+        'next': encode_cursor('n', [linhas[-1]['pk']]) if linhas else cursor,
+        'has_more': has_more,
+    }
+
+
+def pagina(limite, cursor=None):
+    """Até ``limite`` alterações depois de ``cursor``, em ordem de sequência.
+
+    Retorna ``{"results", "next", "has_more"}``. ``next`` é o cursor para a
+    próxima chamada: a última alteração devolvida, ou o próprio ``cursor``
+    se não houver nada novo (o cliente guarda e repete mais tarde).
+    ``dados`` traz o estado *atual* do objeto (não o do momento da
+    alteração) ou None se ele já foi apagado. Levanta ValueError se o cursor
+    for inválido.
+    """
+    linhas = list(_janela(limite, cursor))
+    dados = dict(
+        _dados(modelo, colunas, valores)
+        for modelo, colunas, queryset in _consultas_dados(linhas[:limite])
+        for valores in queryset
+    )
+    return _resultado(linhas, dados, limite, cursor)
+
+
+async def apagina(limite, cursor=None):
+    """Versão assíncrona de ``pagina`` (ORM assíncrono)."""
+    linhas = [linha async for linha in _janela(limite, cursor)]
+    dados = {}
+    for modelo, colunas, queryset in _consultas_dados(linhas[:limite]):
+        async for valores in queryset:
+            chave, valor = _dados(modelo, colunas, valores)
+            dados[chave] = valor
+    return _resultado(linhas, dados, limite, cursor)
@@ -0,0 +1,162 @@
+"""API JSON somente leitura de colaboradores, EPIs e empréstimos (integração com o ERP).
+
+Cada recurso é uma lista paginada por chave (``pk``), no formato::
+
+    {"results": [{...}, ...], "next": "<cursor>" ou null}
+
+- ``?cursor=`` pede a página seguinte (o ``next`` da anterior); uma
+  sincronização completa percorre as páginas até ``next`` ser null;
+- ``?limit=`` define o tamanho da página (padrão API_LIMITE_PADRAO, no
+  máximo API_LIMITE_MAXIMO);
+- ``?fields=id,nome`` restringe os campos de cada linha (padrão: todos).
+
+Cada página custa uma consulta, que lê só as colunas dos campos pedidos
+(``values()``, com o JOIN das relações apenas quando algum campo delas é
+pedido) e sem COUNT. As linhas são serializadas e enviadas em stream à
+medida que saem do cursor do banco, sem instanciar os modelos.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Colaborador, EPI, Emprestimo
+from .pagination import encode_cursor, janela_keyset
+
+
+API_LIMITE_PADRAO = 100
+API_LIMITE_MAXIMO = 1000
+
+
+class Recurso:
+    """Um modelo exposto pela API: ``campos`` mapeia o nome público para a coluna (lookup de ``values()``)."""
+
+    def __init__(self, model, campos):
+        self.model = model
+        self.campos = campos
+
+    def colunas(self, fields=None):
+        """``{campo: coluna}`` dos campos pedidos em ``fields`` (texto separado por vírgulas).
+
+        Levanta ValueError com os campos desconhecidos.
+        """
+        if not fields:
+            return dict(self.campos)
+        nomes = [nome.strip() for nome in fields.split(',') if nome.strip()]
+        desconhecidos = [nome for nome in nomes if nome not in self.campos]
+        if desconhecidos or not nomes:
+            raise ValueError(
+                f"Campos inválidos: {', '.join(desconhecidos) or fields!r}. "
+                f"Disponíveis: {', '.join(self.campos)}."
+            )
+        return {nome: self.campos[nome] for nome in dict.fromkeys(nomes)}
+
+
+COLABORADORES = Recurso(Colaborador, {
+    'id': 'pk',
+    'nome': 'nome',
+    'sobrenome': 'sobrenome',
+    'setor': 'setor',
+    'cpf': 'cpf',
+    'is_ativo': 'is_ativo',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+})
+
+EPIS = Recurso(EPI, {
+    'id': 'pk',
+    'nomeAparelho': 'nomeAparelho',
+    'categoria': 'categoria',
+    'quantidade': 'quantidade',
+    'validade': 'validade',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+})
+
+EMPRESTIMOS = Recurso(Emprestimo, {
+    'id': 'pk',
+    'colaborador': 'colaborador_id',
+    'colaborador_nome': 'colaborador__nome',
+    'colaborador_sobrenome': 'colaborador__sobrenome',
+    'colaborador_cpf': 'colaborador__cpf',
+    'colaborador_setor': 'colaborador__setor',
+    'epi': 'epi_nome_id',
+    'epi_nome': 'epi_nome__nomeAparelho',
+    'epi_categoria': 'epi_nome__categoria',
+    'data_emprestimo': 'data_emprestimo',
+    'data_prevista': 'data_prevista',
+    'data_devolucao': 'data_devolucao',
+    'condicao_retirada': 'condicao_retirada',
+    'condicao_devolucao': 'condicao_devolucao',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+})
+
+
+def ler_limite(valor):
+    """Tamanho da página a partir de ``?limit=``; levanta ValueError se inválido."""
+    if not valor:
+        return API_LIMITE_PADRAO
+    erro = f'limit deve ser um inteiro entre 1 e {API_LIMITE_MAXIMO}.'
+    try:
+        limite = int(valor)
+    except ValueError:
+        raise ValueError(erro) from None
+    if not 1 <= limite <= API_LIMITE_MAXIMO:
+        raise ValueError(erro)
+    return limite
+
+
+def preparar_pagina(recurso, colunas, limite, cursor=None):
+    """QuerySet (não executado) da página: ``limite + 1`` linhas de ``values()``.
+
+    Levanta ValueError se o cursor for inválido. Só cursores de avanço são
+    aceitos: a API não devolve cursores de página anterior.
+    """
+    queryset = recurso.model._default_manager.values(*dict.fromkeys(['pk', *colunas.values()]))
+    direcao, _, janela = janela_keyset(queryset, ('pk',), limite, cursor)
+    if direcao != 'n':
+        raise ValueError('cursor inválido')
+    return janela
+
+
+def _abertura():
+    return '{"results":['
+
+
+def _linha(encoder, n, linha, colunas):
+    return (',' if n else '') + encoder.encode({campo: linha[coluna] for campo, coluna in colunas.items()})
+
+
+def _fechamento(encoder, ultima):
+    # ultima: chave da última linha enviada, se há uma próxima página
+    proximo = encode_cursor('n', [ultima]) if ultima is not None else None
+    return '],"next":%s}' % encoder.encode(proximo)
+
+
+def pagina_json(janela, colunas, limite, chunk_size=500):
+    """Gera o JSON da página em pedaços, linha a linha."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    yield _abertura()
+    ultima = None
+    for n, linha in enumerate(janela.iterator(chunk_size=chunk_size)):
+        if n == limite:
+            # a linha extra só indica que há uma próxima página
+            yield _fechamento(encoder, ultima)
+            return
+        yield _linha(encoder, n, linha, colunas)
+        ultima = linha['pk']
+    yield _fechamento(encoder, None)
+
+
+async def apagina_json(janela, colunas, limite, chunk_size=500):
+    """Versão assíncrona de ``pagina_json`` (``aiterator``), para servir em stream sob ASGI."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    yield _abertura()
+    ultima = None
+    n = 0
+    async for linha in janela.aiterator(chunk_size=chunk_size):
+        if n == limite:
+            yield _fechamento(encoder, ultima)
+            return
+        yield _linha(encoder, n, linha, colunas)
+        ultima = linha['pk']
+        n += 1
+    yield _fechamento(encoder, None)
@@ -17,6 +17,9 @@ class EpiAdminConfig(AppConfig):
         """
         logger = logging.getLogger(__name__)
 
+        # receivers que mantêm dados derivados (resumo do painel etc.)
+        from . import signals  # noqa: F401
+
         # Defer database setup until Django signals that apps are ready
         from django.core.management import call_command
         from django.db.models.signals import post_migrate
@@ -0,0 +1,103 @@
+"""Views assíncronas: listas, detalhes e a API JSON sob ASGI.
+
+Sob ASGI o Django roda cada view síncrona inteira na sua única thread
+síncrona, uma requisição por vez por processo. As views com estes mixins
+rodam no event loop:
+
+- o usuário vem de ``request.auser()`` (sessão e cache de usuários,
+  ``auth_backends.ausuario_em_cache``) e as permissões são verificadas com
+  ``ahas_perms``;
+- as consultas usam o ORM assíncrono (``aaggregate``, ``aget``,
+  ``aiterator``), que ocupa a thread síncrona só durante cada consulta;
+- o cache do Django (memória local ou arquivos locais) é lido direto, sem
+  passar pela thread: o ``BaseCache.aget`` só repassaria a chamada para ela.
+
+O que o Django ainda faz de forma síncrona — renderizar templates e montar a
+página numa falta do cache de fragmentos — vai para a thread com
+``sync_to_async``. Sob WSGI as mesmas views continuam funcionando (o Django
+as executa com ``async_to_sync``). ``manage.py benchmark_asgi`` compara os
+dois modos.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.mixins import AccessMixin
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404
+from django.views.generic.detail import SingleObjectMixin
+
+from . import fragmentos
+
+
+def em_asgi(request):
+    """Se a requisição veio de um servidor ASGI (e a resposta pode ser um stream assíncrono)."""
+    return isinstance(request, ASGIRequest)
+
+
+class LoginAssincronoMixin(AccessMixin):
+    """LoginRequiredMixin e, com ``permission_required``, PermissionRequiredMixin para views assíncronas.
+
+    O usuário lido com ``request.auser()`` fica também em ``request.user``,
+    para o código síncrono que vem depois (templates, context processors)
+    não buscá-lo de novo.
+    """
+    permission_required = ()
+
+    def get_permission_required(self):
+        if isinstance(self.permission_required, str):
+            return (self.permission_required,)
+        return self.permission_required
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        request.user = user
+        if not user.is_authenticated or not await user.ahas_perms(self.get_permission_required()):
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class PaginaAssincronaMixin(LoginAssincronoMixin):
+    """GET assíncrono das listas e detalhes com GetCondicionalMixin e FragmentoCacheMixin.
+
+    Vem antes dos dois na lista de bases. O caminho de quem consulta a página
+    repetidamente (quiosques, abas abertas) roda no event loop: o agregado
+    dos validadores e, se nada mudou, o 304; senão a página com o fragmento
+    do cache (nos detalhes, mais a leitura do objeto). Páginas com mensagens
+    pendentes, buscas (a de empréstimos consulta o índice já ao montar o
+    filtro) e faltas do cache de fragmentos usam o caminho síncrono, numa
+    thread.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        busca = getattr(self, 'busca_kwarg', None)
+        # a sessão já foi lida por request.auser(): as mensagens não consultam o banco
+        if (busca and request.GET.get(busca, '').strip()) or len(messages.get_messages(request)):
+            return await sync_to_async(super().get)(request, *args, **kwargs)
+
+        validadores = await self.aget_validadores()
+        if validadores is not None:
+            response = self.resposta_condicional(request, validadores)
+            if response is not None:
+                return self.aplicar_validadores(response, validadores)
+
+        html = None
+        if fragmentos.ativo():
+            self.fragmento_chave = fragmentos.chave(
+                self.fragmento_template_name, self.fragmento_modelos, request, fragmentos.variacao_do_dia(self),
+            )
+            html = cache.get(self.fragmento_chave)
+        if html is None:
+            response = await sync_to_async(self.renderizar)(request, *args, **kwargs)
+        else:
+            if isinstance(self, SingleObjectMixin):
+                self.object = await self.aget_object()
+            response = self.resposta_em_cache(html)
+        return self.aplicar_validadores(response, validadores) if validadores else response
+
+    async def aget_object(self):
+        """``get_object`` (busca pela chave da URL) com o ORM assíncrono."""
+        queryset = self.get_queryset()
+        try:
+            return await queryset.aget(pk=self.kwargs.get(self.pk_url_kwarg))
+        except queryset.model.DoesNotExist:
+            raise Http404(f'Nenhum(a) {queryset.model._meta.verbose_name} encontrado(a).')
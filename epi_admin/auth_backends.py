@@ -1,35 +1,181 @@
+import hashlib
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+# O usuário autenticado (com o conjunto de permissões já calculado) fica no
+# cache do Django entre requisições. Só vão para o cache os campos do usuário,
+# sem o hash da senha, o hash de sessão já derivado dele (o mesmo que fica na
+# sessão) e os nomes das permissões: nada que permita atacar a senha, mesmo
+# com o cache gravado em disco (DJANGO_CACHE_DIR). As chaves incluem uma
+# "versão" que é trocada sempre que grupos ou permissões mudam (o que pode
+# afetar qualquer usuário); alterações num usuário apagam só a chave dele.
+#
+# Com mais de um processo o cache precisa ser compartilhado (DJANGO_CACHE_DIR):
+# com o cache local (LocMemCache), a invalidação só alcança o processo que fez
+# a alteração, e um usuário desativado ou com a senha trocada continua valendo
+# nos outros por até EPI_AUTH_CACHE_TIMEOUT segundos.
+CHAVE_VERSAO = 'auth:versao'
+
+
+def _versao():
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        cache.add(CHAVE_VERSAO, uuid.uuid4().hex, timeout=None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def _chave_usuario(user_id):
+    return f'auth:usuario:{_versao()}:{user_id}'
+
+
+def invalidar_usuario(user_id):
+    """Descarta o usuário ``user_id`` do cache (ele será recarregado do banco)."""
+    cache.delete(_chave_usuario(user_id))
+
+
+def invalidar_todos():
+    """Descarta todos os usuários do cache (mudança em grupos ou permissões)."""
+    cache.set(CHAVE_VERSAO, uuid.uuid4().hex, timeout=None)
+
+
+def usuarios_por_email(email):
+    """Usuários cujo email, sem diferenciar maiúsculas, é ``email``.
+
+    A consulta casa com o índice único parcial ``LOWER(email) WHERE email > ''``
+    (migração 0009): a condição ``email > ''`` precisa estar na consulta para o
+    banco poder usá-lo.
+    """
+    UserModel = get_user_model()
+    return UserModel.objects.alias(email_lower=Lower('email')).filter(
+        email_lower=email.strip().lower(), email__gt='',
+    )
+
+
+def _chave_email_desconhecido(email):
+    digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+    return f'auth:email-desconhecido:{digest}'
+
+
+def esquecer_email_desconhecido(email):
+    """Remove ``email`` do cache negativo (um usuário acabou de ser gravado com ele)."""
+    if email:
+        cache.delete(_chave_email_desconhecido(email))
+
+
+def _para_cache(user):
+    campos = {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields if field.name != 'password'
+    }
+    return {'campos': campos, 'hash_sessao': user.get_session_auth_hash(), 'permissoes': getattr(user, '_perm_cache', None)}
+
+
+def _do_cache(dados):
+    UserModel = get_user_model()
+    campos = dados['campos']
+    # a senha fica adiada: check_password() e save() a leem do banco se precisarem
+    user = UserModel.from_db('default', list(campos), list(campos.values()))
+    hash_sessao = dados['hash_sessao']
+    user.get_session_auth_hash = lambda: hash_sessao
+    if dados['permissoes'] is not None:  # usuário inativo: sem permissões calculadas
+        user._perm_cache = dados['permissoes']
+    return user
+
+
+def usuario_em_cache(user_id):
+    """Retorna o usuário ``user_id`` com as permissões pré-carregadas, ou None.
+
+    Numa falta de cache o usuário e suas permissões são lidos do banco uma vez
+    e guardados (sem a senha); nas requisições seguintes nenhuma consulta é feita.
+    """
+    chave = _chave_usuario(user_id)
+    dados = cache.get(chave)
+    if dados is not None:
+        return _do_cache(dados)
+    UserModel = get_user_model()
+    try:
+        user = UserModel.objects.get(pk=user_id)
+    except UserModel.DoesNotExist:
+        return None
+    # preenche user._perm_cache, usado por ModelBackend.has_perm
+    ModelBackend().get_all_permissions(user)
+    cache.set(chave, _para_cache(user), getattr(settings, 'EPI_AUTH_CACHE_TIMEOUT', 60))
+    return user
+
+
+async def ausuario_em_cache(user_id):
+    """Versão assíncrona de ``usuario_em_cache`` (``request.auser()`` das views assíncronas).
+
+    Um acerto é lido do cache local direto no event loop; só a falta passa
+    pela thread síncrona, que consulta o banco e preenche o cache.
+    """
+    dados = cache.get(_chave_usuario(user_id))
+    if dados is not None:
+        return _do_cache(dados)
+    return await sync_to_async(usuario_em_cache)(user_id)
+
 
 class EmailBackend:
     """Authenticate using an email address.
 
     Notes:
-    - This backend assumes User.email is unique across users. Make sure you enforce unique emails when creating accounts.
+    - User.email is unique (case-insensitive, empty emails excepted) through the index created in migration 0009.
     - Falls back to default behavior if no user found.
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
         # Django's auth views send the login value as 'username' by default.
         email = username or kwargs.get('email')
-        UserModel = get_user_model()
-        if email is None or password is None:
+        if email is None or password is None or not email.strip():
+            return None
+        # cache negativo opcional: emails desconhecidos não voltam ao banco por alguns segundos
+        timeout_negativo = getattr(settings, 'EPI_LOGIN_NEGATIVE_CACHE_TIMEOUT', 0)
+        if timeout_negativo and cache.get(_chave_email_desconhecido(email)):
             return None
-        try:
-            user = UserModel.objects.get(email__iexact=email)
-        except UserModel.DoesNotExist:
+        # [:2] em vez de get(): bancos ainda sem o índice único podem ter emails
+        # repetidos, e nesse caso o login por email é recusado (sem exceção)
+        usuarios = list(usuarios_por_email(email)[:2])
+        if len(usuarios) != 1:
+            if not usuarios and timeout_negativo:
+                cache.set(_chave_email_desconhecido(email), True, timeout_negativo)
             return None
-        else:
-            if user.check_password(password) and self.user_can_authenticate(user):
-                return user
+        user = usuarios[0]
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
         return None
 
     def get_user(self, user_id):
-        UserModel = get_user_model()
-        try:
-            return UserModel.objects.get(pk=user_id)
-        except UserModel.DoesNotExist:
-            return None
+        return usuario_em_cache(user_id)
+
+    async def aget_user(self, user_id):
+        return await ausuario_em_cache(user_id)
 
     def user_can_authenticate(self, user):
         # Mirrors Django's default: allow active users only
         is_active = getattr(user, 'is_active', None)
         return is_active or is_active is None
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend que busca o usuário da sessão (e suas permissões) no cache."""
+
+    def get_user(self, user_id):
+        user = usuario_em_cache(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        user = await ausuario_em_cache(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def ahas_perm(self, user_obj, perm, obj=None):
+        # o usuário do cache já traz as permissões (_perm_cache): a verificação
+        # é feita em memória, sem passar pela thread síncrona como no ModelBackend
+        if obj is None and hasattr(user_obj, '_perm_cache'):
+            return self.has_perm(user_obj, perm)
+        return await super().ahas_perm(user_obj, perm, obj)
@@ -0,0 +1,185 @@
+"""Busca por prefixo, sem acentos, em colaboradores, EPIs e empréstimos.
+
+Os campos pesquisáveis de cada objeto são quebrados em termos normalizados
+(minúsculas, sem acentos, só letras e dígitos) e gravados em TermoBusca, uma
+linha por (modelo, objeto, termo). Uma busca vira, para cada palavra digitada,
+``termo >= palavra AND termo < palavra || U+FFFF`` (faixa que usa o índice
+(modelo, termo) e casa qualquer termo que comece com a palavra); os objetos
+precisam casar todas as palavras. Assim "joão sil" encontra "João Silva" sem
+varrer a tabela, ao contrário de ``icontains``.
+
+Empréstimos não têm termos próprios: casam pelo número (``#123``) ou pelo
+colaborador/EPI. Assim renomear um colaborador não exige reindexar os seus
+empréstimos. Como a lista é paginada pela chave, há dois planos possíveis:
+partir dos índices das chaves estrangeiras e ordenar os empréstimos
+encontrados (bom para buscas seletivas) ou percorrer a tabela pela chave
+testando cada linha até encher a página (bom para buscas amplas, em que a
+primeira estratégia ordenaria dezenas de milhares de linhas). ``filtrar``
+estima quantos empréstimos casam a partir do próprio índice de termos e
+escolhe o plano.
+
+O índice é mantido pelos sinais de Colaborador e EPI; caminhos em massa
+(``bulk_create``/``bulk_update``) chamam ``indexar`` explicitamente, e
+``manage.py rebuild_busca`` reconstrói tudo.
+"""
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from .models import EPI, Colaborador, Emprestimo, TermoBusca
+from .pagination import approximate_count
+
+
+CAMPOS = {
+    Colaborador: ('nome', 'sobrenome', 'setor', 'cpf'),
+    EPI: ('nomeAparelho', 'categoria'),
+}
+TAMANHO_TERMO = TermoBusca._meta.get_field('termo').max_length
+MAXIMO_PALAVRAS = 5
+LOTE = 5000
+# acima desta estimativa de empréstimos casados, percorrer a tabela pela chave é mais barato
+LIMITE_BUSCA_INDEXADA = 2000
+
+_PONTUACAO_NUMERICA = re.compile(r'(?<=\d)[.\-/](?=\d)')
+_PALAVRA = re.compile(r'[a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos; "123.456.789-01" vira "12345678901"."""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _PONTUACAO_NUMERICA.sub('', texto)
+
+
+def palavras(texto):
+    """Termos distintos de ``texto``, na ordem em que aparecem."""
+    return list(dict.fromkeys(p[:TAMANHO_TERMO] for p in _PALAVRA.findall(normalizar(texto))))
+
+
+def _modelo(model):
+    return model._meta.model_name
+
+
+def _termos(obj):
+    return {termo for campo in CAMPOS[type(obj)] for termo in palavras(getattr(obj, campo))}
+
+
+def _inserir_termos(linhas):
+    """INSERT com executemany: uma única consulta por lote, sem instanciar modelos.
+
+    O bulk_create quebraria os termos em INSERTs de poucas centenas de linhas
+    (limite de parâmetros do SQLite).
+    """
+    colunas = [TermoBusca._meta.get_field(nome).column for nome in ('modelo', 'objeto_id', 'termo')]
+    sql = 'INSERT INTO {} ({}) VALUES (%s, %s, %s)'.format(
+        connection.ops.quote_name(TermoBusca._meta.db_table),
+        ', '.join(connection.ops.quote_name(c) for c in colunas),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, linhas)
+
+
+def indexar(objetos, novos=False):
+    """(Re)grava os termos de ``objetos`` (todos do mesmo modelo).
+
+    Com ``novos=True`` (objetos recém-criados) não há termos antigos a apagar.
+    """
+    objetos = [obj for obj in objetos if obj.pk is not None]
+    if not objetos:
+        return
+    modelo = _modelo(type(objetos[0]))
+    # sem savepoint: chamado de dentro do save()/importação, que já têm transação
+    with transaction.atomic(savepoint=False):
+        for inicio in range(0, len(objetos), LOTE):
+            lote = objetos[inicio:inicio + LOTE]
+            if not novos:
+                TermoBusca.objects.filter(modelo=modelo, objeto_id__in=[obj.pk for obj in lote]).delete()
+            _inserir_termos([(modelo, obj.pk, termo) for obj in lote for termo in _termos(obj)])
+
+
+def remover(model, pk):
+    TermoBusca.objects.filter(modelo=_modelo(model), objeto_id=pk).delete()
+
+
+@transaction.atomic
+def reconstruir():
+    """Refaz o índice inteiro; retorna o número de termos gravados."""
+    TermoBusca.objects.all().delete()
+    for model, campos in CAMPOS.items():
+        ultimo = 0
+        while lote := list(model.objects.only('pk', *campos).filter(pk__gt=ultimo).order_by('pk')[:LOTE]):
+            indexar(lote, novos=True)
+            ultimo = lote[-1].pk
+    return TermoBusca.objects.count()
+
+
+def _ids(model, palavra):
+    return TermoBusca.objects.filter(
+        modelo=_modelo(model), termo__gte=palavra, termo__lt=palavra + '\uffff',
+    ).values('objeto_id')
+
+
+def _seletiva(palavra, totais):
+    """Se ``palavra`` casa no máximo ~LIMITE_BUSCA_INDEXADA empréstimos.
+
+    Estima pela média de empréstimos por colaborador/EPI; as contagens param
+    no limite, então palavras amplas ("a") custam o mesmo que as raras.
+    """
+    estimativa = 0.0
+    for model in (Colaborador, EPI):
+        if not totais[model]:
+            continue
+        por_objeto = totais[Emprestimo] / totais[model]
+        maximo = int(LIMITE_BUSCA_INDEXADA / por_objeto) + 1 if por_objeto else totais[model]
+        estimativa += _ids(model, palavra)[:maximo].count() * por_objeto
+    return estimativa <= LIMITE_BUSCA_INDEXADA
+
+
+def _filtrar_emprestimos(queryset, palavras_):
+    totais = {model: approximate_count(model.objects.all()) for model in (Emprestimo, Colaborador, EPI)}
+    colaborador, epi = 'colaborador_id', 'epi_nome_id'
+    # o plano pelos índices parte de uma palavra seletiva; sem nenhuma, ordenaria demais
+    if not any(_seletiva(palavra, totais) for palavra in palavras_):
+        # "coluna + 0" não usa índice: o banco percorre a chave primária na
+        # ordem da paginação e para assim que a página enche
+        queryset = queryset.alias(_busca_colaborador=F(colaborador) + 0, _busca_epi=F(epi) + 0)
+        colaborador, epi = '_busca_colaborador', '_busca_epi'
+    for palavra in palavras_:
+        condicao = Q(**{f'{colaborador}__in': _ids(Colaborador, palavra)}) | Q(**{f'{epi}__in': _ids(EPI, palavra)})
+        if palavra.isdigit():
+            condicao |= Q(pk=int(palavra))
+        queryset = queryset.filter(condicao)
+    return queryset
+
+
+def filtrar(queryset, consulta):
+    """Restringe ``queryset`` (Colaborador, EPI ou Emprestimo) aos objetos que casam ``consulta``.
+
+    Cada palavra é um prefixo; todas precisam casar. Só as primeiras
+    MAXIMO_PALAVRAS palavras são consideradas.
+    """
+    palavras_ = palavras(consulta)[:MAXIMO_PALAVRAS]
+    if not palavras_:
+        return queryset
+    if queryset.model is Emprestimo:
+        return _filtrar_emprestimos(queryset, palavras_)
+    for palavra in palavras_:
+        queryset = queryset.filter(pk__in=_ids(queryset.model, palavra))
+    return queryset
+
+
+class BuscaMixin:
+    """Filtra o queryset de uma ListView pelo parâmetro ``q`` da query string."""
+    busca_kwarg = 'q'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        consulta = self.request.GET.get(self.busca_kwarg, '').strip()
+        return filtrar(queryset, consulta) if consulta else queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['busca'] = self.request.GET.get(self.busca_kwarg, '').strip()
+        return context
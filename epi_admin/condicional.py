@@ -0,0 +1,114 @@
+"""GET condicional (ETag e, nos detalhes, Last-Modified) das listas e páginas de detalhe.
+
+Os validadores vêm do ``updated_at`` dos modelos e custam uma única consulta
+agregada, feita antes de qualquer outra da view:
+
+- detalhe: a linha do objeto;
+- lista: as linhas da página atual, as mesmas que a paginação por chave lê
+  (``KeysetPaginationMixin.get_janela``).
+
+O agregado junta a soma das chaves (uma linha apagada faz outra entrar na
+página) e o maior ``updated_at`` das linhas e das relações exibidas
+(``condicional_relacoes``); não há COUNT, que nas listas grandes percorreria a
+tabela inteira. O ETag também varia com o usuário e suas permissões, que
+decidem os botões de cada linha, e, nas views com ``varia_com_o_dia`` (os
+atrasos das listas e detalhes de colaboradores e EPIs), com a data.
+
+As listas não enviam Last-Modified: uma linha apagada, ou que sai da página
+porque outra entrou, não move o maior ``updated_at`` da página, e um cliente
+que só mandasse If-Modified-Since receberia 304 com a página antiga. A soma
+das chaves no ETag percebe essas mudanças. Nos detalhes a página é a própria
+linha (apagada, a resposta é 404) e o Last-Modified vale.
+
+Se o cliente já tem a versão atual a resposta é 304, sem renderizar nada.
+Páginas com mensagens pendentes (django.contrib.messages) são sempre
+renderizadas, para a mensagem não ficar presa na sessão.
+"""
+import hashlib
+from datetime import datetime, time
+
+from django.contrib import messages
+from django.db.models import Max, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date
+from django.views.generic.detail import SingleObjectMixin
+
+from .fragmentos import variacao_do_dia, variacao_usuario
+
+
+class GetCondicionalMixin:
+    """Responde 304 Not Modified quando a página não mudou desde a última visita."""
+    # relações cujo updated_at também aparece na página (ex.: 'colaborador')
+    condicional_relacoes = ()
+
+    def get_queryset(self):
+        # a consulta dos validadores e a da view partem do mesmo queryset; com
+        # busca (BuscaMixin) o filtro é montado uma vez só
+        if not hasattr(self, '_queryset_condicional'):
+            self._queryset_condicional = super().get_queryset()
+        return self._queryset_condicional
+
+    def get_linhas_condicionais(self):
+        """QuerySet das linhas exibidas na página."""
+        queryset = self.get_queryset()
+        if isinstance(self, SingleObjectMixin):
+            return queryset.filter(pk=self.kwargs.get(self.pk_url_kwarg))
+        return self.get_janela(queryset, self.get_paginate_by(queryset))
+
+    def get_agregados_condicionais(self):
+        agregados = {'chaves': Sum('pk'), 'ultima': Max('updated_at')}
+        for relacao in self.condicional_relacoes:
+            agregados[f'ultima_{relacao}'] = Max(f'{relacao}__updated_at')
+        return agregados
+
+    def validadores(self, valores):
+        """``(etag, última alteração em segundos)`` a partir do agregado, ou None se a página não tem linhas.
+
+        Nas listas a última alteração é sempre None (sem Last-Modified).
+        """
+        if valores['chaves'] is None:
+            # detalhe inexistente (a view responde 404) ou lista vazia
+            return None
+        datas = [valor for chave, valor in valores.items() if chave.startswith('ultima') and valor]
+        if getattr(self, 'varia_com_o_dia', False):
+            # a página mudou à meia-noite mesmo sem nenhuma linha alterada
+            datas.append(timezone.make_aware(datetime.combine(timezone.localdate(), time.min)))
+        partes = [str(valor) for valor in valores.values()] + variacao_usuario(self.request) + variacao_do_dia(self)
+        etag = 'W/"%s"' % hashlib.sha256('\n'.join(partes).encode()).hexdigest()[:32]
+        if not isinstance(self, SingleObjectMixin) or not datas:
+            return etag, None
+        return etag, int(max(datas).timestamp())
+
+    def get_validadores(self):
+        return self.validadores(self.get_linhas_condicionais().aggregate(**self.get_agregados_condicionais()))
+
+    async def aget_validadores(self):
+        """Versão assíncrona de ``get_validadores`` (ver epi_admin.assincrono)."""
+        return self.validadores(await self.get_linhas_condicionais().aaggregate(**self.get_agregados_condicionais()))
+
+    def resposta_condicional(self, request, validadores):
+        """304 se o cliente já tem a versão atual; None se a página precisa ser enviada."""
+        etag, ultima = validadores
+        return get_conditional_response(request, etag=etag, last_modified=ultima)
+
+    def aplicar_validadores(self, response, validadores):
+        if response.status_code in (200, 304):
+            etag, ultima = validadores
+            response.headers.setdefault('ETag', etag)
+            if ultima is not None:
+                response.headers.setdefault('Last-Modified', http_date(ultima))
+            # o navegador guarda a página, mas sempre pergunta se ela mudou
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        if len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+        validadores = self.get_validadores()
+        if validadores is None:
+            return super().get(request, *args, **kwargs)
+        response = self.resposta_condicional(request, validadores)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return self.aplicar_validadores(response, validadores)
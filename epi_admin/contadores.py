@@ -0,0 +1,251 @@
+"""Contadores de empréstimos por colaborador e por EPI (ContadoresEmprestimos).
+
+Colaborador e EPI guardam quantos empréstimos têm em aberto e no total e a
+menor ``data_prevista`` entre os em aberto. Os detalhes e as listas leem
+esses campos em vez de agregar a tabela de empréstimos por linha, e as
+listas ordenam e filtram por eles pelos índices (``ContadoresListaMixin``).
+
+"Atrasado" depende do dia, então não vira contador: há atraso quando a
+prevista mais antiga é anterior a hoje, e só então o detalhe conta os
+atrasados (``atrasados``), pelo índice parcial dos empréstimos em aberto.
+
+Os contadores mudam na mesma transação que o estoque: ``Emprestimo.save()``,
+a exclusão de empréstimos (sinal post_delete, que também cobre a cascata ao
+apagar um colaborador ou EPI) e ``estoque.emprestar_kit``. Cada alteração é
+um UPDATE ``F() + n``; ``manage.py rebuild_contadores_emprestimos`` confere
+os contadores com a tabela de empréstimos e corrige os que divergirem.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import fragmentos
+from .models import EPI, Colaborador, Emprestimo
+
+
+# (modelo, campo de Emprestimo que aponta para ele)
+ALVOS = ((Colaborador, 'colaborador'), (EPI, 'epi_nome'))
+
+EM_ABERTO = Q(data_devolucao__isnull=True)
+
+
+def _campo(model):
+    return dict(ALVOS)[model]
+
+
+def _mais_antiga(campo):
+    """Subconsulta da menor data_prevista em aberto da linha (índice emprestimo_aberto_*_idx)."""
+    return Subquery(
+        Emprestimo.objects.filter(EM_ABERTO, **{campo: OuterRef('pk')}, data_prevista__isnull=False)
+        .order_by('data_prevista').values('data_prevista')[:1]
+    )
+
+
+def _somar(deltas, estado, n):
+    aberto = estado['data_devolucao'] is None
+    for model, campo in ALVOS:
+        pk = estado[f'{campo}_id']
+        if pk is None:
+            continue
+        total, abertos = deltas.get((model, pk), (0, 0))
+        deltas[(model, pk)] = (total + n, abertos + (n if aberto else 0))
+
+
+def aplicar(deltas):
+    """Soma os ``deltas`` ({(modelo, pk): (total, abertos)}) e recalcula a prevista mais antiga dessas linhas.
+
+    Linhas com os mesmos deltas vão num único UPDATE (o lote de emprestar_kit
+    soma o mesmo a todos os colaboradores). Uma linha presente com deltas
+    zerados (um empréstimo em aberto que mudou de data prevista) só tem a
+    prevista mais antiga recalculada.
+    """
+    if not deltas:
+        return
+    grupos = {}
+    for (model, pk), (total, abertos) in deltas.items():
+        grupos.setdefault((model, total, abertos), []).append(pk)
+    agora = timezone.now()
+    for (model, total, abertos), pks in grupos.items():
+        # updated_at muda junto: os contadores aparecem nas páginas (ETag e fragmentos)
+        model.objects.filter(pk__in=pks).update(
+            emprestimos_total=F('emprestimos_total') + total,
+            emprestimos_abertos=F('emprestimos_abertos') + abertos,
+            prevista_mais_antiga=_mais_antiga(_campo(model)),
+            updated_at=agora,
+        )
+    fragmentos.invalidar(*{model for model, _, _ in grupos})
+
+
+def emprestimo_salvo(emprestimo, created):
+    """Atualiza os contadores depois de um save() de Emprestimo.
+
+    A diferença parte de ``estado_original``, que o save() relê do banco quando
+    outra gravação registrou a devolução antes desta (``registrar_devolucao``
+    retornou False): a passagem de aberto para devolvido é contada uma vez.
+    """
+    antigo = None if created else emprestimo.estado_original
+    if not created and antigo is None:
+        # objeto salvo sem ter sido carregado do banco: estado anterior desconhecido
+        return
+    novo = emprestimo.estado_atual()
+    if antigo == novo:
+        return
+    deltas = {}
+    if antigo:
+        _somar(deltas, antigo, -1)
+    _somar(deltas, novo, 1)
+    aplicar(deltas)
+
+
+def emprestimo_apagado(emprestimo):
+    """Remove a contribuição de um empréstimo apagado."""
+    deltas = {}
+    _somar(deltas, emprestimo.estado_original or emprestimo.estado_atual(), -1)
+    aplicar(deltas)
+
+
+def registrar_lote(emprestimos):
+    """Soma aos contadores empréstimos criados com bulk_create (que não chama save())."""
+    deltas = {}
+    for emprestimo in emprestimos:
+        _somar(deltas, emprestimo.estado_atual(), 1)
+    aplicar(deltas)
+
+
+def atrasados(objeto, hoje=None):
+    """Empréstimos em aberto e atrasados do colaborador ou EPI ``objeto``.
+
+    Sem consulta quando a prevista mais antiga não passou de ``hoje``.
+    """
+    hoje = hoje or timezone.localdate()
+    if objeto.prevista_mais_antiga is None or objeto.prevista_mais_antiga >= hoje:
+        return 0
+    return Emprestimo.objects.filter(EM_ABERTO, **{_campo(type(objeto)): objeto}, data_prevista__lt=hoje).count()
+
+
+def _corretos(model):
+    """Expressões com os valores certos dos contadores de cada linha de ``model`` (subconsultas por linha)."""
+    campo = _campo(model)
+
+    def contagem(*filtros):
+        return Coalesce(Subquery(
+            Emprestimo.objects.filter(*filtros, **{campo: OuterRef('pk')}).order_by()
+            .values(campo).annotate(n=Count('pk')).values('n'),
+            output_field=IntegerField(),
+        ), Value(0))
+
+    return {
+        'emprestimos_total': contagem(),
+        'emprestimos_abertos': contagem(EM_ABERTO),
+        'prevista_mais_antiga': _mais_antiga(campo),
+    }
+
+
+def _divergentes(model, corretos, anotar=False):
+    """Linhas de ``model`` cujos contadores diferem dos ``corretos``.
+
+    Com ``anotar``, cada linha traz os valores certos em ``<contador>_certo``.
+    """
+    def sem_nulo(expressao):
+        # NULL = NULL não é verdadeiro: a data "nenhuma" vira uma data impossível
+        return Coalesce(expressao, Value(date.min), output_field=DateField())
+
+    certos = {f'{nome}_certo': expressao for nome, expressao in corretos.items()}
+    queryset = model.objects.annotate(**certos) if anotar else model.objects.alias(**certos)
+    return queryset.alias(
+        prevista_gravada=sem_nulo(F('prevista_mais_antiga')),
+        prevista_certa=sem_nulo(F('prevista_mais_antiga_certo')),
+    ).filter(
+        ~Q(emprestimos_total=F('emprestimos_total_certo'))
+        | ~Q(emprestimos_abertos=F('emprestimos_abertos_certo'))
+        | ~Q(prevista_gravada=F('prevista_certa'))
+    )
+
+
+def divergencias(model):
+    """``[(objeto, (total, abertos, prevista_mais_antiga))]`` das linhas cujos contadores não batem.
+
+    Uma única consulta: cada linha é comparada com as subconsultas dos valores
+    certos (``_corretos``); o objeto traz os valores atuais e a tupla, os certos.
+    """
+    linhas = _divergentes(model, _corretos(model), anotar=True).only('pk', *model.CAMPOS_CONTADORES).order_by('pk')
+    return [
+        (objeto, (objeto.emprestimos_total_certo, objeto.emprestimos_abertos_certo, objeto.prevista_mais_antiga_certo))
+        for objeto in linhas.iterator()
+    ]
+
+
+@transaction.atomic
+def reconstruir():
+    """Corrige os contadores divergentes de colaboradores e EPIs; retorna {nome do modelo: linhas corrigidas}.
+
+    Um UPDATE por modelo, com os valores certos calculados pelo banco (como a
+    migração 0015 preencheu os contadores), só nas linhas que divergem: as
+    outras mantêm o ``updated_at`` e os fragmentos em cache.
+    """
+    corrigidos = {}
+    agora = timezone.now()
+    for model, _ in ALVOS:
+        corretos = _corretos(model)
+        n = _divergentes(model, corretos).update(**corretos, updated_at=agora)
+        if n:
+            fragmentos.invalidar(model)
+        corrigidos[model._meta.model_name] = n
+    return corrigidos
+
+
+class ContadoresListaMixin:
+    """Ordena e filtra as listas de colaboradores e EPIs pelos contadores de empréstimos.
+
+    ``?ordem=abertos`` ou ``?ordem=total`` põe primeiro quem tem mais
+    empréstimos (índices ``*_abertos_idx``/``*_total_idx``, que terminam na
+    chave, como a paginação por chave pede); ``?filtro=abertos`` mostra só
+    quem tem empréstimo em aberto e ``?filtro=atrasados``, só quem tem algum
+    atrasado (índice parcial ``*_atraso_idx``). Vem antes do BuscaMixin.
+    """
+    ordens = {
+        'abertos': ('-emprestimos_abertos', '-pk'),
+        'total': ('-emprestimos_total', '-pk'),
+    }
+    filtros = ('abertos', 'atrasados')
+    # a marca de atraso e ?filtro=atrasados mudam com o dia (ETag e fragmentos)
+    varia_com_o_dia = True
+
+    def get_ordem(self):
+        ordem = self.request.GET.get('ordem', '')
+        return ordem if ordem in self.ordens else ''
+
+    def get_filtro(self):
+        filtro = self.request.GET.get('filtro', '')
+        return filtro if filtro in self.filtros else ''
+
+    def get_keyset_ordering(self):
+        return self.ordens.get(self.get_ordem()) or super().get_keyset_ordering()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        filtro = self.get_filtro()
+        if filtro == 'abertos':
+            queryset = queryset.filter(emprestimos_abertos__gt=0)
+        elif filtro == 'atrasados':
+            queryset = queryset.filter(prevista_mais_antiga__lt=timezone.localdate())
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['ordem'] = self.get_ordem()
+        context['filtro'] = self.get_filtro()
+        return context
+
+
+class ContadoresDetalheMixin:
+    """Põe no contexto dos detalhes de colaborador e EPI quantos empréstimos estão atrasados."""
+    varia_com_o_dia = True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['atrasados'] = atrasados(self.object)
+        return context
@@ -0,0 +1,200 @@
+"""Gerador determinístico de dados sintéticos para testes de desempenho.
+
+Com a mesma ``seed`` e a mesma ``escala`` o resultado é sempre o mesmo. Cada
+unidade de escala corresponde a 1.000 empréstimos, 50 colaboradores e 2 EPIs
+(mínimo de 20 EPIs); há 2 gerentes por setor. Os empréstimos cobrem os
+últimos dois anos: devolvidos, em aberto no prazo e em aberto atrasados.
+
+O estoque fica coerente com os empréstimos: ``EPI.quantidade`` é o saldo
+livre no almoxarifado (nunca negativo), como se os itens em aberto e os
+devolvidos em condição ``RUIM`` tivessem passado por ``estoque.py``.
+"""
+import random
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import alteracoes, busca, contadores, fragmentos, resumo
+from .models import EPI, Alteracao, Colaborador, Emprestimo, Gerente, ResumoEmprestimo, Tarefa, TermoBusca
+
+
+SETORES = [
+    'Produção', 'Manutenção', 'Almoxarifado', 'Logística', 'Qualidade',
+    'Obra', 'Elétrica', 'Pintura', 'Solda', 'Administrativo',
+]
+NOMES = [
+    'Ana', 'Bruno', 'Carlos', 'Daniela', 'Eduardo', 'Fernanda', 'Gustavo', 'Helena', 'Igor', 'Julia',
+    'Karina', 'Lucas', 'Marina', 'Nelson', 'Otávio', 'Patrícia', 'Rafael', 'Sabrina', 'Tiago', 'Vanessa',
+]
+SOBRENOMES = [
+    'Silva', 'Souza', 'Oliveira', 'Santos', 'Pereira', 'Costa', 'Almeida', 'Gomes', 'Ribeiro', 'Fernandes',
+    'Carvalho', 'Lima', 'Araújo', 'Barbosa', 'Rocha', 'Dias', 'Moreira', 'Nunes', 'Teixeira', 'Vieira',
+]
+EPIS = [
+    ('Capacete', 'Cabeça'), ('Luva nitrílica', 'Mãos'), ('Luva de vaqueta', 'Mãos'), ('Óculos de proteção', 'Olhos'),
+    ('Protetor auricular', 'Audição'), ('Botina de segurança', 'Pés'), ('Máscara PFF2', 'Respiratória'),
+    ('Respirador semifacial', 'Respiratória'), ('Cinto paraquedista', 'Altura'), ('Avental de raspa', 'Tronco'),
+    ('Protetor facial', 'Face'), ('Creme protetor', 'Pele'),
+]
+TAMANHOS = ['P', 'M', 'G', 'GG', 'Único']
+
+EMPRESTIMOS_POR_ESCALA = 1000
+COLABORADORES_POR_ESCALA = 50
+EPIS_POR_ESCALA = 2
+GERENTES_POR_SETOR = 2
+LOTE = 5000
+EMPRESTIMOS_POR_TRANSACAO = 100_000
+DIAS_DE_HISTORICO = 730
+
+
+def _cpf(seed, n):
+    # CPFs únicos dentro de uma geração: prefixo da seed + sequencial
+    return f'{seed % 100:02d}{n:09d}'
+
+
+COLUNAS_EMPRESTIMO = (
+    'colaborador_id', 'epi_nome_id', 'data_emprestimo', 'data_prevista',
+    'data_devolucao', 'condicao_retirada', 'condicao_devolucao', 'created_at', 'updated_at',
+)
+
+
+def _inserir_emprestimos(linhas):
+    """INSERT com executemany, sem instanciar modelos.
+
+    ``linhas`` são tuplas na ordem de COLUNAS_EMPRESTIMO, com as datas já no
+    formato do banco. Para um milhão de linhas, montar objetos e compilar o SQL
+    do bulk_create custa bem mais que a escrita em si.
+    """
+    tabela = Emprestimo._meta.db_table
+    colunas = [Emprestimo._meta.get_field(nome).column for nome in COLUNAS_EMPRESTIMO]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(tabela),
+        ', '.join(connection.ops.quote_name(c) for c in colunas),
+        ', '.join(['%s'] * len(colunas)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, linhas)
+
+
+def limpar():
+    """Apaga todos os dados do domínio (usar apenas em bancos descartáveis).
+
+    Cada tabela é esvaziada com um único DELETE, sem carregar as linhas nem
+    disparar os sinais: um ``delete()`` do ORM apagaria os empréstimos um a um
+    para os receivers post_delete (resumo, contadores, registro de alterações),
+    com algumas consultas por empréstimo. As tabelas derivadas (resumo, índice
+    de busca) e o registro de alterações e a fila de tarefas são esvaziados
+    junto, então não sobra nada a reconstruir; só os fragmentos em cache são
+    invalidados, uma vez.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        # filhos antes dos pais: o DELETE direto não segue as chaves estrangeiras
+        for model in (Alteracao, Tarefa, ResumoEmprestimo, TermoBusca, Emprestimo, EPI, Colaborador, Gerente):
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        fragmentos.invalidar(Gerente, Colaborador, EPI, Emprestimo)
+
+
+def gerar(escala, seed, hoje, progresso=None):
+    """Gera o conjunto de dados e retorna a contagem de linhas por modelo.
+
+    ``progresso``, se informado, é chamado com uma mensagem a cada etapa. No
+    SQLite, ``escala=200`` leva cerca de 10 s e ``escala=1000`` (1 milhão de
+    empréstimos) cerca de um minuto, quase todo nos INSERTs; as reconstruções do
+    resumo e dos contadores no final somam uns 10 s.
+    """
+    avisar = progresso or (lambda mensagem: None)
+    rng = random.Random(seed)
+
+    with transaction.atomic():
+        gerentes = Gerente.objects.bulk_create([
+            Gerente(
+                nome=rng.choice(NOMES), sobrenome=rng.choice(SOBRENOMES), setor=setor,
+                email=f'gerente{n}.{i}.s{seed}@dataset.invalid', cpf=_cpf(seed + 50, n * GERENTES_POR_SETOR + i),
+            )
+            for n, setor in enumerate(SETORES)
+            for i in range(GERENTES_POR_SETOR)
+        ], batch_size=LOTE)
+
+        colaboradores = Colaborador.objects.bulk_create([
+            Colaborador(
+                nome=rng.choice(NOMES), sobrenome=rng.choice(SOBRENOMES), setor=rng.choice(SETORES),
+                cpf=_cpf(seed, n), is_ativo=rng.random() < 0.95,
+            )
+            for n in range(COLABORADORES_POR_ESCALA * escala)
+        ], batch_size=LOTE)
+
+        epis = EPI.objects.bulk_create([
+            EPI(
+                nomeAparelho=f'{nome} {rng.choice(TAMANHOS)} #{n}', categoria=categoria, quantidade=0,
+                # ~10% vencidos, o resto vence nos próximos três anos
+                validade=hoje + timedelta(days=rng.randint(-90, 10) if rng.random() < 0.1 else rng.randint(1, 1095)),
+            )
+            for n, (nome, categoria) in enumerate(rng.choice(EPIS) for _ in range(max(20, EPIS_POR_ESCALA * escala)))
+        ], batch_size=LOTE)
+
+        # bulk_create não dispara sinais: indexa para a busca e registra no log de alterações aqui
+        busca.indexar(colaboradores, novos=True)
+        busca.indexar(epis, novos=True)
+        alteracoes.registrar(Colaborador, [c.pk for c in colaboradores], alteracoes.CRIADO)
+        alteracoes.registrar(EPI, [e.pk for e in epis], alteracoes.CRIADO)
+    avisar(f'{len(gerentes)} gerentes, {len(colaboradores)} colaboradores, {len(epis)} EPIs')
+
+    ativos = [c.pk for c in colaboradores if c.is_ativo] or [c.pk for c in colaboradores]
+    epi_ids = [e.pk for e in epis]
+
+    # datas como deslocamentos em dias a partir de hoje (negativo = passado), já
+    # convertidas para o formato do banco: evita criar um date por coluna e linha
+    data = connection.ops.adapt_datefield_value
+    datas = {d: data(hoje + timedelta(days=d)) for d in range(-DIAS_DE_HISTORICO, 31)}
+    # created_at/updated_at: o INSERT direto não passa pelo auto_now dos campos
+    agora = timezone.now()
+    registro = connection.ops.adapt_datetimefield_value(agora)
+    prazos = (7, 7, 7, 15, 30)
+    random_ = rng.random
+
+    total = EMPRESTIMOS_POR_ESCALA * escala
+    for inicio in range(0, total, EMPRESTIMOS_POR_TRANSACAO):
+        lote = []
+        for _ in range(min(EMPRESTIMOS_POR_TRANSACAO, total - inicio)):
+            epi_id = epi_ids[int(random_() * len(epi_ids))]
+            emprestimo = -int(random_() * (DIAS_DE_HISTORICO + 1))
+            prevista = emprestimo + prazos[int(random_() * len(prazos))]
+            # vencidos: 90% devolvidos; ainda no prazo: 30% devolvidos antes
+            devolvido = random_() < (0.9 if prevista < 0 else 0.3)
+            devolucao = condicao = None
+            limite = min(0, prevista + 10)
+            if devolvido and limite > emprestimo:
+                devolucao = datas[emprestimo + 1 + int(random_() * (limite - emprestimo))]
+                sorteio = random_()
+                condicao = 'BOA' if sorteio < 0.7 else 'USAVEL' if sorteio < 0.9 else 'RUIM'
+            lote.append((
+                ativos[int(random_() * len(ativos))], epi_id, datas[emprestimo], datas[prevista],
+                devolucao, 'BOA', condicao, registro, registro,
+            ))
+        with transaction.atomic():
+            ultima = alteracoes.ultima_chave(Emprestimo)
+            _inserir_emprestimos(lote)
+            alteracoes.registrar_inseridos(Emprestimo, depois_de=ultima)
+        avisar(f'{inicio + len(lote)} / {total} empréstimos')
+
+    with transaction.atomic():
+        for epi in epis:
+            # saldo livre; os itens emprestados já saíram dele
+            epi.quantidade = rng.randint(0, 200)
+            epi.updated_at = agora
+        EPI.objects.bulk_update(epis, ['quantidade', 'updated_at'], batch_size=LOTE)
+        alteracoes.registrar(EPI, [e.pk for e in epis], alteracoes.ALTERADO)
+        # os INSERTs acima não passam pelo save() nem pelos sinais: o resumo do painel
+        # e os contadores de empréstimos são refeitos de uma vez
+        resumo.reconstruir(hoje)
+        contadores.reconstruir()
+        fragmentos.invalidar(Gerente, Colaborador, EPI, Emprestimo)
+    avisar('resumo do painel e contadores reconstruídos')
+
+    return {
+        'gerentes': len(gerentes),
+        'colaboradores': len(colaboradores),
+        'epis': len(epis),
+        'emprestimos': total,
+    }
@@ -0,0 +1,125 @@
+"""Operações de estoque de EPI usadas pelos empréstimos.
+
+Todas as alterações de ``EPI.quantidade`` são feitas com um único ``UPDATE``
+condicional, de modo que duas retiradas simultâneas nunca deixam o estoque
+negativo: quem chega depois simplesmente não encontra linha com
+``quantidade > 0`` para atualizar.
+"""
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import alteracoes, contadores, fragmentos, resumo
+from .models import EPI, Emprestimo
+
+
+CONDICOES_REESTOCAVEIS = ('BOA', 'USAVEL')
+
+
+def reservar(epi_id, quantidade=1):
+    """Retira ``quantidade`` unidades do EPI se houver estoque suficiente.
+
+    Retorna True se a reserva foi feita e False se o estoque não comportava a
+    retirada (nesse caso nada é alterado).
+    """
+    atualizados = EPI.objects.filter(pk=epi_id, quantidade__gte=quantidade).update(
+        quantidade=F('quantidade') - quantidade, updated_at=timezone.now()
+    )
+    if atualizados:
+        # update() não dispara post_save: o estoque exibido nas páginas e o log de alterações mudam aqui
+        fragmentos.invalidar(EPI)
+        alteracoes.registrar(EPI, [epi_id], alteracoes.ALTERADO)
+    return atualizados == 1
+
+
+def repor(epi_id, quantidade=1):
+    """Devolve ``quantidade`` unidades ao estoque do EPI."""
+    EPI.objects.filter(pk=epi_id).update(quantidade=F('quantidade') + quantidade, updated_at=timezone.now())
+    fragmentos.invalidar(EPI)
+    alteracoes.registrar(EPI, [epi_id], alteracoes.ALTERADO)
+
+
+def registrar_devolucao(emprestimo):
+    """Marca o empréstimo como devolvido e repõe o estoque, se aplicável.
+
+    A marcação é um ``UPDATE ... WHERE data_devolucao IS NULL``: apenas a
+    primeira requisição a registrar a devolução "ganha", então o item não é
+    reposto duas vezes mesmo com edições concorrentes. Retorna True se esta
+    chamada registrou a devolução. (A alteração do empréstimo entra no log de
+    alterações pelo save() que chama esta função.)
+    """
+    marcados = Emprestimo.objects.filter(pk=emprestimo.pk, data_devolucao__isnull=True).update(
+        data_devolucao=emprestimo.data_devolucao,
+        condicao_devolucao=emprestimo.condicao_devolucao,
+        updated_at=timezone.now(),
+    )
+    if not marcados:
+        return False
+    if emprestimo.condicao_devolucao in CONDICOES_REESTOCAVEIS:
+        repor(emprestimo.epi_nome_id)
+    return True
+
+
+def emprestar_kit(colaboradores, epis, data_emprestimo, data_prevista=None, condicao_retirada='BOA'):
+    """Empresta cada EPI de ``epis`` para cada colaborador de ``colaboradores``.
+
+    O estoque de todo o lote é validado antes de qualquer escrita; depois, numa
+    única transação, cada EPI é decrementado uma vez pelo total do lote e os
+    empréstimos são inseridos com ``bulk_create``. Se algum EPI não tiver
+    estoque suficiente nada é gravado e ValidationError é levantada.
+    Retorna a lista de empréstimos criados.
+    """
+    colaboradores = list(colaboradores)
+    epis = list(epis)
+    if not colaboradores or not epis:
+        return []
+
+    if data_prevista is None:
+        data_prevista = data_emprestimo + timedelta(days=7)
+    if data_prevista <= data_emprestimo:
+        raise ValidationError('A data prevista para devolução deve ser posterior à data de empréstimo.')
+
+    inativos = [str(c) for c in colaboradores if not c.is_ativo]
+    if inativos:
+        raise ValidationError(
+            f"Colaboradores inativos não podem realizar empréstimos: {', '.join(inativos)}."
+        )
+
+    necessario = len(colaboradores)
+    estoque_atual = dict(EPI.objects.filter(pk__in=[e.pk for e in epis]).values_list('pk', 'quantidade'))
+    faltando = [e for e in epis if estoque_atual.get(e.pk, 0) < necessario]
+    if faltando:
+        raise ValidationError([
+            f"O EPI '{e.nomeAparelho}' não tem estoque suficiente para o lote "
+            f"(disponível: {estoque_atual.get(e.pk, 0)}, necessário: {necessario})."
+            for e in faltando
+        ])
+
+    with transaction.atomic():
+        for epi in epis:
+            # o estoque pode ter mudado desde a validação acima; o UPDATE condicional decide
+            if not reservar(epi.pk, necessario):
+                raise ValidationError(
+                    f"O EPI '{epi.nomeAparelho}' ficou sem estoque suficiente durante a retirada do lote."
+                )
+        emprestimos = Emprestimo.objects.bulk_create([
+            Emprestimo(
+                colaborador=colaborador,
+                epi_nome=epi,
+                data_emprestimo=data_emprestimo,
+                data_prevista=data_prevista,
+                condicao_retirada=condicao_retirada,
+            )
+            for colaborador in colaboradores
+            for epi in epis
+        ], batch_size=500)
+        # bulk_create não chama save(): o resumo do painel, os contadores, os fragmentos
+        # e o log de alterações são atualizados aqui
+        resumo.registrar_lote(emprestimos)
+        contadores.registrar_lote(emprestimos)
+        fragmentos.invalidar(Emprestimo)
+        alteracoes.registrar(Emprestimo, [e.pk for e in emprestimos], alteracoes.CRIADO)
+    return emprestimos
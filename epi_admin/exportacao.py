@@ -0,0 +1,92 @@
+"""Exportação do histórico de empréstimos em CSV, transmitida em stream.
+
+A resposta é gerada linha a linha a partir de um iterador do banco
+(``QuerySet.iterator``), então a memória do processo não cresce com o número
+de empréstimos e o cabeçalho do CSV sai antes mesmo da consulta rodar.
+
+Exportações grandes podem ir para a fila de tarefas (``gravar_csv``, tarefa
+``exportacao``): o mesmo CSV é gravado num arquivo temporário e depois no
+storage, e o usuário o baixa pela página de tarefas.
+"""
+import csv
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .models import Emprestimo
+
+
+CABECALHO = [
+    'ID', 'Colaborador', 'CPF', 'Setor', 'EPI', 'Categoria',
+    'Data Empréstimo', 'Data Prevista', 'Data Devolução',
+    'Condição Retirada', 'Condição Devolução',
+]
+COLUNAS = [
+    'pk', 'colaborador__nome', 'colaborador__sobrenome', 'colaborador__cpf', 'colaborador__setor',
+    'epi_nome__nomeAparelho', 'epi_nome__categoria',
+    'data_emprestimo', 'data_prevista', 'data_devolucao',
+    'condicao_retirada', 'condicao_devolucao',
+]
+FORMATO_DATA = '%d/%m/%Y'
+
+
+class Echo:
+    """Objeto "arquivo" cujo write() devolve o valor, para usar csv.writer em stream."""
+
+    def write(self, value):
+        return value
+
+
+def filtrar_emprestimos(queryset, filtros):
+    """Aplica os filtros do formulário de exportação (chaves vazias são ignoradas)."""
+    if filtros.get('data_inicio'):
+        queryset = queryset.filter(data_emprestimo__gte=filtros['data_inicio'])
+    if filtros.get('data_fim'):
+        queryset = queryset.filter(data_emprestimo__lte=filtros['data_fim'])
+    if filtros.get('setor'):
+        queryset = queryset.filter(colaborador__setor=filtros['setor'])
+    if filtros.get('epi'):
+        queryset = queryset.filter(epi_nome_id=filtros['epi'])
+    if filtros.get('status') == 'abertos':
+        queryset = queryset.filter(data_devolucao__isnull=True)
+    elif filtros.get('status') == 'devolvidos':
+        queryset = queryset.filter(data_devolucao__isnull=False)
+    return queryset
+
+
+def _data(valor):
+    return valor.strftime(FORMATO_DATA) if valor else ''
+
+
+def linhas_csv(filtros, chunk_size=2000):
+    """Gera o CSV (separado por ``;``, como o Excel pt-BR espera) linha a linha."""
+    writer = csv.writer(Echo(), delimiter=';')
+    # BOM para o Excel reconhecer UTF-8
+    yield '\ufeff' + writer.writerow(CABECALHO)
+
+    queryset = filtrar_emprestimos(Emprestimo.objects.all(), filtros)
+    # values_list faz o mesmo JOIN que select_related, sem instanciar três modelos por linha
+    linhas = queryset.order_by('pk').values_list(*COLUNAS).iterator(chunk_size=chunk_size)
+    for (pk, nome, sobrenome, cpf, setor, epi, categoria,
+         data_emprestimo, data_prevista, data_devolucao, retirada, devolucao) in linhas:
+        yield writer.writerow([
+            pk, f'{nome} {sobrenome}', cpf, setor, epi, categoria,
+            _data(data_emprestimo), _data(data_prevista), _data(data_devolucao),
+            retirada, devolucao or '',
+        ])
+
+
+def gravar_csv(filtros, destino, storage=default_storage):
+    """Grava o CSV de ``filtros`` em ``destino`` no storage; retorna ``{"arquivo": nome}``.
+
+    ``filtros`` vem do JSON da tarefa (datas em ISO). Uma nova tentativa
+    substitui o arquivo de uma tentativa anterior.
+    """
+    with tempfile.TemporaryFile() as temporario:
+        for linha in linhas_csv(filtros):
+            temporario.write(linha.encode('utf-8'))
+        temporario.seek(0)
+        if storage.exists(destino):
+            storage.delete(destino)
+        return {'arquivo': storage.save(destino, File(temporario))}
@@ -1,8 +1,12 @@
 from datetime import date
 from django import forms
 from django.core.exceptions import ValidationError
-from django.contrib.auth import get_user_model
-from .models import EPI, Emprestimo, Colaborador, Gerente
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.urls import reverse_lazy
+from . import miniaturas
+from .auth_backends import usuarios_por_email
+from .models import CONDICAO_CHOICES, EPI, Emprestimo, Colaborador, Gerente
 
 
 DATE_FORMAT = '%d/%m/%y'
@@ -15,10 +19,49 @@ class ImagePreviewWidget(forms.FileInput):
     def get_context(self, name, value, attrs):
         context = super().get_context(name, value, attrs)
         if value and hasattr(value, 'url'):
-            context['widget']['image_url'] = value.url
+            # a prévia é exibida com no máximo 200px: a miniatura basta
+            context['widget']['image_url'] = miniaturas.url(value, 256)
         return context
 
 
+class AutocompleteSelect(forms.Select):
+    """Select que renderiza só as opções selecionadas; as demais vêm de um endpoint JSON.
+
+    O ModelChoiceField continua validando o valor enviado, mas a página não
+    lista mais a tabela inteira em <option>s: epi_admin/js/autocomplete.js
+    adiciona um campo de busca que consulta ``url`` (ver AutocompleteView).
+    """
+    class Media:
+        js = ('epi_admin/js/autocomplete.js',)
+
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete-url'] = str(self.url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        selecionados = [v for v in value if str(v).isdigit()]
+        opcoes = []
+        if not self.allow_multiple_selected and choices.field.empty_label is not None:
+            opcoes.append(('', choices.field.empty_label))
+        if selecionados:
+            opcoes.extend(choices.choice(obj) for obj in choices.queryset.filter(pk__in=selecionados))
+        self.choices = opcoes
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
+
+class AutocompleteSelectMultiple(AutocompleteSelect, forms.SelectMultiple):
+    pass
+
+
 class ColaboradorForm(forms.ModelForm):
     class Meta:
         model = Colaborador
@@ -61,22 +104,18 @@ class GerenteForm(forms.ModelForm):
         # normalize
         email = email.strip().lower()
 
-        # check uniqueness among Gerente (exclude self)
-        qs = Gerente.objects.filter(email__iexact=email)
-        if self.instance and self.instance.pk:
-            qs = qs.exclude(pk=self.instance.pk)
-        if qs.exists():
-            raise ValidationError('Já existe um gerente com este email.')
-
-        # check if a User exists with that email and is linked to a different Gerente
-        User = get_user_model()
-        user_qs = User.objects.filter(email__iexact=email)
-        if user_qs.exists():
-            user = user_qs.first()
-            # find gerente linked to that user (if any)
-            other = Gerente.objects.filter(user_id=user.pk).exclude(pk=getattr(self.instance, 'pk', None)).first()
-            if other:
-                raise ValidationError('Esse email já está vinculado a outro gerente.')
+        # uma consulta: outro gerente com o mesmo email, ou vinculado a um usuário com esse email
+        conflito = (
+            Gerente.objects.alias(email_lower=Lower('email'))
+            .filter(Q(email_lower=email) | Q(user__in=usuarios_por_email(email).values('pk')))
+            .exclude(pk=getattr(self.instance, 'pk', None))
+            .values_list('email', flat=True)
+            .first()
+        )
+        if conflito is not None:
+            if conflito.lower() == email:
+                raise ValidationError('Já existe um gerente com este email.')
+            raise ValidationError('Esse email já está vinculado a outro gerente.')
 
         return email
 
@@ -141,6 +180,10 @@ class EmprestimoForm(forms.ModelForm):
             'condicao_retirada': 'Condição na Retirada',
             'condicao_devolucao': 'Condição na Devolução',
         }
+        widgets = {
+            'colaborador': AutocompleteSelect(reverse_lazy('autocomplete_colaboradores')),
+            'epi_nome': AutocompleteSelect(reverse_lazy('autocomplete_epis')),
+        }
         def clean_epi_nome(self):
             """
             Valida se o EPI selecionado tem quantidade maior que zero.
@@ -172,4 +215,62 @@ class EmprestimoForm(forms.ModelForm):
                     "A data prevista para devolução deve ser posterior à data de empréstimo."
                 )
 
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+class EmprestimoLoteForm(forms.Form):
+    """Retirada de um kit de EPIs para vários colaboradores de uma só vez."""
+    colaboradores = forms.ModelMultipleChoiceField(
+        label='Colaboradores',
+        queryset=Colaborador.objects.filter(is_ativo=True),
+        widget=AutocompleteSelectMultiple(reverse_lazy('autocomplete_colaboradores'), attrs={'size': 12}),
+    )
+    epis = forms.ModelMultipleChoiceField(
+        label='EPIs do kit',
+        queryset=EPI.objects.filter(quantidade__gt=0),
+        widget=AutocompleteSelectMultiple(reverse_lazy('autocomplete_epis'), attrs={'size': 8}),
+    )
+    data_emprestimo = forms.DateField(
+        label='Data de Empréstimo',
+        input_formats=[DATE_FORMAT],
+        widget=forms.DateInput(format=DATE_FORMAT, attrs={'placeholder': 'DD/MM/YY', 'class': 'datepicker', 'autocomplete': 'off'})
+    )
+    data_prevista = forms.DateField(
+        label='Data Prevista',
+        input_formats=[DATE_FORMAT],
+        widget=forms.DateInput(format=DATE_FORMAT, attrs={'placeholder': 'DD/MM/YY', 'class': 'datepicker', 'autocomplete': 'off'})
+    )
+    condicao_retirada = forms.ChoiceField(label='Condição na Retirada', choices=CONDICAO_CHOICES, initial='BOA')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        data_emprestimo = cleaned_data.get("data_emprestimo")
+        data_prevista = cleaned_data.get("data_prevista")
+
+        if isinstance(data_emprestimo, date) and isinstance(data_prevista, date):
+            if data_prevista <= data_emprestimo:
+                raise forms.ValidationError(
+                    "A data prevista para devolução deve ser posterior à data de empréstimo."
+                )
+
+        return cleaned_data
+
+
+class ColaboradorImportForm(forms.Form):
+    arquivo = forms.FileField(
+        label='Planilha (.csv ou .xlsx)',
+        help_text='Colunas: nome, sobrenome, setor, cpf e, opcionalmente, ativo.',
+    )
+
+
+class EmprestimoExportFiltroForm(forms.Form):
+    """Filtros (via query string) da exportação CSV de empréstimos."""
+    STATUS_CHOICES = (
+        ('', 'Todos'),
+        ('abertos', 'Em aberto'),
+        ('devolvidos', 'Devolvidos'),
+    )
+    data_inicio = forms.DateField(required=False, input_formats=[DATE_FORMAT, '%Y-%m-%d'])
+    data_fim = forms.DateField(required=False, input_formats=[DATE_FORMAT, '%Y-%m-%d'])
+    setor = forms.CharField(required=False, max_length=30)
+    epi = forms.IntegerField(required=False, min_value=1)
+    status = forms.ChoiceField(required=False, choices=STATUS_CHOICES)
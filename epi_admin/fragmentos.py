@@ -0,0 +1,160 @@
+"""Cache versionado dos fragmentos HTML das listas e dos detalhes.
+
+Cada modelo exibido (Colaborador, Gerente, EPI, Emprestimo e o User dos
+gerentes) tem uma "versão" no cache, trocada pelos sinais post_save e
+post_delete e, nos caminhos que não disparam sinais (``update()`` do estoque,
+``bulk_create``/``bulk_update`` de importação, lote e provisionamento), por uma
+chamada explícita a ``invalidar``. A chave de um fragmento inclui as versões
+dos modelos de que ele depende: quando os dados mudam a chave muda, e a
+entrada antiga simplesmente deixa de ser lida até ser descartada pelo cache.
+
+A versão é um token aleatório, e não um contador: se o cache descartar a
+chave da versão (MAX_ENTRIES), um contador recomeçaria de 1 e poderia
+reencontrar fragmentos antigos; um token novo nunca coincide com um antigo.
+Dentro de uma transação a versão é trocada de novo no commit, para descartar
+o que outra requisição tenha guardado lendo o estado anterior ao commit.
+
+A versão só é confiável num cache compartilhado pelos processos (em
+arquivos, ``DJANGO_CACHE_DIR``): no cache em memória local (LocMemCache) a
+troca feita por um processo não alcança os outros, que continuariam servindo
+o fragmento antigo. Por isso, com o cache local os fragmentos não são
+guardados (``ativo``), a não ser que EPI_FRAGMENTOS_CACHE_LOCAL diga que há
+um único processo (runserver, testes).
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.views.generic.detail import SingleObjectMixin
+
+
+def ativo():
+    """Se os fragmentos vão para o cache: timeout positivo e cache compartilhado (ou um único processo)."""
+    if settings.EPI_FRAGMENTOS_TIMEOUT <= 0:
+        return False
+    if getattr(settings, 'EPI_FRAGMENTOS_CACHE_LOCAL', False):
+        return True
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def _chave_versao(model):
+    return f'fragmentos:versao:{model._meta.label_lower}'
+
+
+def _trocar(chaves):
+    cache.set_many({chave: uuid.uuid4().hex for chave in chaves}, timeout=None)
+
+
+def versoes(models):
+    """Versões atuais dos ``models``, na mesma ordem."""
+    chaves = [_chave_versao(model) for model in models]
+    atuais = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in atuais:
+            cache.add(chave, uuid.uuid4().hex, timeout=None)
+            atuais[chave] = cache.get(chave)
+    return [atuais[chave] for chave in chaves]
+
+
+def _trocar_no_commit(chaves):
+    # uma única troca agendada por transação, mesmo quando milhares de objetos
+    # são apagados em cascata (um post_delete por objeto)
+    agendada = getattr(connection, 'fragmentos_no_commit', None)
+    if agendada is not None and any(funcao is agendada for _, funcao, _ in connection.run_on_commit):
+        agendada.chaves.update(chaves)
+        return
+
+    def agendada():
+        _trocar(agendada.chaves)
+    agendada.chaves = set(chaves)
+    connection.fragmentos_no_commit = agendada
+    transaction.on_commit(agendada)
+
+
+def invalidar(*models):
+    """Descarta os fragmentos que dependem de qualquer um dos ``models``."""
+    chaves = [_chave_versao(model) for model in models]
+    _trocar(chaves)
+    if connection.in_atomic_block:
+        _trocar_no_commit(chaves)
+
+
+def variacao_usuario(request):
+    """O que, do usuário, muda as páginas: ele mesmo e suas permissões (botões de cada linha)."""
+    user = request.user
+    return [str(user.pk), str(user.is_superuser), *sorted(user.get_all_permissions())]
+
+
+def variacao_do_dia(view):
+    """A data de hoje, nas views cuja página muda com o dia (``varia_com_o_dia``, ex.: atrasos)."""
+    return [timezone.localdate().isoformat()] if getattr(view, 'varia_com_o_dia', False) else []
+
+
+def chave(nome, models, request, extra=()):
+    """Chave do fragmento ``nome`` para esta requisição.
+
+    Varia com as versões dos ``models``, com a URL (página, busca, objeto),
+    com o usuário (``variacao_usuario``) e com as partes ``extra``.
+    """
+    partes = [request.get_full_path(), *variacao_usuario(request), *extra]
+    resumo = hashlib.sha256('\n'.join(partes).encode()).hexdigest()
+    return f"fragmentos:{nome}:{':'.join(versoes(models))}:{resumo}"
+
+
+class FragmentoCacheMixin:
+    """Serve o conteúdo da página (``fragmento_template_name``) do cache.
+
+    O template da página só inclui ``{{ fragmento }}``; o fragmento recebe o
+    contexto normal da view. Em listas, um acerto dispensa todas as consultas
+    da view; em detalhes o objeto ainda é lido (404 e título da página), e o
+    cache poupa as relações e a renderização. Sem cache (``ativo``), o
+    fragmento é renderizado a cada requisição.
+    """
+    fragmento_template_name = None
+    fragmento_modelos = ()
+    fragmento_chave = None
+
+    def get(self, request, *args, **kwargs):
+        if not ativo():
+            return self.renderizar(request, *args, **kwargs)
+        # as versões entram na chave antes de qualquer consulta: um fragmento
+        # renderizado enquanto os dados mudavam fica numa versão já descartada
+        self.fragmento_chave = chave(
+            self.fragmento_template_name, self.fragmento_modelos, request, variacao_do_dia(self),
+        )
+        html = cache.get(self.fragmento_chave)
+        if html is None:
+            return self.renderizar(request, *args, **kwargs)
+        if isinstance(self, SingleObjectMixin):
+            self.object = self.get_object()
+        return self.resposta_em_cache(html)
+
+    def renderizar(self, request, *args, **kwargs):
+        """A página pela view genérica; o fragmento é guardado em ``render_to_response``."""
+        return super().get(request, *args, **kwargs)
+
+    def resposta_em_cache(self, html):
+        """A página com o fragmento ``html`` do cache (nos detalhes, ``self.object`` já foi lido)."""
+        context = {'view': self, 'fragmento': html}
+        if isinstance(self, SingleObjectMixin):
+            context['object'] = self.object
+            context[self.get_context_object_name(self.object)] = self.object
+        # sem render_to_response: o get_template_names das listas consulta object_list
+        return self.response_class(
+            request=self.request, template=[self.template_name], context=context,
+            using=self.template_engine, content_type=self.content_type,
+        )
+
+    def render_to_response(self, context, **response_kwargs):
+        if 'fragmento' not in context:
+            html = render_to_string(self.fragmento_template_name, context, self.request)
+            if self.fragmento_chave is not None:
+                cache.set(self.fragmento_chave, html, settings.EPI_FRAGMENTOS_TIMEOUT)
+            context['fragmento'] = html
+        return super().render_to_response(context, **response_kwargs)
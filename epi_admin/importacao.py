@@ -0,0 +1,203 @@
+"""Importação em massa de colaboradores a partir de planilhas CSV ou XLSX.
+
+As linhas são lidas como stream (o arquivo nunca é carregado inteiro em
+memória) e gravadas em lotes: para cada lote uma consulta por CPF (indexado)
+descobre quem já existe, e então um ``bulk_update`` e um ``bulk_create``
+gravam tudo. Linhas inválidas não interrompem a importação; elas vão para o
+relatório com o número da linha e o motivo. Isso inclui linhas de um CSV que
+não estão em UTF-8: o arquivo é lido em stream, então o erro de codificação
+vira erro daquela linha em vez de interromper a importação no meio, com os
+lotes anteriores já gravados.
+"""
+import csv
+import io
+import itertools
+import os
+import re
+import unicodedata
+
+from django import forms
+from django.db import transaction
+from django.utils import timezone
+
+from . import alteracoes, busca, fragmentos, resumo
+from .models import Colaborador
+
+
+CAMPOS_ATUALIZAVEIS = ['nome', 'sobrenome', 'setor', 'is_ativo']
+VERDADEIROS = {'', '1', 's', 'sim', 'true', 'verdadeiro', 'ativo', 'x'}
+FALSOS = {'0', 'n', 'nao', 'false', 'falso', 'inativo'}
+# bytes que não são UTF-8 viram estes "surrogates" na leitura (errors='surrogateescape')
+BYTES_INVALIDOS = re.compile('[\udc80-\udcff]')
+ERRO_CODIFICACAO = 'Caracteres inválidos: o arquivo não está em UTF-8 (salve a planilha como "CSV UTF-8").'
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).strip().lower()
+
+
+def _normalizar_cabecalho(nome):
+    nome = _normalizar(nome).replace(' ', '_')
+    return {'ativo': 'is_ativo'}.get(nome, nome)
+
+
+class ColaboradorImportacaoForm(forms.ModelForm):
+    """Valida uma linha da planilha com as mesmas regras do cadastro manual."""
+
+    class Meta:
+        model = Colaborador
+        fields = ['nome', 'sobrenome', 'setor', 'cpf', 'is_ativo']
+
+    def clean_cpf(self):
+        cpf = self.cleaned_data.get('cpf') or ''
+        if len(cpf) != 11 or not cpf.isdigit():
+            raise forms.ValidationError('CPF deve ter 11 dígitos.')
+        return cpf
+
+
+class RelatorioImportacao:
+    """Resultado de uma importação: contagens e erros por linha."""
+
+    def __init__(self):
+        self.criados = 0
+        self.atualizados = 0
+        self.erros = []
+
+    @property
+    def total_erros(self):
+        return len(self.erros)
+
+    def adicionar_erro(self, linha, mensagem):
+        self.erros.append((linha, mensagem))
+
+    def __str__(self):
+        return f"{self.criados} criados, {self.atualizados} atualizados, {self.total_erros} erros"
+
+
+def ler_csv(arquivo):
+    """Gera ``(numero_da_linha, dict)`` para cada linha de um CSV em bytes.
+
+    Aceita ``,`` ou ``;`` como separador (o Excel em pt-BR exporta com ``;``).
+    Bytes fora do UTF-8 não levantam UnicodeDecodeError no meio da leitura:
+    a linha segue com eles marcados e ``_validar_linha`` a rejeita. No
+    cabeçalho, o arquivo inteiro é recusado (ValueError) antes de gravar nada.
+    """
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', errors='surrogateescape', newline='')
+    cabecalho = texto.readline()
+    if BYTES_INVALIDOS.search(cabecalho):
+        raise ValueError(ERRO_CODIFICACAO)
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    reader = csv.reader(itertools.chain([cabecalho], texto), delimiter=separador)
+    colunas = [_normalizar_cabecalho(c) for c in next(reader, [])]
+    for numero, valores in enumerate(reader, start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, dict(zip(colunas, valores))
+
+
+def ler_xlsx(arquivo):
+    """Gera ``(numero_da_linha, dict)`` para a primeira aba de um XLSX.
+
+    Usa o modo ``read_only`` do openpyxl, que lê as linhas sob demanda.
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise ValueError('A leitura de arquivos XLSX requer o pacote openpyxl (pip install openpyxl).') from exc
+
+    workbook = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = workbook.worksheets[0].iter_rows(values_only=True)
+        colunas = [_normalizar_cabecalho(c) for c in next(linhas, ())]
+        for numero, valores in enumerate(linhas, start=2):
+            if not any(v not in (None, '') for v in valores):
+                continue
+            yield numero, {c: ('' if v is None else str(v)) for c, v in zip(colunas, valores)}
+    finally:
+        workbook.close()
+
+
+def ler_planilha(arquivo, nome):
+    """Escolhe o leitor pela extensão do arquivo (``.csv`` ou ``.xlsx``)."""
+    extensao = os.path.splitext(nome)[1].lower()
+    if extensao == '.csv':
+        return ler_csv(arquivo)
+    if extensao == '.xlsx':
+        return ler_xlsx(arquivo)
+    raise ValueError('Formato não suportado: envie um arquivo .csv ou .xlsx.')
+
+
+def _validar_linha(dados):
+    if any(BYTES_INVALIDOS.search(str(valor)) for valor in dados.values()):
+        return None, ERRO_CODIFICACAO
+    dados = dict(dados)
+    ativo = _normalizar(dados.get('is_ativo', ''))
+    if ativo not in VERDADEIROS | FALSOS:
+        return None, f"Valor inválido para ativo: '{dados.get('is_ativo')}'."
+    dados['is_ativo'] = ativo in VERDADEIROS
+    # planilhas costumam trazer o CPF formatado (123.456.789-00)
+    dados['cpf'] = re.sub(r'\D', '', str(dados.get('cpf') or ''))
+    form = ColaboradorImportacaoForm(dados)
+    if not form.is_valid():
+        erros = '; '.join(f"{campo}: {' '.join(msgs)}" for campo, msgs in form.errors.items())
+        return None, erros
+    return form.cleaned_data, None
+
+
+def _gravar_lote(lote, usuario, relatorio):
+    existentes = {}
+    for colaborador in Colaborador.objects.filter(cpf__in=list(lote)).order_by('pk'):
+        existentes.setdefault(colaborador.cpf, colaborador)
+
+    novos, alterados, mudancas_setor = [], [], {}
+    agora = timezone.now()
+    for cpf, dados in lote.items():
+        colaborador = existentes.get(cpf)
+        if colaborador is None:
+            novos.append(Colaborador(created_by=usuario, **dados))
+            continue
+        mudancas_setor[colaborador.pk] = (colaborador.setor, dados['setor'])
+        for campo in CAMPOS_ATUALIZAVEIS:
+            setattr(colaborador, campo, dados[campo])
+        colaborador.updated_at = agora  # bulk_update não aplica o auto_now
+        alterados.append(colaborador)
+
+    with transaction.atomic():
+        if alterados:
+            Colaborador.objects.bulk_update(alterados, [*CAMPOS_ATUALIZAVEIS, 'updated_at'])
+            # bulk_update não dispara post_save: mantém o resumo do painel por setor
+            resumo.mover_setor(mudancas_setor)
+        if novos:
+            Colaborador.objects.bulk_create(novos)
+        # nem bulk_update nem bulk_create disparam sinais: indexa para a busca aqui
+        busca.indexar(alterados)
+        busca.indexar(novos, novos=True)
+        fragmentos.invalidar(Colaborador)
+        alteracoes.registrar(Colaborador, [c.pk for c in alterados], alteracoes.ALTERADO)
+        alteracoes.registrar(Colaborador, [c.pk for c in novos], alteracoes.CRIADO)
+    relatorio.criados += len(novos)
+    relatorio.atualizados += len(alterados)
+
+
+def importar_colaboradores(linhas, usuario=None, batch_size=1000):
+    """Cria ou atualiza colaboradores a partir de ``linhas`` (pares número/dict).
+
+    O CPF é a chave: se já existir um colaborador com o CPF ele é atualizado,
+    senão é criado com ``created_by=usuario``. Se o mesmo CPF aparecer mais de
+    uma vez no arquivo, vale a última ocorrência.
+    """
+    relatorio = RelatorioImportacao()
+    lote = {}
+    for numero, dados in linhas:
+        validos, erro = _validar_linha(dados)
+        if erro:
+            relatorio.adicionar_erro(numero, erro)
+            continue
+        lote[validos['cpf']] = validos
+        if len(lote) >= batch_size:
+            _gravar_lote(lote, usuario, relatorio)
+            lote = {}
+    if lote:
+        _gravar_lote(lote, usuario, relatorio)
+    return relatorio
@@ -0,0 +1,153 @@
+import asyncio
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from epi_admin.models import Alteracao, Colaborador, EPI, Emprestimo
+from epi_admin.pagination import encode_cursor
+
+
+USUARIO = 'benchmark-asgi'
+
+
+def _percentil(valores, p):
+    return valores[min(len(valores) - 1, int(len(valores) * p))] * 1000 if valores else 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare WSGI and ASGI serving of the kiosk polling mix: list and detail pages (mostly conditional GETs "
+        "answered with 304) and the changes feed. WSGI runs one client per thread, like a threaded server; "
+        "ASGI runs one task per client on a single event loop, like uvicorn with one worker. "
+        "Creates a temporary superuser and session and removes them at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concorrencia", dest="concorrencia", type=int, default=50, help="Concurrent clients (default: 50)",
+        )
+        parser.add_argument(
+            "--requisicoes", dest="requisicoes", type=int, default=2000, help="Requests per mode (default: 2000)",
+        )
+        parser.add_argument(
+            "--condicionais",
+            dest="condicionais",
+            type=float,
+            default=0.8,
+            help="Fraction of page requests sent with If-None-Match (default: 0.8)",
+        )
+        parser.add_argument("--seed", dest="seed", type=int, default=0, help="Random seed (default: 0)")
+
+    # os clientes de teste do Django mandam Host: testserver
+    @override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+    def handle(self, *args, **options):
+        if options["concorrencia"] < 1 or options["requisicoes"] < 1:
+            raise CommandError("--concorrencia and --requisicoes must be positive.")
+        User = get_user_model()
+        if User.objects.filter(username=USUARIO).exists():
+            raise CommandError(f"User {USUARIO!r} already exists; remove it first.")
+
+        user = User.objects.create_superuser(USUARIO, f"{USUARIO}@benchmark.invalid", None)
+        cliente = Client()
+        try:
+            cliente.force_login(user)
+            sessao = cliente.cookies[settings.SESSION_COOKIE_NAME].value
+            etags = {}
+            for url in self._urls():
+                response = cliente.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"GET {url} returned {response.status_code}.")
+                etags[url] = response.headers.get("ETag")
+
+            rng = random.Random(options["seed"])
+            pedidos = []
+            for _ in range(options["requisicoes"]):
+                url = rng.choice(list(etags))
+                pedidos.append((url, etags[url] if rng.random() < options["condicionais"] else None))
+            # cada cliente (quiosque) faz as suas requisições em sequência
+            fatias = [pedidos[n::options["concorrencia"]] for n in range(options["concorrencia"])]
+
+            for modo, medir in (("wsgi", self._wsgi), ("asgi", self._asgi)):
+                inicio = time.perf_counter()
+                resultados = medir(fatias, sessao)
+                self._relatorio(modo, options["concorrencia"], resultados, time.perf_counter() - inicio)
+        finally:
+            cliente.logout()
+            user.delete()
+        self.stdout.write(self.style.SUCCESS("benchmark_asgi finished."))
+
+    def _urls(self):
+        urls = [reverse("colaborador_list"), reverse("epi_list"), reverse("emprestimo_list")]
+        for model, nome in ((Colaborador, "colaborador_detail"), (EPI, "epi_detail"), (Emprestimo, "emprestimo_detail")):
+            pk = model.objects.order_by("-pk").values_list("pk", flat=True).first()
+            if pk is not None:
+                urls.append(reverse(nome, args=[pk]))
+        # o feed de alterações a partir da última: o que um quiosque em dia pede
+        ultima = Alteracao.objects.aggregate(ultima=Max("pk"))["ultima"]
+        feed = reverse("api_alteracoes")
+        urls.append(f"{feed}?cursor={encode_cursor('n', [ultima])}" if ultima else feed)
+        return urls
+
+    def _wsgi(self, fatias, sessao):
+        resultados = []
+        trava = threading.Lock()
+
+        def rodar(fatia):
+            cliente = Client()
+            cliente.cookies[settings.SESSION_COOKIE_NAME] = sessao
+            locais = []
+            try:
+                for url, etag in fatia:
+                    inicio = time.perf_counter()
+                    response = cliente.get(url, headers={"if-none-match": etag} if etag else None)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                    locais.append((response.status_code, time.perf_counter() - inicio))
+            finally:
+                connections.close_all()
+            with trava:
+                resultados.extend(locais)
+
+        threads = [threading.Thread(target=rodar, args=(fatia,)) for fatia in fatias]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return resultados
+
+    def _asgi(self, fatias, sessao):
+        async def rodar(fatia):
+            cliente = AsyncClient()
+            cliente.cookies[settings.SESSION_COOKIE_NAME] = sessao
+            locais = []
+            for url, etag in fatia:
+                inicio = time.perf_counter()
+                response = await cliente.get(url, headers={"if-none-match": etag} if etag else None)
+                if response.streaming:
+                    [parte async for parte in response.streaming_content]
+                locais.append((response.status_code, time.perf_counter() - inicio))
+            return locais
+
+        async def todas():
+            return await asyncio.gather(*(rodar(fatia) for fatia in fatias))
+
+        return [resultado for locais in asyncio.run(todas()) for resultado in locais]
+
+    def _relatorio(self, modo, concorrencia, resultados, duracao):
+        latencias = sorted(t for _, t in resultados)
+        nao_modificadas = sum(1 for status, _ in resultados if status == 304)
+        erros = sum(1 for status, _ in resultados if status not in (200, 304))
+        self.stdout.write(
+            f"{modo} concurrency={concorrencia}: {len(resultados)} requests in {duracao:.1f}s "
+            f"({len(resultados) / duracao:,.0f} req/s), p50 {_percentil(latencias, 0.5):.1f} ms, "
+            f"p95 {_percentil(latencias, 0.95):.1f} ms, p99 {_percentil(latencias, 0.99):.1f} ms, "
+            f"{nao_modificadas} 304s, {erros} errors"
+        )
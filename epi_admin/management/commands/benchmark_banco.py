@@ -0,0 +1,109 @@
+import multiprocessing
+import random
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from epi_admin.models import EPI, Colaborador, Emprestimo
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for the configured database profile (DJANGO_DB_PROFILE): "
+        "worker processes (like gunicorn workers) mix loan checkouts/returns and admin-style edits with list reads and count 'database is locked' errors. "
+        "Writes benchmark rows and removes them at the end; point DJANGO_DB_NAME at a copy of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", dest="workers", type=int, default=8, help="Concurrent workers (default: 8)")
+        parser.add_argument("--segundos", dest="segundos", type=float, default=10, help="Duration in seconds (default: 10)")
+        parser.add_argument(
+            "--escritas",
+            dest="escritas",
+            type=float,
+            default=0.2,
+            help="Fraction of operations that write (default: 0.2)",
+        )
+        parser.add_argument("--seed", dest="seed", type=int, default=0, help="Random seed (default: 0)")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["segundos"] <= 0:
+            raise CommandError("--workers and --segundos must be positive.")
+
+        epi = EPI.objects.create(nomeAparelho="Benchmark", validade=date(2100, 1, 1), quantidade=1_000_000)
+        colaborador = Colaborador.objects.create(nome="Benchmark", sobrenome="Concorrência", setor="Benchmark", cpf="00000000000")
+        # cada processo abre a própria conexão; a herdada do pai não pode ser compartilhada
+        connections.close_all()
+
+        fila = multiprocessing.get_context("fork").Queue()
+        fim = time.monotonic() + options["segundos"]
+        processos = [
+            multiprocessing.get_context("fork").Process(
+                target=self._worker,
+                args=(options["seed"] + n, fim, options["escritas"], epi.pk, colaborador.pk, fila),
+            )
+            for n in range(options["workers"])
+        ]
+        inicio = time.monotonic()
+        for processo in processos:
+            processo.start()
+        resultados = []
+        for _ in processos:
+            resultados.extend(fila.get())
+        for processo in processos:
+            processo.join()
+        duracao = time.monotonic() - inicio
+
+        try:
+            Emprestimo.objects.filter(colaborador_id=colaborador.pk).delete()
+            Colaborador.objects.filter(pk=colaborador.pk).delete()
+            EPI.objects.filter(pk=epi.pk).delete()
+        except OperationalError as exc:
+            self.stderr.write(f"Could not remove benchmark rows: {exc}")
+
+        latencias = sorted(t for ok, t, _ in resultados if ok)
+        bloqueios = sum(1 for ok, _, erro in resultados if not ok and "locked" in erro)
+        outros = sum(1 for ok, _, erro in resultados if not ok and "locked" not in erro)
+        p95 = latencias[int(len(latencias) * 0.95) - 1] * 1000 if latencias else 0
+        perfil = getattr(settings, "DB_PROFILE", "sqlite")
+        self.stdout.write(
+            f"profile={perfil} workers={options['workers']}: {len(latencias)} ops in {duracao:.1f}s "
+            f"({len(latencias) / duracao:,.0f} ops/s, p95 {p95:.1f} ms), "
+            f"{bloqueios} 'database is locked' errors, {outros} other errors"
+        )
+        self.stdout.write(self.style.SUCCESS("benchmark_banco finished."))
+
+    def _worker(self, seed, fim, escritas, epi_id, colaborador_id, fila):
+        rng = random.Random(seed)
+        locais = []
+        try:
+            while time.monotonic() < fim:
+                inicio = time.perf_counter()
+                try:
+                    sorteio = rng.random()
+                    if sorteio < escritas / 2:
+                        # como o change_view do admin: lê e grava dentro da mesma transação
+                        with transaction.atomic():
+                            obj = Colaborador.objects.get(pk=colaborador_id)
+                            obj.nome = f"Benchmark {rng.randrange(1000)}"
+                            obj.save()
+                    elif sorteio < escritas:
+                        emprestimo = Emprestimo.objects.create(
+                            colaborador_id=colaborador_id, epi_nome_id=epi_id, data_emprestimo=date.today(),
+                        )
+                        emprestimo.data_devolucao = date.today()
+                        emprestimo.condicao_devolucao = "BOA"
+                        emprestimo.save()
+                    else:
+                        list(Emprestimo.objects.select_related("colaborador", "epi_nome").order_by("-pk")[:25])
+                        EPI.objects.get(pk=epi_id)
+                except OperationalError as exc:
+                    locais.append((False, time.perf_counter() - inicio, str(exc)))
+                else:
+                    locais.append((True, time.perf_counter() - inicio, ""))
+        finally:
+            connections.close_all()
+            fila.put(locais)
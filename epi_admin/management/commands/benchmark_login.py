@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from epi_admin.auth_backends import EmailBackend, usuarios_por_email
+
+
+SENHA = 'benchmark-login'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure email login throughput with 10k/100k/1M synthetic users. "
+        "Users are created inside a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--usuarios",
+            dest="usuarios",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="User table sizes to measure (default: 10000 100000 1000000)",
+        )
+        parser.add_argument(
+            "--consultas",
+            dest="consultas",
+            type=int,
+            default=2000,
+            help="Email lookups per size, half of them for unknown emails (default: 2000)",
+        )
+        parser.add_argument(
+            "--logins",
+            dest="logins",
+            type=int,
+            default=20,
+            help="Full authenticate() calls per size, including password hashing (default: 20)",
+        )
+        parser.add_argument("--seed", dest="seed", type=int, default=0, help="Random seed (default: 0)")
+
+    def handle(self, *args, **options):
+        tamanhos = sorted(options["usuarios"])
+        if not tamanhos or tamanhos[0] < 1:
+            raise CommandError("--usuarios must be positive numbers.")
+        rng = random.Random(options["seed"])
+        User = get_user_model()
+        backend = EmailBackend()
+        senha_hash = make_password(SENHA)
+
+        with transaction.atomic():
+            criados = 0
+            for tamanho in tamanhos:
+                self.stdout.write(f"Creating users up to {tamanho}...")
+                for inicio in range(criados, tamanho, 5000):
+                    User.objects.bulk_create([
+                        User(username=f"bench{i}", email=f"bench{i}@benchmark.invalid", password=senha_hash)
+                        for i in range(inicio, min(inicio + 5000, tamanho))
+                    ])
+                criados = tamanho
+
+                # metade conhecidos (com maiúsculas, como digitados no login), metade desconhecidos
+                emails = [
+                    f"Bench{rng.randrange(tamanho)}@Benchmark.invalid" if n % 2 else f"ninguem{n}@benchmark.invalid"
+                    for n in range(options["consultas"])
+                ]
+                inicio = time.perf_counter()
+                for email in emails:
+                    list(usuarios_por_email(email)[:2])
+                consulta = (time.perf_counter() - inicio) / max(len(emails), 1)
+
+                inicio = time.perf_counter()
+                for _ in range(options["logins"]):
+                    email = f"BENCH{rng.randrange(tamanho)}@benchmark.invalid"
+                    if backend.authenticate(None, username=email, password=SENHA) is None:
+                        raise CommandError(f"Login failed for {email}.")
+                login = (time.perf_counter() - inicio) / max(options["logins"], 1)
+
+                self.stdout.write(
+                    f"{tamanho:>9} users: lookup {consulta * 1000:.3f} ms ({1 / consulta if consulta else 0:,.0f}/s), "
+                    f"login {login * 1000:.1f} ms ({1 / login if login else 0:,.1f}/s)"
+                )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("benchmark_login finished (synthetic users rolled back)."))
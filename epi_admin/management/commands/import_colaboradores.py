@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from epi_admin.importacao import importar_colaboradores, ler_planilha
+
+
+class Command(BaseCommand):
+    help = "Import colaboradores from a CSV or XLSX spreadsheet, upserting by CPF."
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Path to a .csv or .xlsx file (columns: nome, sobrenome, setor, cpf, ativo)")
+        parser.add_argument(
+            "--usuario",
+            dest="usuario",
+            help="Username or email recorded as created_by for new colaboradores",
+        )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=1000,
+            help="Rows written per bulk_create/bulk_update batch (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options.get("usuario"):
+            User = get_user_model()
+            login = options["usuario"]
+            usuario = User.objects.filter(username=login).first() or User.objects.filter(email__iexact=login).first()
+            if usuario is None:
+                raise CommandError(f"User not found: {login}")
+
+        caminho = options["arquivo"]
+        try:
+            with open(caminho, "rb") as arquivo:
+                relatorio = importar_colaboradores(
+                    ler_planilha(arquivo, caminho), usuario=usuario, batch_size=options["batch_size"]
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for linha, mensagem in relatorio.erros:
+            self.stdout.write(self.style.WARNING(f"Linha {linha}: {mensagem}"))
+        self.stdout.write(self.style.SUCCESS(f"import_colaboradores finished: {relatorio}"))
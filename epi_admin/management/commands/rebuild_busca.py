@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from epi_admin import busca, tarefas
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index (TermoBusca) for Colaborador and EPI."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--enfileirar",
+            action="store_true",
+            dest="enfileirar",
+            help="Queue the rebuild for run_worker instead of running it now",
+        )
+
+    def handle(self, *args, **options):
+        if options["enfileirar"]:
+            tarefa = tarefas.enfileirar("busca")
+            self.stdout.write(self.style.SUCCESS(f"rebuild_busca queued as task #{tarefa.pk}."))
+            return
+        termos = busca.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"rebuild_busca finished: {termos} search terms."))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from epi_admin import contadores, tarefas
+
+
+def _formatar(contadores_):
+    total, abertos, mais_antiga = contadores_
+    return f"total={total} open={abertos} oldest_due={mais_antiga or '-'}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the per-colaborador and per-EPI loan counters (open, total, oldest due date) against the "
+        "Emprestimo table and fix the rows that diverge."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verificar",
+            action="store_true",
+            dest="verificar",
+            help="Only report the diverging rows (exits with an error if there are any); change nothing",
+        )
+        parser.add_argument(
+            "--enfileirar",
+            action="store_true",
+            dest="enfileirar",
+            help="Queue the rebuild for run_worker instead of running it now",
+        )
+
+    def handle(self, *args, **options):
+        if options["enfileirar"]:
+            tarefa = tarefas.enfileirar("contadores")
+            self.stdout.write(self.style.SUCCESS(f"rebuild_contadores_emprestimos queued as task #{tarefa.pk}."))
+            return
+        if options["verificar"]:
+            total = 0
+            for model, _ in contadores.ALVOS:
+                for objeto, esperado in contadores.divergencias(model):
+                    atual = (objeto.emprestimos_total, objeto.emprestimos_abertos, objeto.prevista_mais_antiga)
+                    self.stdout.write(
+                        f"{model._meta.model_name} #{objeto.pk}: {_formatar(atual)}, expected {_formatar(esperado)}"
+                    )
+                    total += 1
+            if total:
+                raise CommandError(f"{total} row(s) with wrong loan counters; run without --verificar to fix them.")
+            self.stdout.write(self.style.SUCCESS("rebuild_contadores_emprestimos: all loan counters match."))
+            return
+        corrigidos = contadores.reconstruir()
+        resumo = ", ".join(f"{n} {nome}(s)" for nome, n in corrigidos.items())
+        self.stdout.write(self.style.SUCCESS(f"rebuild_contadores_emprestimos finished: fixed {resumo}."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from epi_admin import resumo, tarefas
+
+
+class Command(BaseCommand):
+    help = "Rebuild the overdue-loans dashboard summary (ResumoEmprestimo) from the Emprestimo table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--enfileirar",
+            action="store_true",
+            dest="enfileirar",
+            help="Queue the rebuild for run_worker instead of running it now",
+        )
+
+    def handle(self, *args, **options):
+        if options["enfileirar"]:
+            tarefa = tarefas.enfileirar("resumo")
+            self.stdout.write(self.style.SUCCESS(f"rebuild_resumo_emprestimos queued as task #{tarefa.pk}."))
+            return
+        linhas = resumo.reconstruir(timezone.localdate())
+        self.stdout.write(self.style.SUCCESS(f"rebuild_resumo_emprestimos finished: {linhas} summary rows."))
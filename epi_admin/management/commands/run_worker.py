@@ -0,0 +1,96 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+
+from epi_admin import tarefas
+
+
+# segundos entre as buscas por tarefas de workers que morreram
+RECUPERACAO = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background tasks from the database queue (epi_admin.tarefas): thumbnails, background CSV exports, "
+        "expiry digests and rebuilds. Runs until SIGINT/SIGTERM, finishing the tasks in progress; "
+        "with --once, exits when the queue is empty."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", dest="threads", type=int, default=1, help="Tasks run in parallel (default: 1)")
+        parser.add_argument(
+            "--tipos",
+            dest="tipos",
+            nargs="+",
+            choices=sorted(tarefas.TIPOS),
+            help="Only run these task types (default: all)",
+        )
+        parser.add_argument(
+            "--intervalo",
+            dest="intervalo",
+            type=float,
+            default=2.0,
+            help="Seconds between polls when the queue is empty (default: 2)",
+        )
+        parser.add_argument("--once", action="store_true", dest="once", help="Exit when there is nothing left to run")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["intervalo"] <= 0:
+            raise CommandError("--threads and --intervalo must be positive.")
+        parar = threading.Event()
+        if not options["once"]:
+            for sinal in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sinal, lambda *_: parar.set())
+
+        tarefas.recuperar_expiradas()
+        prefixo = f"{socket.gethostname()}:{os.getpid()}"
+        contagens = [0] * options["threads"]
+        threads = [
+            threading.Thread(
+                target=self._rodar,
+                args=(f"{prefixo}:{n}", options["tipos"], options["intervalo"], options["once"], parar, contagens, n),
+            )
+            for n in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        # a thread principal só espera (e recebe os sinais); de tempos em tempos recupera tarefas de workers mortos
+        proxima_recuperacao = time.monotonic() + RECUPERACAO
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+            if time.monotonic() >= proxima_recuperacao and not parar.is_set():
+                proxima_recuperacao = time.monotonic() + RECUPERACAO
+                try:
+                    tarefas.recuperar_expiradas()
+                except OperationalError as exc:
+                    self.stderr.write(f"Could not recover expired tasks: {exc}")
+        connections.close_all()
+        self.stdout.write(self.style.SUCCESS(f"run_worker finished: {sum(contagens)} task(s) run."))
+
+    def _rodar(self, trabalhador, tipos, intervalo, once, parar, contagens, n):
+        try:
+            while not parar.is_set():
+                close_old_connections()
+                try:
+                    tarefa = tarefas.reivindicar(trabalhador, tipos)
+                except OperationalError as exc:
+                    # "database is locked" no SQLite: outro worker está gravando
+                    self.stderr.write(f"{trabalhador}: {exc}")
+                    parar.wait(intervalo)
+                    continue
+                if tarefa is None:
+                    if once:
+                        return
+                    parar.wait(intervalo)
+                    continue
+                tarefas.executar(tarefa)
+                contagens[n] += 1
+                self.stdout.write(f"{trabalhador}: #{tarefa.pk} {tarefa.tipo} {tarefa.status}")
+        finally:
+            connections.close_all()
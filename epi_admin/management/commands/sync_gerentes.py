@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from epi_admin import provisionamento
+from epi_admin.models import Gerente
+
+
+class Command(BaseCommand):
+    help = "Reconcile every Gerente with its login user (email, link and 'Gerentes' group membership)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-create",
+            action="store_false",
+            dest="criar_usuarios",
+            help="Do not create users for gerentes without one; only link and update existing users",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            help="Report what would change and roll everything back",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            relatorio = provisionamento.sincronizar(
+                Gerente.objects.order_by("pk"), criar_usuarios=options["criar_usuarios"]
+            )
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+
+        for gerente, motivo in relatorio.conflitos:
+            self.stdout.write(self.style.WARNING(f"{gerente.email}: {motivo}"))
+        for gerente in relatorio.sem_usuario:
+            self.stdout.write(f"{gerente.email}: no user (run without --no-create to create it)")
+        prefixo = "sync_gerentes dry run" if options["dry_run"] else "sync_gerentes finished"
+        self.stdout.write(self.style.SUCCESS(f"{prefixo}: {relatorio}"))
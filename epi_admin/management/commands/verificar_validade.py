@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from epi_admin import tarefas
+from epi_admin.validade import coletar_alertas, enviar_alertas
+
+
+class Command(BaseCommand):
+    help = "Send each gerente one digest of expired or soon-to-expire EPIs (in stock and on open loans)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            dest="dias",
+            type=int,
+            default=30,
+            help="Include EPIs expiring within this many days (default: 30)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            help="Only print the digests instead of sending them",
+        )
+        parser.add_argument(
+            "--enfileirar",
+            action="store_true",
+            dest="enfileirar",
+            help="Queue the check for run_worker (retried if sending fails) instead of running it now",
+        )
+
+    def handle(self, *args, **options):
+        if options["enfileirar"]:
+            tarefa = tarefas.enfileirar("validade", {"dias": options["dias"]})
+            self.stdout.write(self.style.SUCCESS(f"verificar_validade queued as task #{tarefa.pk}."))
+            return
+        hoje = timezone.localdate()
+        alertas = coletar_alertas(hoje, options["dias"])
+        if not alertas:
+            self.stdout.write("No EPIs expiring in the given window.")
+            return
+
+        if options["dry_run"]:
+            for alerta in alertas.values():
+                self.stdout.write(f"To: {alerta.email}\nSubject: {alerta.assunto()}\n\n{alerta.corpo(hoje)}\n")
+            return
+
+        enviados = enviar_alertas(alertas, hoje)
+        self.stdout.write(self.style.SUCCESS(f"verificar_validade finished: {enviados} digest(s) sent."))
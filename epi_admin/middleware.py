@@ -0,0 +1,117 @@
+"""Instrumentação de requisições: consultas SQL e tempos, no header Server-Timing.
+
+Ativada por ``settings.EPI_INSTRUMENTACAO`` (variável de ambiente
+``EPI_INSTRUMENTACAO=1``). Para cada requisição mede:
+
+- ``db``: número de consultas e tempo total de SQL (``execute_wrapper``);
+- ``view``: tempo da view, até ela devolver a resposta;
+- ``tpl``: renderização de TemplateResponse (que acontece depois da view);
+- ``total``: a requisição inteira, a partir deste middleware.
+
+Requisições acima de ``EPI_INSTRUMENTACAO_LIMITE_MS`` geram uma linha de log
+JSON no logger ``epi_admin.performance`` com as consultas mais repetidas (o
+SQL vem parametrizado, então um N+1 aparece como o mesmo texto N vezes).
+
+O custo por consulta é um ``perf_counter`` e um incremento num Counter; os
+parâmetros nunca são guardados.
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('epi_admin.performance')
+
+
+class _Medicao:
+    __slots__ = ('consultas', 'tempo_sql', 'inicio_view', 'fim_view', 'tempo_template', 'sql')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.inicio_view = None
+        self.fim_view = None
+        self.tempo_template = 0.0
+        self.sql = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo_sql += time.perf_counter() - inicio
+            self.consultas += 1
+            self.sql[sql] += 1
+
+
+class InstrumentacaoMiddleware:
+    """Mede SQL, view e template de cada requisição (ver docstring do módulo).
+
+    Deve ser o primeiro da lista MIDDLEWARE para que ``total`` cubra os demais.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'EPI_INSTRUMENTACAO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limite = getattr(settings, 'EPI_INSTRUMENTACAO_LIMITE_MS', 500) / 1000
+        self.top_sql = getattr(settings, 'EPI_INSTRUMENTACAO_TOP_SQL', 5)
+
+    def __call__(self, request):
+        medicao = request._instrumentacao = _Medicao()
+        inicio = time.perf_counter()
+        with ExitStack() as stack:
+            for conexao in connections.all():
+                stack.enter_context(conexao.execute_wrapper(medicao))
+            response = self.get_response(request)
+        total = time.perf_counter() - inicio
+
+        view = ((medicao.fim_view or time.perf_counter()) - medicao.inicio_view) if medicao.inicio_view else 0.0
+        metricas = [
+            ('db', medicao.tempo_sql, f'{medicao.consultas} consultas'),
+            ('view', view, None),
+            ('tpl', medicao.tempo_template, None),
+            ('total', total, None),
+        ]
+        response['Server-Timing'] = ', '.join(
+            f'{nome};dur={tempo * 1000:.1f}' + (f';desc="{desc}"' if desc else '')
+            for nome, tempo, desc in metricas
+        )
+        if total >= self.limite:
+            self._registrar_lenta(request, response, medicao, metricas)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._instrumentacao.inicio_view = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        medicao = request._instrumentacao
+        # chamado logo depois da view e logo antes de response.render()
+        medicao.fim_view = inicio_render = time.perf_counter()
+
+        def fim_render(rendered):
+            medicao.tempo_template += time.perf_counter() - inicio_render
+
+        response.add_post_render_callback(fim_render)
+        return response
+
+    def _registrar_lenta(self, request, response, medicao, metricas):
+        repetidas = [
+            {'sql': sql, 'vezes': vezes}
+            for sql, vezes in medicao.sql.most_common(self.top_sql) if vezes > 1
+        ]
+        match = getattr(request, 'resolver_match', None)
+        logger.warning('requisicao_lenta %s', json.dumps({
+            'metodo': request.method,
+            'caminho': request.path,
+            'rota': match.view_name if match else None,
+            'status': response.status_code,
+            'consultas': medicao.consultas,
+            **{f'{nome}_ms': round(tempo * 1000, 1) for nome, tempo, _ in metricas},
+            'sql_repetido': repetidas,
+        }, ensure_ascii=False))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epi_admin', '0005_colaborador_is_ativo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='colaborador',
+            name='cpf',
+            field=models.CharField(db_index=True, max_length=11),
+        ),
+    ]
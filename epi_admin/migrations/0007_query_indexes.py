@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:50
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+USER_EMAIL_INDEX = 'auth_user_email_lower_idx'
+
+
+def create_user_email_index(apps, schema_editor):
+    """Expression index on LOWER(email) for the (swappable) user table.
+
+    The user model belongs to another app, so it cannot get a Meta index from here.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(USER_EMAIL_INDEX)} "
+        f"ON {schema_editor.quote_name(User._meta.db_table)} (LOWER({schema_editor.quote_name('email')}))"
+    )
+
+
+def drop_user_email_index(apps, schema_editor):
+    schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(USER_EMAIL_INDEX)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epi_admin', '0006_colaborador_cpf_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='epi',
+            name='validade',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='colaborador',
+            index=models.Index(condition=models.Q(('is_ativo', True)), fields=['nome', 'sobrenome'], name='colaborador_ativo_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(condition=models.Q(('data_devolucao__isnull', True)), fields=['data_prevista'], name='emprestimo_aberto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['data_emprestimo'], name='emprestimo_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gerente',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='gerente_email_lower_idx'),
+        ),
+        migrations.RunPython(create_user_email_index, drop_user_email_index),
+    ]
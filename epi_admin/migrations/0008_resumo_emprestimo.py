@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def popular_resumo(apps, schema_editor):
+    """Preenche o resumo com os empréstimos já existentes (em aberto e devolvidos hoje)."""
+    from collections import Counter
+    from datetime import date, timedelta
+
+    from django.db.models import Count
+
+    Emprestimo = apps.get_model('epi_admin', 'Emprestimo')
+    ResumoEmprestimo = apps.get_model('epi_admin', 'ResumoEmprestimo')
+
+    linhas = Counter()
+    abertos = (
+        Emprestimo.objects.filter(data_devolucao__isnull=True)
+        .values('colaborador__setor', 'epi_nome_id', 'data_emprestimo', 'data_prevista')
+        .annotate(n=Count('pk'))
+    )
+    for linha in abertos:
+        data = linha['data_prevista'] or linha['data_emprestimo'] + timedelta(days=7)
+        linhas[(linha['colaborador__setor'], linha['epi_nome_id'], data, 'abertos')] += linha['n']
+    devolvidos = (
+        Emprestimo.objects.filter(data_devolucao__gte=date.today())
+        .values('colaborador__setor', 'epi_nome_id', 'data_devolucao')
+        .annotate(n=Count('pk'))
+    )
+    for linha in devolvidos:
+        linhas[(linha['colaborador__setor'], linha['epi_nome_id'], linha['data_devolucao'], 'devolvidos')] += linha['n']
+
+    objetos = {}
+    for (setor, epi_id, data, campo), n in linhas.items():
+        resumo = objetos.setdefault((setor, epi_id, data), ResumoEmprestimo(setor=setor, epi_id=epi_id, data=data))
+        setattr(resumo, campo, n)
+    ResumoEmprestimo.objects.bulk_create(objetos.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epi_admin', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoEmprestimo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('setor', models.CharField(max_length=30)),
+                ('data', models.DateField()),
+                ('abertos', models.IntegerField(default=0)),
+                ('devolvidos', models.IntegerField(default=0)),
+                ('epi', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='epi_admin.epi')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['data'], name='resumo_emprestimo_data_idx'), models.Index(condition=models.Q(('abertos__gt', 0)), fields=['setor'], name='resumo_emprestimo_abertos_idx')],
+                'constraints': [models.UniqueConstraint(fields=('setor', 'epi', 'data'), name='resumo_emprestimo_unico')],
+            },
+        ),
+        migrations.RunPython(popular_resumo, migrations.RunPython.noop),
+    ]
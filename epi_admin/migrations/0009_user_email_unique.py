@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+OLD_INDEX = 'auth_user_email_lower_idx'
+UNIQUE_INDEX = 'auth_user_email_lower_uniq'
+
+
+def create_unique_email_index(apps, schema_editor):
+    """Replace the plain LOWER(email) index from 0007 with a unique partial one.
+
+    Users without email ('') are left out of the index, so accounts created
+    without one keep working. Duplicate emails must be fixed by hand first.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    duplicados = list(
+        User.objects.exclude(email='').annotate(email_lower=Lower('email'))
+        .values('email_lower').annotate(n=Count('pk')).filter(n__gt=1)
+        .values_list('email_lower', flat=True)[:20]
+    )
+    if duplicados:
+        raise RuntimeError(
+            'Há usuários com o mesmo email (sem diferenciar maiúsculas); corrija antes de migrar: '
+            + ', '.join(duplicados)
+        )
+    quote = schema_editor.quote_name
+    schema_editor.execute(f"DROP INDEX IF EXISTS {quote(OLD_INDEX)}")
+    schema_editor.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {quote(UNIQUE_INDEX)} "
+        f"ON {quote(User._meta.db_table)} (LOWER({quote('email')})) WHERE {quote('email')} > ''"
+    )
+
+
+def drop_unique_email_index(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    quote = schema_editor.quote_name
+    schema_editor.execute(f"DROP INDEX IF EXISTS {quote(UNIQUE_INDEX)}")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {quote(OLD_INDEX)} "
+        f"ON {quote(User._meta.db_table)} (LOWER({quote('email')}))"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epi_admin', '0008_resumo_emprestimo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_unique_email_index, drop_unique_email_index),
+    ]
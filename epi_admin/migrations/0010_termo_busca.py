@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+def popular_termos(apps, schema_editor):
+    """Indexa os colaboradores e EPIs já existentes (mesma normalização de epi_admin.busca)."""
+    import re
+    import unicodedata
+
+    TermoBusca = apps.get_model('epi_admin', 'TermoBusca')
+
+    def palavras(texto):
+        texto = unicodedata.normalize('NFKD', str(texto or ''))
+        texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+        texto = re.sub(r'(?<=\d)[.\-/](?=\d)', '', texto)
+        return {p[:50] for p in re.findall(r'[a-z0-9]+', texto)}
+
+    for modelo, campos in (('colaborador', ('nome', 'sobrenome', 'setor', 'cpf')), ('epi', ('nomeAparelho', 'categoria'))):
+        Model = apps.get_model('epi_admin', modelo)
+        termos = (
+            TermoBusca(modelo=modelo, objeto_id=linha[0], termo=termo)
+            for linha in Model.objects.values_list('pk', *campos).iterator(chunk_size=5000)
+            for termo in set().union(*(palavras(valor) for valor in linha[1:]))
+        )
+        TermoBusca.objects.bulk_create(termos, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epi_admin', '0009_user_email_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=20)),
+                ('objeto_id', models.IntegerField()),
+                ('termo', models.CharField(max_length=50)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['modelo', 'termo', 'objeto_id'], name='termo_busca_termo_idx'), models.Index(fields=['modelo', 'objeto_id'], name='termo_busca_objeto_idx')],
+            },
+        ),
+        migrations.RunPython(popular_termos, migrations.RunPython.noop),
+    ]
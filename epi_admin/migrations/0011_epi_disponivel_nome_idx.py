@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epi_admin', '0010_termo_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='epi',
+            index=models.Index(condition=models.Q(('quantidade__gt', 0)), fields=['nomeAparelho'], name='epi_disponivel_nome_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epi_admin', '0012_created_at_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alteracao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=20)),
+                ('objeto_id', models.IntegerField()),
+                ('operacao', models.CharField(choices=[('CRIADO', 'Criado'), ('ALTERADO', 'Alterado'), ('APAGADO', 'Apagado')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
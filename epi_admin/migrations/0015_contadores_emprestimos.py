@@ -0,0 +1,103 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def popular_contadores(apps, schema_editor):
+    """Calcula os contadores de empréstimos dos colaboradores e EPIs já existentes."""
+    from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+    from django.db.models.functions import Coalesce
+
+    Emprestimo = apps.get_model('epi_admin', 'Emprestimo')
+    em_aberto = Q(data_devolucao__isnull=True)
+    for nome, campo in (('Colaborador', 'colaborador'), ('EPI', 'epi_nome')):
+        def contagem(*filtros):
+            return Coalesce(Subquery(
+                Emprestimo.objects.filter(*filtros, **{campo: OuterRef('pk')}).order_by()
+                .values(campo).annotate(n=Count('pk')).values('n'),
+                output_field=IntegerField(),
+            ), Value(0))
+
+        apps.get_model('epi_admin', nome).objects.update(
+            emprestimos_total=contagem(),
+            emprestimos_abertos=contagem(em_aberto),
+            prevista_mais_antiga=Subquery(
+                Emprestimo.objects.filter(em_aberto, **{campo: OuterRef('pk')}, data_prevista__isnull=False)
+                .order_by('data_prevista').values('data_prevista')[:1]
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epi_admin', '0014_tarefa'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='colaborador',
+            name='emprestimos_abertos',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='colaborador',
+            name='emprestimos_total',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='colaborador',
+            name='prevista_mais_antiga',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='epi',
+            name='emprestimos_abertos',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='epi',
+            name='emprestimos_total',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='epi',
+            name='prevista_mais_antiga',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='colaborador',
+            index=models.Index(fields=['emprestimos_abertos', 'id'], name='colaborador_abertos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='colaborador',
+            index=models.Index(fields=['emprestimos_total', 'id'], name='colaborador_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='colaborador',
+            index=models.Index(condition=models.Q(('prevista_mais_antiga__isnull', False)), fields=['prevista_mais_antiga'], name='colaborador_atraso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(condition=models.Q(('data_devolucao__isnull', True)), fields=['colaborador', 'data_prevista'], name='emprestimo_aberto_colab_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(condition=models.Q(('data_devolucao__isnull', True)), fields=['epi_nome', 'data_prevista'], name='emprestimo_aberto_epi_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='epi',
+            index=models.Index(fields=['emprestimos_abertos', 'id'], name='epi_abertos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='epi',
+            index=models.Index(fields=['emprestimos_total', 'id'], name='epi_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='epi',
+            index=models.Index(condition=models.Q(('prevista_mais_antiga__isnull', False)), fields=['prevista_mais_antiga'], name='epi_atraso_idx'),
+        ),
+        migrations.RunPython(popular_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+"""Miniaturas das fotos de colaboradores, gerentes e EPIs.
+
+As fotos enviadas costumam ser fotos de celular de vários MB; as páginas só
+precisam de versões pequenas. Para cada foto geramos miniaturas JPEG em
+tamanhos fixos, gravadas ao lado do original (``foto.png`` ->
+``foto.png.256px.jpg``; o nome mantém a extensão do original para que
+``foto.png`` e ``foto.jpg`` da mesma pasta não dividam a miniatura, que o
+navegador guarda como imutável). O upload enfileira a geração (tarefa ``miniaturas`` de
+``epi_admin.tarefas``, executada pelo ``run_worker``) e, se a miniatura ainda
+não existir quando a página pedir, ela é feita na primeira requisição da
+própria miniatura (nunca durante a renderização da página).
+"""
+import io
+import os
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from . import tarefas
+
+# só os tamanhos que as páginas usam (o detalhe mostra a foto com 256 px)
+TAMANHOS = (256,)
+# Diretórios (upload_to) das fotos que podem ter miniatura
+DIRETORIOS = ('static/fotos_colaboradores/', 'static/fotos_gerentes/', 'static/fotos_epi/')
+QUALIDADE_JPEG = 85
+_MINIATURA = re.compile(r'\.\d+px\.jpg$')
+
+
+def nome_miniatura(nome, tamanho):
+    return f'{nome}.{tamanho}px.jpg'
+
+
+def nome_permitido(nome):
+    """True se ``nome`` é uma foto original de um dos diretórios de upload."""
+    normalizado = os.path.normpath(nome).replace(os.sep, '/')
+    return normalizado == nome and nome.startswith(DIRETORIOS) and not _MINIATURA.search(nome)
+
+
+def gerar(nome, tamanhos=TAMANHOS, storage=default_storage):
+    """Gera as miniaturas que ainda não existem para a foto ``nome``.
+
+    Retorna os nomes das miniaturas disponíveis. Levanta OSError se o original
+    não existir e UnidentifiedImageError se não for uma imagem.
+    """
+    faltando = [t for t in tamanhos if not storage.exists(nome_miniatura(nome, t))]
+    if faltando:
+        with storage.open(nome, 'rb') as arquivo:
+            with Image.open(arquivo) as imagem:
+                # fotos de celular vêm "deitadas" com a rotação só no EXIF
+                original = ImageOps.exif_transpose(imagem)
+                if original.mode not in ('RGB', 'L'):
+                    rgba = original.convert('RGBA')
+                    original = Image.new('RGB', rgba.size, 'white')
+                    original.paste(rgba, mask=rgba.getchannel('A'))
+                for tamanho in sorted(faltando, reverse=True):
+                    miniatura = original.copy()
+                    miniatura.thumbnail((tamanho, tamanho))
+                    buffer = io.BytesIO()
+                    miniatura.save(buffer, format='JPEG', quality=QUALIDADE_JPEG, optimize=True)
+                    destino = nome_miniatura(nome, tamanho)
+                    # save() renomearia se outro processo gerou a mesma miniatura nesse meio-tempo
+                    if not storage.exists(destino):
+                        storage.save(destino, ContentFile(buffer.getvalue()))
+    return [nome_miniatura(nome, t) for t in tamanhos]
+
+
+def agendar(nome, storage=default_storage):
+    """Enfileira a geração das miniaturas de ``nome`` (vale se a transação do upload fizer commit).
+
+    Nada a fazer se elas já existem: o post_save dispara a cada edição do
+    objeto, não só quando a foto muda.
+    """
+    if not all(storage.exists(nome_miniatura(nome, t)) for t in TAMANHOS):
+        tarefas.enfileirar('miniaturas', {'nome': nome})
+
+
+def url(foto, tamanho):
+    """URL da miniatura de ``foto`` (um FieldFile); vazio se não houver foto."""
+    if not foto:
+        return ''
+    return reverse('miniatura', args=[tamanho, foto.name])
@@ -1,8 +1,11 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from datetime import date, timedelta
-from django.db.models import CheckConstraint, Q, F
+from django.db.models import CheckConstraint, Index, Q
+from django.db.models.functions import Lower
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 CONDICAO_CHOICES = (
     ('BOA', 'Boa'),
@@ -10,12 +13,49 @@ CONDICAO_CHOICES = (
     ('RUIM', 'Ruim'),
 )
 
+class ContadoresEmprestimos(models.Model):
+    """Contadores de empréstimos de um colaborador ou EPI, mantidos por epi_admin.contadores."""
+    emprestimos_abertos = models.IntegerField(default=0, editable=False)
+    emprestimos_total = models.IntegerField(default=0, editable=False)
+    # a menor data_prevista entre os empréstimos em aberto: há atraso se for anterior a hoje
+    prevista_mais_antiga = models.DateField(null=True, blank=True, editable=False)
+
+    CAMPOS_CONTADORES = ('emprestimos_abertos', 'emprestimos_total', 'prevista_mais_antiga')
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            # os contadores só mudam por UPDATEs F() + n (epi_admin.contadores): um save()
+            # de formulário não grava por cima deles os valores lidos antes. Fora eles,
+            # grava o que o save() do Django gravaria: os update_fields pedidos ou,
+            # nos objetos lidos com only()/defer(), só os campos carregados
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                adiados = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in adiados
+                ]
+            update_fields = [nome for nome in update_fields if nome not in self.CAMPOS_CONTADORES]
+            if update_fields and 'updated_at' not in update_fields:
+                # o GET condicional e os fragmentos dependem do updated_at de toda gravação
+                update_fields.append('updated_at')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    @property
+    def com_atraso(self):
+        return self.prevista_mais_antiga is not None and self.prevista_mais_antiga < timezone.localdate()
+
+
 # Create your models here.
-class Colaborador(models.Model):
+class Colaborador(ContadoresEmprestimos):
     nome = models.CharField(max_length=30)
     sobrenome = models.CharField(max_length=30)
     setor = models.CharField(max_length=30)
-    cpf = models.CharField(max_length=11)
+    cpf = models.CharField(max_length=11, db_index=True)
     fotoColaborador = models.ImageField(upload_to='static/fotos_colaboradores/', blank=True, null=True)
     is_ativo = models.BooleanField(default=True)
 
@@ -26,10 +66,30 @@ class Colaborador(models.Model):
         on_delete=models.SET_NULL,
         related_name='colaboradores_created'
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # setor carregado do banco; o resumo do painel precisa saber quando ele muda
+        instance._setor_original = instance.__dict__.get('setor')
+        return instance
 
     def __str__(self):
         return f"{self.nome} {self.sobrenome}"
 
+    class Meta:
+        indexes = [
+            # índice parcial: só colaboradores ativos (os que podem receber empréstimos)
+            Index(fields=['nome', 'sobrenome'], condition=Q(is_ativo=True), name='colaborador_ativo_nome_idx'),
+            # ordenação e filtros das listas pelos contadores (ContadoresMixin)
+            Index(fields=['emprestimos_abertos', 'id'], name='colaborador_abertos_idx'),
+            Index(fields=['emprestimos_total', 'id'], name='colaborador_total_idx'),
+            Index(fields=['prevista_mais_antiga'], condition=Q(prevista_mais_antiga__isnull=False),
+                  name='colaborador_atraso_idx'),
+        ]
+
 class Gerente(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE)
     # email do gerente; será usado como username para login quando possível
@@ -41,20 +101,40 @@ class Gerente(models.Model):
     setor = models.CharField(max_length=30)
     cpf = models.CharField(max_length=11)
     fotoGerente = models.ImageField(upload_to='static/fotos_gerentes/', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.nome} {self.sobrenome}"
 
-class EPI(models.Model):
+    class Meta:
+        indexes = [
+            # buscas por email são case-insensitive (GerenteForm.clean_email)
+            Index(Lower('email'), name='gerente_email_lower_idx'),
+        ]
+
+class EPI(ContadoresEmprestimos):
     nomeAparelho = models.CharField(max_length=50)
     categoria = models.CharField(max_length=30)
     quantidade = models.IntegerField()
     fotoEPI = models.ImageField(upload_to='static/fotos_epi/', blank=True, null=True)
-    validade = models.DateField()
+    validade = models.DateField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nomeAparelho
 
+    class Meta:
+        indexes = [
+            # autocomplete do formulário de empréstimo: EPIs com estoque, por nome
+            Index(fields=['nomeAparelho'], condition=Q(quantidade__gt=0), name='epi_disponivel_nome_idx'),
+            Index(fields=['emprestimos_abertos', 'id'], name='epi_abertos_idx'),
+            Index(fields=['emprestimos_total', 'id'], name='epi_total_idx'),
+            Index(fields=['prevista_mais_antiga'], condition=Q(prevista_mais_antiga__isnull=False),
+                  name='epi_atraso_idx'),
+        ]
+
 class Emprestimo (models.Model):
     colaborador = models.ForeignKey(Colaborador, on_delete=models.CASCADE)
     epi_nome = models.ForeignKey(EPI, on_delete=models.CASCADE)
@@ -70,6 +150,8 @@ class Emprestimo (models.Model):
                                         blank=True,
                                         null=True
                                         )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def clean(self):
         """
@@ -95,11 +177,6 @@ class Emprestimo (models.Model):
                 f"O colaborador '{self.colaborador}' está inativo e não pode realizar empréstimos."
             )
 
-    def save(self, *args, **kwargs):
-
-        self.full_clean()  # Garante que as validações do clean() sejam aplicadas antes de salvar
-        super().save(*args, **kwargs)  # Salva o objeto Emprestimo no banco de dados
-
     def __str__(self):
         # mostra "Colaborador - EPI" usando o nome do aparelho
         epi_nome = getattr(self.epi_nome, 'nomeAparelho', str(self.epi_nome))
@@ -113,51 +190,216 @@ class Emprestimo (models.Model):
                 name='data_prevista_maior_que_emprestimo'
             )
         ]
+        indexes = [
+            # índice parcial dos empréstimos em aberto; também atende "atrasados"
+            # (em aberto com data_prevista < hoje)
+            Index(fields=['data_prevista'], condition=Q(data_devolucao__isnull=True), name='emprestimo_aberto_idx'),
+            Index(fields=['data_emprestimo'], name='emprestimo_data_idx'),
+            # em aberto por colaborador/EPI: a prevista mais antiga dos contadores e os atrasados do detalhe
+            Index(fields=['colaborador', 'data_prevista'], condition=Q(data_devolucao__isnull=True),
+                  name='emprestimo_aberto_colab_idx'),
+            Index(fields=['epi_nome', 'data_prevista'], condition=Q(data_devolucao__isnull=True),
+                  name='emprestimo_aberto_epi_idx'),
+        ]
+
+    # Campos cujo valor carregado do banco é guardado em _estado_original: o save()
+    # usa para detectar devoluções e o resumo do painel para calcular a diferença
+    # entre o estado antigo e o novo, sem buscar a linha novamente.
+    CAMPOS_RASTREADOS = ('colaborador_id', 'epi_nome_id', 'data_prevista', 'data_devolucao')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._estado_original = instance.estado_atual()
+        return instance
+
+    def estado_atual(self):
+        return {campo: self.__dict__.get(campo) for campo in self.CAMPOS_RASTREADOS}
+
+    @property
+    def estado_original(self):
+        """Valores rastreados como estavam no banco (None para objetos novos)."""
+        return getattr(self, '_estado_original', None)
 
     def save(self, *args, **kwargs):
-        # Chama full_clean() antes de salvar para aplicar validações do método clean()
-        if not self.pk:
+        from . import contadores, estoque
+
+        novo = self._state.adding
+        if novo:
+            # Chama full_clean() antes de salvar para aplicar validações do método clean().
+            # Fica fora da transação: quem garante o estoque é o UPDATE condicional abaixo.
             self.full_clean()
 
-        # --- Lógica de Data Prevista (Existente) ---
-        if not self.pk:
+            # --- Lógica de Data Prevista (Existente) ---
             if not self.data_prevista and self.data_emprestimo:
                 self.data_prevista = self.data_emprestimo + timedelta(days=7)
 
-        # --- Lógica de Controle de Estoque (Redução e Devolução) ---
-
-        if not self.pk:
-            # 1. Verificar se é um novo empréstimo (reduzir estoque)
-            # A validação de estoque já ocorreu no full_clean() acima
-            self.epi_nome.quantidade = F('quantidade') - 1
-            self.epi_nome.save()
-        else:
-            # 2. Verificar se uma devolução foi registrada (adicionar estoque de volta)
-            # Carregamos a versão anterior do objeto para comparação
-            try:
-                old_instance = Emprestimo.objects.get(pk=self.pk)
-                if not old_instance.data_devolucao and self.data_devolucao:
-                    # Verifica a condição de devolução antes de adicionar
-                    if self.condicao_devolucao in ['BOA', 'USAVEL']:
-                        self.epi_nome.quantidade = F('quantidade') + 1
-                        self.epi_nome.save()
-            except Emprestimo.DoesNotExist:
-                pass # Objeto novo, já tratado acima
-
-        # Salva o objeto Emprestimo no banco de dados
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if novo:
+                # --- Controle de Estoque: retirada ---
+                # UPDATE condicional (quantidade > 0): falha em vez de vender estoque que não existe
+                if not estoque.reservar(self.epi_nome_id):
+                    raise ValidationError(
+                        f"Não é possível criar um empréstimo. O EPI '{self.epi_nome.nomeAparelho}' não tem estoque disponível."
+                    )
+            elif self.data_devolucao and not (self.estado_original or {}).get('data_devolucao'):
+                # --- Controle de Estoque: devolução registrada ---
+                if not estoque.registrar_devolucao(self):
+                    # outro save() já registrou a devolução depois que este objeto foi lido:
+                    # o estado anterior desta gravação é o do banco, e os contadores e o
+                    # resumo (que partem de estado_original) não contam a devolução de novo
+                    self._estado_original = Emprestimo.objects.values(*self.CAMPOS_RASTREADOS).get(pk=self.pk)
+
+            # Salva o objeto Emprestimo no banco de dados
+            super().save(*args, **kwargs)
+            # contadores do colaborador e do EPI, na mesma transação do estoque
+            contadores.emprestimo_salvo(self, novo)
+        self._estado_original = self.estado_atual()
 
-    # MÉTODO DELETE MOVIDO PARA O NÍVEL CORRETO DA CLASSE (FORA DO SAVE)
     def delete(self, *args, **kwargs):
         """
         Devolve um item ao estoque quando o registro de empréstimo é deletado.
         """
-        epi = self.epi_nome
+        from . import estoque
+
+        with transaction.atomic():
+            if self.epi_nome_id:
+                estoque.repor(self.epi_nome_id)
+            # os contadores saem no post_delete (signals.py), que também cobre a exclusão
+            # em cascata de um colaborador ou EPI, que não passa por este método
+            # Chama o método delete() original para finalmente excluir o objeto Emprestimo
+            return super().delete(*args, **kwargs)
+
+
+class ResumoEmprestimo(models.Model):
+    """Contagens pré-agregadas de empréstimos por setor, EPI e data.
 
-        if epi:
-            # Usamos F() para uma atualização segura no DB
-            epi.quantidade = F('quantidade') + 1
-            epi.save(update_fields=['quantidade'])
+    Cada linha guarda, para um (setor, EPI, data):
+    - ``abertos``: empréstimos em aberto com ``data_prevista`` igual à data;
+    - ``devolvidos``: empréstimos devolvidos nessa data.
+
+    Mantido incrementalmente por ``epi_admin.resumo`` a cada save()/delete() de
+    Emprestimo; ``manage.py rebuild_resumo_emprestimos`` reconstrói do zero.
+    """
+    setor = models.CharField(max_length=30)
+    epi = models.ForeignKey(EPI, on_delete=models.CASCADE, related_name='+')
+    data = models.DateField()
+    abertos = models.IntegerField(default=0)
+    devolvidos = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['setor', 'epi', 'data'], name='resumo_emprestimo_unico'),
+        ]
+        indexes = [
+            Index(fields=['data'], name='resumo_emprestimo_data_idx'),
+            Index(fields=['setor'], condition=Q(abertos__gt=0), name='resumo_emprestimo_abertos_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.setor} / {self.epi_id} / {self.data}"
+
+
+class TermoBusca(models.Model):
+    """Índice de busca: um termo normalizado de um Colaborador ou EPI.
+
+    ``modelo`` é o ``model_name`` ('colaborador', 'epi') e ``objeto_id`` a
+    chave do objeto. Mantido por ``epi_admin.busca``.
+    """
+    modelo = models.CharField(max_length=20)
+    objeto_id = models.IntegerField()
+    termo = models.CharField(max_length=50)
+
+    class Meta:
+        indexes = [
+            # busca por prefixo: termo >= 'abc' AND termo < 'abc' || U+FFFF
+            Index(fields=['modelo', 'termo', 'objeto_id'], name='termo_busca_termo_idx'),
+            Index(fields=['modelo', 'objeto_id'], name='termo_busca_objeto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id}: {self.termo}"
+
+
+class Alteracao(models.Model):
+    """Uma linha do log de alterações (append-only) de Colaborador, EPI e Emprestimo.
+
+    A chave (``id``) é o número de sequência: cada criação, alteração ou
+    exclusão grava uma linha nova, e quem sincroniza lê as linhas depois do
+    último número que viu. ``modelo`` é o ``model_name`` ('colaborador',
+    'epi', 'emprestimo'). Mantido por ``epi_admin.alteracoes``.
+    """
+    CRIADO = 'CRIADO'
+    ALTERADO = 'ALTERADO'
+    APAGADO = 'APAGADO'
+    OPERACAO_CHOICES = (
+        (CRIADO, 'Criado'),
+        (ALTERADO, 'Alterado'),
+        (APAGADO, 'Apagado'),
+    )
+
+    modelo = models.CharField(max_length=20)
+    objeto_id = models.IntegerField()
+    operacao = models.CharField(max_length=10, choices=OPERACAO_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.modelo} {self.objeto_id}: {self.operacao}"
+
+
+class Tarefa(models.Model):
+    """Uma tarefa da fila em segundo plano (``epi_admin.tarefas``).
+
+    ``tipo`` é uma das chaves de ``tarefas.TIPOS`` e ``argumentos`` os
+    argumentos nomeados da função, em JSON. ``tentativas`` conta as execuções
+    já iniciadas; depois de uma falha a tarefa volta a ``PENDENTE`` com
+    ``executar_em`` no futuro, até ``max_tentativas``.
+    """
+    PENDENTE = 'PENDENTE'
+    EXECUTANDO = 'EXECUTANDO'
+    CONCLUIDA = 'CONCLUIDA'
+    FALHOU = 'FALHOU'
+    STATUS_CHOICES = (
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDA, 'Concluída'),
+        (FALHOU, 'Falhou'),
+    )
+
+    tipo = models.CharField(max_length=50)
+    argumentos = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDENTE)
+    executar_em = models.DateTimeField(default=timezone.now)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=5)
+    trabalhador = models.CharField(max_length=100, blank=True)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+    resultado = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    erro = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='tarefas_created'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # próxima tarefa a reivindicar: WHERE status = PENDENTE ORDER BY executar_em, id
+            Index(fields=['executar_em', 'id'], condition=Q(status='PENDENTE'), name='tarefa_pendente_idx'),
+            # contagem por status e tipo (limites de concorrência, página de status)
+            Index(fields=['status', 'tipo'], name='tarefa_status_tipo_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.tipo}: {self.status}"
 
-        # Chama o método delete() original para finalmente excluir o objeto Emprestimo
-        super().delete(*args, **kwargs)
\ No newline at end of file
+    def ultima_linha_do_erro(self):
+        """Última linha do traceback (a exceção), para listagens."""
+        linhas = [linha for linha in self.erro.splitlines() if linha.strip()]
+        return linhas[-1] if linhas else ''
@@ -0,0 +1,228 @@
+"""Paginação por chave (keyset/cursor) para as ListViews do epi_admin.
+
+O paginador padrão do Django usa ``COUNT(*)`` + ``OFFSET n``, cujo custo cresce
+com a profundidade da página. Aqui cada página é buscada com
+``WHERE chave > cursor ORDER BY chave LIMIT n + 1``, que usa o índice da chave
+e custa o mesmo na primeira ou na milésima página.
+
+Os cursores são opacos para o cliente (base64 de um JSON com a direção e os
+valores da chave da última/primeira linha da página).
+"""
+import base64
+import binascii
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Max, Q
+from django.http import Http404
+
+
+def encode_cursor(direcao, valores):
+    """Codifica um cursor opaco a partir da direção ('n'/'p') e dos valores da chave."""
+    raw = json.dumps([direcao, list(valores)], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+# maior inteiro que o banco compara sem estourar (INTEGER de 64 bits)
+MAIOR_INTEIRO = 2 ** 63 - 1
+
+
+def _escalar(valor):
+    if isinstance(valor, int):
+        return -MAIOR_INTEIRO <= valor <= MAIOR_INTEIRO
+    return valor is None or isinstance(valor, (str, float))
+
+
+def decode_cursor(cursor, tamanho=None):
+    """Decodifica um cursor gerado por encode_cursor; levanta ValueError se inválido.
+
+    O cursor vem do cliente: além do formato, os valores precisam ser
+    escalares (um valor da chave por campo da ordenação, quando ``tamanho`` é
+    informado); uma lista ou um dict no lugar de um valor viraria TypeError
+    ao montar o filtro.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direcao, valores = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError('cursor inválido') from exc
+    if direcao not in ('n', 'p') or not isinstance(valores, list):
+        raise ValueError('cursor inválido')
+    if (tamanho is not None and len(valores) != tamanho) or not all(_escalar(valor) for valor in valores):
+        raise ValueError('cursor inválido')
+    return direcao, valores
+
+
+def _campo(ordem):
+    return ordem.lstrip('-'), ordem.startswith('-')
+
+
+def keyset_filter(ordering, valores, reverso=False):
+    """Monta o Q que seleciona as linhas *depois* de ``valores`` na ordem ``ordering``.
+
+    Para uma chave composta (a, b) isso é ``a > va OR (a = va AND b > vb)``, com
+    os operadores invertidos para campos descendentes (ou quando ``reverso``).
+    """
+    condicao = Q()
+    anteriores = {}
+    for ordem, valor in zip(ordering, valores):
+        nome, desc = _campo(ordem)
+        lookup = 'lt' if desc != reverso else 'gt'
+        condicao |= Q(**anteriores, **{f'{nome}__{lookup}': valor})
+        anteriores[nome] = valor
+    return condicao
+
+
+def _valores_da_linha(obj, ordering):
+    valores = []
+    for ordem in ordering:
+        nome, _ = _campo(ordem)
+        valor = obj.get(nome) if isinstance(obj, dict) else getattr(obj, 'pk' if nome == 'pk' else nome)
+        valores.append(valor)
+    return valores
+
+
+def approximate_count(queryset):
+    """Total aproximado e barato de linhas da tabela do queryset.
+
+    Em PostgreSQL usa a estimativa do planner (``pg_class.reltuples``); nos demais
+    bancos usa ``MAX(pk)``, resolvido pelo índice da chave primária. Em ambos os
+    casos filtros do queryset são ignorados — é só uma ordem de grandeza.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return model._default_manager.using(queryset.db).aggregate(total=Max('pk'))['total'] or 0
+
+
+class KeysetPage:
+    """Página de resultados compatível com o uso de ``page_obj`` nos templates."""
+
+    def __init__(self, object_list, ordering, has_next, has_previous, approximate_total=None):
+        self.object_list = object_list
+        self.ordering = ordering
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.approximate_total = approximate_total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor('n', _valores_da_linha(self.object_list[-1], self.ordering))
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor('p', _valores_da_linha(self.object_list[0], self.ordering))
+
+
+def janela_keyset(queryset, ordering, page_size, cursor=None):
+    """Linhas que ``paginate_keyset`` lê para a página: ``(direcao, valores, queryset)``.
+
+    O queryset devolvido tem até ``page_size + 1`` linhas (a última só indica
+    se há mais páginas) e ainda não foi executado. Levanta ValueError se o
+    cursor for inválido.
+    """
+    ordering = tuple(ordering)
+    direcao, valores = ('n', None)
+    if cursor:
+        direcao, valores = decode_cursor(cursor, len(ordering))
+
+    if direcao == 'p':
+        # Página anterior: percorre a ordem invertida (paginate_keyset desvira o resultado).
+        invertida = [o[1:] if o.startswith('-') else f'-{o}' for o in ordering]
+        qs = queryset.filter(keyset_filter(ordering, valores, reverso=True)).order_by(*invertida)
+    else:
+        qs = queryset.order_by(*ordering)
+        if valores is not None:
+            qs = qs.filter(keyset_filter(ordering, valores))
+    return direcao, valores, qs[:page_size + 1]
+
+
+def paginate_keyset(queryset, ordering, page_size, cursor=None):
+    """Busca uma página de ``queryset`` ordenada por ``ordering`` a partir de ``cursor``.
+
+    ``ordering`` deve terminar em um campo único (normalmente ``pk``) para que a
+    ordem seja estável. Levanta ValueError se o cursor for inválido.
+    """
+    ordering = tuple(ordering)
+    direcao, valores, janela = janela_keyset(queryset, ordering, page_size, cursor)
+    return _pagina(list(janela), ordering, page_size, direcao, valores)
+
+
+async def apaginate_keyset(queryset, ordering, page_size, cursor=None):
+    """Versão assíncrona de ``paginate_keyset`` (lê a janela com o ORM assíncrono)."""
+    ordering = tuple(ordering)
+    direcao, valores, janela = janela_keyset(queryset, ordering, page_size, cursor)
+    return _pagina([row async for row in janela], ordering, page_size, direcao, valores)
+
+
+def _pagina(rows, ordering, page_size, direcao, valores):
+    if direcao == 'p':
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        return KeysetPage(rows, ordering, has_next=True, has_previous=has_previous)
+
+    has_next = len(rows) > page_size
+    return KeysetPage(rows[:page_size], ordering, has_next=has_next, has_previous=valores is not None)
+
+
+class KeysetPaginationMixin:
+    """Substitui a paginação por OFFSET das ListViews por paginação por chave.
+
+    A view continua declarando ``paginate_by``; a página é escolhida pelo
+    parâmetro ``cursor`` da query string em vez de ``page``. Com ``?total=1`` a
+    página traz também um total aproximado (``page_obj.approximate_total``).
+    """
+    keyset_ordering = ('pk',)
+    cursor_kwarg = 'cursor'
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def get_janela(self, queryset, page_size):
+        """QuerySet (não executado) das linhas lidas para a página atual."""
+        cursor = self.request.GET.get(self.cursor_kwarg) or None
+        try:
+            return janela_keyset(queryset, self.get_keyset_ordering(), page_size, cursor)[2]
+        except ValueError:
+            raise Http404('Cursor de paginação inválido.')
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get(self.cursor_kwarg) or None
+        try:
+            page = paginate_keyset(queryset, self.get_keyset_ordering(), page_size, cursor)
+        except ValueError:
+            raise Http404('Cursor de paginação inválido.')
+        if self.request.GET.get('total'):
+            page.approximate_total = approximate_count(queryset)
+        return (None, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,165 @@
+"""Provisionamento dos usuários dos gerentes (Gerente ↔ User ↔ grupo Gerentes).
+
+Cada gerente deve ter um usuário com o mesmo email, membro do grupo
+``Gerentes``. ``sincronizar`` reconcilia uma lista de gerentes de uma vez, com
+um número fixo de consultas qualquer que seja o tamanho da lista (só os
+``bulk_*`` se dividem em lotes, pelo limite de parâmetros do banco):
+
+1. carrega os usuários já vinculados e busca por email (sem diferenciar
+   maiúsculas) os usuários dos gerentes ainda sem vínculo;
+2. corrige com um ``bulk_update`` o email dos usuários vinculados que
+   divergem do gerente;
+3. cria com um ``bulk_create`` os usuários que faltam (username = email,
+   staff, sem senha utilizável: ela é definida pelo Admin);
+4. grava os vínculos com um ``bulk_update`` dos gerentes;
+5. insere de uma vez as filiações que faltam no grupo.
+
+Os caminhos em massa não disparam os sinais que limpam o cache de
+autenticação (``auth_backends``), então a invalidação é feita aqui.
+
+Gerentes que não podem ser vinculados (o email pertence a um usuário já
+vinculado a outro gerente, ou a um username existente) ficam de fora e vão
+para ``RelatorioProvisionamento.conflitos``.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from . import auth_backends, fragmentos
+from .models import Gerente
+
+GRUPO_GERENTES = 'Gerentes'
+
+
+class RelatorioProvisionamento:
+    """Resultado de uma sincronização: contagens e gerentes em conflito."""
+
+    def __init__(self):
+        self.criados = []
+        self.vinculados = 0
+        self.emails_atualizados = 0
+        self.adicionados_ao_grupo = 0
+        self.sem_usuario = []
+        self.conflitos = []
+
+    def adicionar_conflito(self, gerente, mensagem):
+        self.conflitos.append((gerente, mensagem))
+
+    def __str__(self):
+        return (
+            f"{len(self.criados)} usuários criados, {self.vinculados} vinculados, "
+            f"{self.emails_atualizados} emails atualizados, {self.adicionados_ao_grupo} adicionados ao grupo, "
+            f"{len(self.sem_usuario)} sem usuário, {len(self.conflitos)} conflitos"
+        )
+
+
+def _normalizar(email):
+    return (email or '').strip().lower()
+
+
+@transaction.atomic(savepoint=False)
+def sincronizar(gerentes, criar_usuarios=True):
+    """Garante usuário, email e grupo para cada gerente de ``gerentes``.
+
+    Com ``criar_usuarios=False`` gerentes sem usuário correspondente ficam em
+    ``RelatorioProvisionamento.sem_usuario`` em vez de ganhar um usuário novo.
+    """
+    User = get_user_model()
+    relatorio = RelatorioProvisionamento()
+    gerentes = [g for g in gerentes if _normalizar(g.email)]
+    if not gerentes:
+        return relatorio
+
+    vinculados = {u.pk: u for u in User.objects.filter(pk__in=[g.user_id for g in gerentes if g.user_id])}
+    sem_vinculo = [g for g in gerentes if g.user_id not in vinculados]
+    divergentes = [
+        g for g in gerentes
+        if g.user_id in vinculados and _normalizar(vinculados[g.user_id].email) != _normalizar(g.email)
+    ]
+    # usuários que já ocupam o email (ou o username = email) de algum gerente
+    # pendente, com o gerente a que cada um está vinculado (se houver)
+    emails = {_normalizar(g.email) for g in sem_vinculo + divergentes}
+    ocupantes = list(
+        User.objects.alias(email_lower=Lower('email'))
+        .filter(Q(email_lower__in=emails, email__gt='') | Q(username__in=emails))
+        .exclude(pk__in=list(vinculados))
+        .annotate(gerente_vinculado=F('gerente'))
+    ) if emails else []
+    por_email = {_normalizar(u.email): u for u in ocupantes if u.email}
+    por_username = {u.username.lower(): u for u in ocupantes}
+
+    # 2. email dos usuários já vinculados
+    alterados = []
+    for gerente in divergentes:
+        user = vinculados[gerente.user_id]
+        outro = por_email.get(_normalizar(gerente.email))
+        if outro is not None:
+            relatorio.adicionar_conflito(gerente, f'o email já pertence ao usuário "{outro.username}"')
+            continue
+        user.email = gerente.email
+        alterados.append(user)
+    if alterados:
+        User.objects.bulk_update(alterados, ['email'])
+        relatorio.emails_atualizados = len(alterados)
+
+    # 3 e 4. vínculos com usuários existentes ou novos
+    a_vincular, novos, tomados = [], {}, set()
+    for gerente in sem_vinculo:
+        email = _normalizar(gerente.email)
+        user = por_email.get(email)
+        if email in tomados:
+            relatorio.adicionar_conflito(gerente, 'outro gerente da lista tem o mesmo email')
+        elif user is not None and user.gerente_vinculado is not None:
+            relatorio.adicionar_conflito(gerente, 'o email já está vinculado a outro gerente')
+        elif user is not None:
+            tomados.add(email)
+            gerente.user = user
+            a_vincular.append(gerente)
+        elif email in por_username:
+            relatorio.adicionar_conflito(gerente, f'já existe o username "{por_username[email].username}" com outro email')
+        elif not criar_usuarios:
+            relatorio.sem_usuario.append(gerente)
+        else:
+            tomados.add(email)
+            user = User(username=gerente.email, email=gerente.email, is_staff=True)
+            user.set_unusable_password()
+            novos[email] = user
+            gerente.user = user
+            a_vincular.append(gerente)
+    if novos:
+        User.objects.bulk_create(novos.values())
+        relatorio.criados = list(novos.values())
+    agora = timezone.now()
+    for gerente in a_vincular:
+        # o bulk_create acabou de atribuir a chave dos usuários novos
+        gerente.user_id = gerente.user.pk
+        gerente.updated_at = agora  # bulk_update não aplica o auto_now
+    if a_vincular:
+        Gerente.objects.bulk_update(a_vincular, ['user', 'updated_at'])
+        relatorio.vinculados = len(a_vincular) - len(novos)
+
+    # 5. filiação ao grupo
+    usuarios = {g.user_id for g in gerentes if g.user_id}
+    faltantes = []
+    if usuarios:
+        grupo, _ = Group.objects.get_or_create(name=GRUPO_GERENTES)
+        Filiacao = User.groups.through
+        filiados = set(
+            Filiacao.objects.filter(group_id=grupo.pk, user_id__in=usuarios).values_list('user_id', flat=True)
+        )
+        faltantes = [Filiacao(user_id=pk, group_id=grupo.pk) for pk in usuarios - filiados]
+        if faltantes:
+            Filiacao.objects.bulk_create(faltantes, ignore_conflicts=True)
+            relatorio.adicionados_ao_grupo = len(faltantes)
+
+    # bulk_update/bulk_create não disparam os sinais do cache de autenticação
+    for user_id in {u.pk for u in alterados} | {f.user_id for f in faltantes}:
+        auth_backends.invalidar_usuario(user_id)
+    for user in list(novos.values()) + alterados:
+        auth_backends.esquecer_email_desconhecido(user.email)
+    if alterados or a_vincular:
+        fragmentos.invalidar(Gerente, User)
+    return relatorio
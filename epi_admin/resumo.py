@@ -0,0 +1,167 @@
+"""Manutenção incremental do resumo de empréstimos (ResumoEmprestimo).
+
+Cada empréstimo "contribui" com +1 em exatamente um bucket do resumo:
+``abertos`` em (setor, EPI, data_prevista) enquanto está em aberto, ou
+``devolvidos`` em (setor, EPI, data_devolucao) depois de devolvido. Ao salvar
+ou apagar um empréstimo aplicamos a diferença entre a contribuição antiga e a
+nova, com UPDATEs ``F() + n`` na mesma transação da alteração.
+
+O painel então lê o resumo, que tem uma linha por (setor, EPI, data), em vez
+de varrer a tabela de empréstimos.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Colaborador, Emprestimo, ResumoEmprestimo
+
+
+def _bucket(setor, epi_id, data_emprestimo, data_prevista, data_devolucao):
+    if data_devolucao:
+        return (setor, epi_id, data_devolucao, 'devolvidos')
+    # empréstimos gravados sem data_prevista seguem a regra padrão do save()
+    return (setor, epi_id, data_prevista or data_emprestimo + timedelta(days=7), 'abertos')
+
+
+def _setor(colaborador_id, cache):
+    if colaborador_id not in cache:
+        cache[colaborador_id] = Colaborador.objects.filter(pk=colaborador_id).values_list('setor', flat=True).first()
+    return cache[colaborador_id]
+
+
+def aplicar(deltas):
+    """Soma os ``deltas`` ({(setor, epi_id, data, campo): n}) ao resumo."""
+    for (setor, epi_id, data, campo), n in deltas.items():
+        if not n or setor is None:
+            continue
+        chave = {'setor': setor, 'epi_id': epi_id, 'data': data}
+        if ResumoEmprestimo.objects.filter(**chave).update(**{campo: F(campo) + n}):
+            continue
+        if n < 0:
+            # o bucket não existe: o resumo já estava defasado; o rebuild corrige
+            continue
+        try:
+            with transaction.atomic():
+                ResumoEmprestimo.objects.create(**chave, **{campo: n})
+        except IntegrityError:
+            # outra transação criou o bucket ao mesmo tempo
+            ResumoEmprestimo.objects.filter(**chave).update(**{campo: F(campo) + n})
+
+
+def emprestimo_salvo(emprestimo, created):
+    """Atualiza o resumo depois de um save() de Emprestimo.
+
+    Parte de ``estado_original``, como os contadores: quando outra gravação
+    registrou a devolução antes desta, o save() já o releu do banco, e a
+    devolução não sai de ``abertos`` de novo.
+    """
+    deltas = Counter()
+    setores = {emprestimo.colaborador_id: emprestimo.colaborador.setor}
+    antigo = None if created else emprestimo.estado_original
+    if antigo:
+        deltas[_bucket(
+            _setor(antigo['colaborador_id'], setores), antigo['epi_nome_id'],
+            emprestimo.data_emprestimo, antigo['data_prevista'], antigo['data_devolucao'],
+        )] -= 1
+    elif not created:
+        # objeto salvo sem ter sido carregado do banco: estado anterior desconhecido
+        return
+    deltas[_bucket(
+        setores[emprestimo.colaborador_id], emprestimo.epi_nome_id,
+        emprestimo.data_emprestimo, emprestimo.data_prevista, emprestimo.data_devolucao,
+    )] += 1
+    aplicar(deltas)
+
+
+def emprestimo_apagado(emprestimo):
+    """Remove a contribuição de um empréstimo apagado."""
+    estado = emprestimo.estado_original or emprestimo.estado_atual()
+    setor = _setor(estado['colaborador_id'], {})
+    aplicar(Counter({_bucket(
+        setor, estado['epi_nome_id'], emprestimo.data_emprestimo, estado['data_prevista'], estado['data_devolucao'],
+    ): -1}))
+
+
+def registrar_lote(emprestimos):
+    """Soma ao resumo empréstimos criados com bulk_create (que não dispara save())."""
+    deltas = Counter()
+    for emprestimo in emprestimos:
+        deltas[_bucket(
+            emprestimo.colaborador.setor, emprestimo.epi_nome_id,
+            emprestimo.data_emprestimo, emprestimo.data_prevista, emprestimo.data_devolucao,
+        )] += 1
+    aplicar(deltas)
+
+
+def mover_setor(mudancas):
+    """Move a contribuição de colaboradores que trocaram de setor.
+
+    ``mudancas`` mapeia colaborador_id -> (setor_antigo, setor_novo).
+    """
+    mudancas = {pk: setores for pk, setores in mudancas.items() if setores[0] != setores[1]}
+    if not mudancas:
+        return
+    linhas = (
+        Emprestimo.objects.filter(colaborador_id__in=list(mudancas))
+        .values('colaborador_id', 'epi_nome_id', 'data_emprestimo', 'data_prevista', 'data_devolucao')
+        .annotate(n=Count('pk'))
+    )
+    deltas = Counter()
+    for linha in linhas:
+        antigo, novo = mudancas[linha['colaborador_id']]
+        datas = (linha['data_emprestimo'], linha['data_prevista'], linha['data_devolucao'])
+        deltas[_bucket(antigo, linha['epi_nome_id'], *datas)] -= linha['n']
+        deltas[_bucket(novo, linha['epi_nome_id'], *datas)] += linha['n']
+    aplicar(deltas)
+
+
+@transaction.atomic
+def reconstruir(hoje=None):
+    """Recalcula o resumo inteiro a partir dos empréstimos.
+
+    Só os buckets úteis ao painel são gravados: todos os em aberto e os
+    devolvidos a partir de ``hoje`` (padrão: a data local de quando roda).
+    Retorna o número de linhas gravadas.
+    """
+    hoje = hoje or timezone.localdate()
+    ResumoEmprestimo.objects.all().delete()
+    deltas = Counter()
+    abertos = (
+        Emprestimo.objects.filter(data_devolucao__isnull=True)
+        .values('colaborador__setor', 'epi_nome_id', 'data_emprestimo', 'data_prevista')
+        .annotate(n=Count('pk'))
+    )
+    for linha in abertos:
+        deltas[_bucket(linha['colaborador__setor'], linha['epi_nome_id'],
+                       linha['data_emprestimo'], linha['data_prevista'], None)] += linha['n']
+    devolvidos = (
+        Emprestimo.objects.filter(data_devolucao__gte=hoje)
+        .values('colaborador__setor', 'epi_nome_id', 'data_devolucao')
+        .annotate(n=Count('pk'))
+    )
+    for linha in devolvidos:
+        deltas[(linha['colaborador__setor'], linha['epi_nome_id'], linha['data_devolucao'], 'devolvidos')] += linha['n']
+
+    linhas = {}
+    for (setor, epi_id, data, campo), n in deltas.items():
+        resumo = linhas.setdefault((setor, epi_id, data), ResumoEmprestimo(setor=setor, epi_id=epi_id, data=data))
+        setattr(resumo, campo, n)
+    ResumoEmprestimo.objects.bulk_create(linhas.values(), batch_size=1000)
+    return len(linhas)
+
+
+def painel(hoje):
+    """Linhas do painel de atrasos, uma por (setor, EPI), numa única consulta."""
+    return list(
+        ResumoEmprestimo.objects.filter(Q(abertos__gt=0) | Q(data=hoje))
+        .values('setor', 'epi_id', 'epi__nomeAparelho')
+        .annotate(
+            total_abertos=Sum('abertos'),
+            atrasados=Sum('abertos', filter=Q(data__lt=hoje), default=0),
+            devolvidos_hoje=Sum('devolvidos', filter=Q(data=hoje), default=0),
+        )
+        .order_by('setor', 'epi__nomeAparelho')
+    )
@@ -0,0 +1,116 @@
+"""Receivers de sinais dos modelos do epi_admin (conectados em EpiAdminConfig.ready)."""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import alteracoes, auth_backends, busca, contadores, fragmentos, miniaturas, resumo
+from .models import EPI, Colaborador, Emprestimo, Gerente
+
+
+@receiver(post_save, sender=Emprestimo, dispatch_uid='resumo_emprestimo_salvo')
+def atualizar_resumo_emprestimo(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    resumo.emprestimo_salvo(instance, created)
+
+
+@receiver(post_delete, sender=Emprestimo, dispatch_uid='resumo_emprestimo_apagado')
+def remover_do_resumo(sender, instance, **kwargs):
+    resumo.emprestimo_apagado(instance)
+
+
+@receiver(post_delete, sender=Emprestimo, dispatch_uid='contadores_emprestimo_apagado')
+def remover_dos_contadores(sender, instance, **kwargs):
+    # o save() atualiza os contadores; a exclusão vem por aqui para cobrir também a cascata
+    contadores.emprestimo_apagado(instance)
+
+
+@receiver(post_save, sender=Colaborador, dispatch_uid='resumo_colaborador_setor')
+def mover_setor_no_resumo(sender, instance, created, raw=False, **kwargs):
+    setor_original = getattr(instance, '_setor_original', None)
+    if not created and not raw and setor_original is not None and setor_original != instance.setor:
+        resumo.mover_setor({instance.pk: (setor_original, instance.setor)})
+    instance._setor_original = instance.setor
+
+
+@receiver(post_save, sender=Colaborador, dispatch_uid='busca_colaborador_salvo')
+@receiver(post_save, sender=EPI, dispatch_uid='busca_epi_salvo')
+def indexar_para_busca(sender, instance, created, **kwargs):
+    busca.indexar([instance], novos=created)
+
+
+@receiver(post_delete, sender=Colaborador, dispatch_uid='busca_colaborador_apagado')
+@receiver(post_delete, sender=EPI, dispatch_uid='busca_epi_apagado')
+def remover_da_busca(sender, instance, **kwargs):
+    busca.remover(sender, instance.pk)
+
+
+@receiver(post_save, sender=Colaborador, dispatch_uid='miniaturas_colaborador')
+@receiver(post_save, sender=Gerente, dispatch_uid='miniaturas_gerente')
+@receiver(post_save, sender=EPI, dispatch_uid='miniaturas_epi')
+def agendar_miniaturas(sender, instance, raw=False, **kwargs):
+    foto = {Colaborador: 'fotoColaborador', Gerente: 'fotoGerente', EPI: 'fotoEPI'}[sender]
+    arquivo = getattr(instance, foto)
+    if arquivo and not raw:
+        miniaturas.agendar(arquivo.name)
+
+
+@receiver(post_save, sender=Colaborador, dispatch_uid='fragmentos_colaborador_salvo')
+@receiver(post_save, sender=Gerente, dispatch_uid='fragmentos_gerente_salvo')
+@receiver(post_save, sender=EPI, dispatch_uid='fragmentos_epi_salvo')
+@receiver(post_save, sender=Emprestimo, dispatch_uid='fragmentos_emprestimo_salvo')
+@receiver(post_save, sender=get_user_model(), dispatch_uid='fragmentos_usuario_salvo')
+@receiver(post_delete, sender=Colaborador, dispatch_uid='fragmentos_colaborador_apagado')
+@receiver(post_delete, sender=Gerente, dispatch_uid='fragmentos_gerente_apagado')
+@receiver(post_delete, sender=EPI, dispatch_uid='fragmentos_epi_apagado')
+@receiver(post_delete, sender=Emprestimo, dispatch_uid='fragmentos_emprestimo_apagado')
+@receiver(post_delete, sender=get_user_model(), dispatch_uid='fragmentos_usuario_apagado')
+def invalidar_fragmentos(sender, update_fields=None, **kwargs):
+    # o login só grava last_login, que nenhum fragmento exibe
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    fragmentos.invalidar(sender)
+
+
+@receiver(post_save, sender=Colaborador, dispatch_uid='alteracoes_colaborador_salvo')
+@receiver(post_save, sender=EPI, dispatch_uid='alteracoes_epi_salvo')
+@receiver(post_save, sender=Emprestimo, dispatch_uid='alteracoes_emprestimo_salvo')
+def registrar_alteracao(sender, instance, created, **kwargs):
+    alteracoes.registrar(sender, [instance.pk], alteracoes.CRIADO if created else alteracoes.ALTERADO)
+
+
+@receiver(post_delete, sender=Colaborador, dispatch_uid='alteracoes_colaborador_apagado')
+@receiver(post_delete, sender=EPI, dispatch_uid='alteracoes_epi_apagado')
+@receiver(post_delete, sender=Emprestimo, dispatch_uid='alteracoes_emprestimo_apagado')
+def registrar_exclusao(sender, instance, **kwargs):
+    alteracoes.registrar(sender, [instance.pk], alteracoes.APAGADO)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='auth_cache_usuario_salvo')
+@receiver(post_delete, sender=get_user_model(), dispatch_uid='auth_cache_usuario_apagado')
+def invalidar_usuario_em_cache(sender, instance, **kwargs):
+    auth_backends.invalidar_usuario(instance.pk)
+    auth_backends.esquecer_email_desconhecido(instance.email)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through, dispatch_uid='auth_cache_grupos')
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through, dispatch_uid='auth_cache_permissoes')
+@receiver(m2m_changed, sender=Group.permissions.through, dispatch_uid='auth_cache_permissoes_grupo')
+@receiver(post_delete, sender=Group, dispatch_uid='auth_cache_grupo_apagado')
+def invalidar_permissoes_em_cache(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        auth_backends.invalidar_todos()
+
+
+@receiver(connection_created, dispatch_uid='sqlite_pragmas')
+def configurar_sqlite(sender, connection, **kwargs):
+    """Aplica settings.EPI_SQLITE_PRAGMAS a cada conexão SQLite nova (perfil sqlite-wal)."""
+    pragmas = getattr(settings, 'EPI_SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for nome, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nome} = {valor}')
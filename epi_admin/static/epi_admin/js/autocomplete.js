@@ -0,0 +1,91 @@
+// Autocomplete dos <select data-autocomplete-url> (forms.AutocompleteSelect).
+//
+// O select chega só com as opções já selecionadas. Um campo de busca acima
+// dele consulta o endpoint JSON ({results: [{id, text}], next}) e troca as
+// opções não selecionadas pelos resultados; "Mais resultados" pede a próxima
+// página pelo cursor.
+(function () {
+    'use strict';
+
+    var ESPERA_MS = 250;
+
+    function iniciar(select) {
+        var url = select.dataset.autocompleteUrl;
+        var busca = document.createElement('input');
+        busca.type = 'search';
+        busca.placeholder = 'Digite para buscar…';
+        busca.className = 'autocomplete-busca';
+        busca.setAttribute('autocomplete', 'off');
+        var mais = document.createElement('button');
+        mais.type = 'button';
+        mais.className = 'btn secondary autocomplete-mais';
+        mais.textContent = 'Mais resultados';
+        mais.hidden = true;
+        select.parentNode.insertBefore(busca, select);
+        select.parentNode.insertBefore(mais, select.nextSibling);
+
+        var proximo = null;
+        var pedido = 0;
+        var temporizador = null;
+
+        function limpar() {
+            Array.prototype.slice.call(select.options).forEach(function (opcao) {
+                if (!opcao.selected && opcao.value !== '') {
+                    opcao.remove();
+                }
+            });
+        }
+
+        function adicionar(resultados) {
+            var presentes = {};
+            Array.prototype.forEach.call(select.options, function (opcao) {
+                presentes[opcao.value] = true;
+            });
+            resultados.forEach(function (item) {
+                if (!presentes[String(item.id)]) {
+                    select.add(new Option(item.text, item.id));
+                }
+            });
+        }
+
+        function carregar(cursor) {
+            var numero = ++pedido;
+            var params = new URLSearchParams({q: busca.value.trim()});
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            fetch(url + '?' + params.toString(), {credentials: 'same-origin', headers: {Accept: 'application/json'}})
+                .then(function (resposta) { return resposta.ok ? resposta.json() : {results: [], next: null}; })
+                .then(function (dados) {
+                    if (numero !== pedido) {
+                        return; // chegou depois de uma busca mais nova
+                    }
+                    if (!cursor) {
+                        limpar();
+                    }
+                    adicionar(dados.results);
+                    proximo = dados.next;
+                    mais.hidden = !proximo;
+                });
+        }
+
+        busca.addEventListener('input', function () {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(function () { carregar(null); }, ESPERA_MS);
+        });
+        busca.addEventListener('focus', function () {
+            if (select.options.length <= 1 && !proximo) {
+                carregar(null);
+            }
+        }, {once: true});
+        mais.addEventListener('click', function () {
+            if (proximo) {
+                carregar(proximo);
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(iniciar);
+    });
+})();
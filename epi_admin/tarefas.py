@@ -0,0 +1,173 @@
+"""Fila local de tarefas em segundo plano, guardada no próprio banco (Tarefa).
+
+O trabalho pesado ou que pode falhar sai da requisição: ``enfileirar`` grava
+uma linha em Tarefa na transação atual (um rollback desfaz também a tarefa)
+e ``manage.py run_worker`` executa as pendentes. Não há broker externo: a
+fila funciona na mesma máquina, com o mesmo banco, e nos testes
+(``processar`` roda a fila até esvaziar).
+
+- Reivindicação: o worker escolhe a próxima pendente (``executar_em`` já
+  passou) e a marca com um UPDATE condicional (``WHERE status = PENDENTE``);
+  se outro worker chegou antes, o UPDATE não altera nada e ele tenta a
+  seguinte. No PostgreSQL a escolha usa ``SELECT ... FOR UPDATE SKIP LOCKED``
+  e os workers nem disputam a mesma linha.
+- Novas tentativas: uma exceção devolve a tarefa à fila com espera
+  exponencial (``EPI_TAREFAS_ESPERA`` segundos, dobrando a cada falha, até
+  ``EPI_TAREFAS_ESPERA_MAXIMA``); esgotado ``max_tentativas`` ela fica
+  FALHOU, com o traceback em ``erro``.
+- Limites de concorrência: ``TipoTarefa(concorrencia=n)`` limita quantas
+  tarefas do tipo rodam ao mesmo tempo, somando todos os workers. A contagem
+  e a reivindicação ficam na mesma transação; com o perfil ``sqlite-wal``
+  (transações IMMEDIATE) ou no PostgreSQL o limite é exato, no SQLite padrão
+  dois workers podem excedê-lo por uma corrida.
+- Workers que morrem: tarefas EXECUTANDO há mais de ``EPI_TAREFAS_TIMEOUT``
+  segundos voltam para a fila (``recuperar_expiradas``), contando a tentativa.
+
+As funções recebem só argumentos JSON (chaves, nomes de arquivo, datas em
+ISO) e devem poder rodar de novo sem efeito duplicado: uma tarefa pode ser
+repetida se o worker parar no meio dela.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Tarefa
+
+
+logger = logging.getLogger(__name__)
+
+PENDENTE, EXECUTANDO, CONCLUIDA, FALHOU = Tarefa.PENDENTE, Tarefa.EXECUTANDO, Tarefa.CONCLUIDA, Tarefa.FALHOU
+
+
+class TipoTarefa:
+    """Um tipo de tarefa: a função (caminho importável) e seus limites."""
+
+    def __init__(self, funcao, max_tentativas=5, concorrencia=None):
+        self.caminho = funcao
+        self.max_tentativas = max_tentativas
+        self.concorrencia = concorrencia
+
+    def funcao(self):
+        return import_string(self.caminho)
+
+
+TIPOS = {
+    'miniaturas': TipoTarefa('epi_admin.miniaturas.gerar', max_tentativas=3),
+    'exportacao': TipoTarefa('epi_admin.exportacao.gravar_csv', max_tentativas=3, concorrencia=2),
+    'validade': TipoTarefa('epi_admin.validade.verificar'),
+    'resumo': TipoTarefa('epi_admin.resumo.reconstruir', concorrencia=1),
+    'busca': TipoTarefa('epi_admin.busca.reconstruir', concorrencia=1),
+    'contadores': TipoTarefa('epi_admin.contadores.reconstruir', concorrencia=1),
+}
+
+
+def enfileirar(tipo, argumentos=None, created_by=None, executar_em=None):
+    """Grava uma tarefa ``tipo`` com ``argumentos`` (dict JSON) e a devolve."""
+    if tipo not in TIPOS:
+        raise ValueError(f'Tipo de tarefa desconhecido: {tipo!r}.')
+    return Tarefa.objects.create(
+        tipo=tipo,
+        argumentos=argumentos or {},
+        max_tentativas=TIPOS[tipo].max_tentativas,
+        created_by=created_by,
+        executar_em=executar_em or timezone.now(),
+    )
+
+
+def espera(tentativas):
+    """Segundos até a próxima tentativa depois da falha de número ``tentativas``."""
+    base = getattr(settings, 'EPI_TAREFAS_ESPERA', 30)
+    return min(base * 2 ** (tentativas - 1), getattr(settings, 'EPI_TAREFAS_ESPERA_MAXIMA', 3600))
+
+
+def _lotados(tipos):
+    """Tipos com limite de concorrência que já estão no limite."""
+    limitados = {nome: TIPOS[nome].concorrencia for nome in tipos if TIPOS[nome].concorrencia}
+    if not limitados:
+        return []
+    executando = (
+        Tarefa.objects.filter(status=EXECUTANDO, tipo__in=list(limitados))
+        .values_list('tipo').annotate(n=Count('pk'))
+    )
+    return [nome for nome, n in executando if n >= limitados[nome]]
+
+
+def reivindicar(trabalhador, tipos=None):
+    """Marca a próxima tarefa pendente como EXECUTANDO por ``trabalhador`` e a devolve (ou None)."""
+    tipos = [nome for nome in (tipos or TIPOS) if nome in TIPOS]
+    agora = timezone.now()
+    with transaction.atomic():
+        pendentes = (
+            Tarefa.objects.filter(status=PENDENTE, executar_em__lte=agora, tipo__in=tipos)
+            .exclude(tipo__in=_lotados(tipos))
+            .order_by('executar_em', 'pk')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            pendentes = pendentes.select_for_update(skip_locked=True)
+        for pk in pendentes.values_list('pk', flat=True)[:10]:
+            marcada = Tarefa.objects.filter(pk=pk, status=PENDENTE).update(
+                status=EXECUTANDO,
+                trabalhador=trabalhador,
+                iniciada_em=agora,
+                tentativas=F('tentativas') + 1,
+                updated_at=agora,
+            )
+            if marcada:
+                return Tarefa.objects.get(pk=pk)
+    return None
+
+
+def executar(tarefa):
+    """Roda a função da tarefa reivindicada e grava o resultado, a nova tentativa ou a falha."""
+    tipo = TIPOS.get(tarefa.tipo)
+    try:
+        if tipo is None:
+            raise LookupError(f'Tipo de tarefa desconhecido: {tarefa.tipo!r}.')
+        resultado = tipo.funcao()(**tarefa.argumentos)
+    except Exception:
+        agora = timezone.now()
+        alteracoes = {'erro': traceback.format_exc(), 'updated_at': agora}
+        if tipo is not None and tarefa.tentativas < tarefa.max_tentativas:
+            alteracoes.update(status=PENDENTE, executar_em=agora + timedelta(seconds=espera(tarefa.tentativas)))
+        else:
+            alteracoes.update(status=FALHOU, concluida_em=agora)
+        logger.warning('Tarefa #%s (%s) falhou na tentativa %s', tarefa.pk, tarefa.tipo, tarefa.tentativas,
+                       exc_info=True)
+    else:
+        agora = timezone.now()
+        alteracoes = {'status': CONCLUIDA, 'resultado': resultado, 'erro': '', 'concluida_em': agora, 'updated_at': agora}
+    # se a tarefa expirou e outro worker a pegou, o resultado dele é o que vale
+    Tarefa.objects.filter(pk=tarefa.pk, status=EXECUTANDO, trabalhador=tarefa.trabalhador).update(**alteracoes)
+    for campo, valor in alteracoes.items():
+        setattr(tarefa, campo, valor)
+    return tarefa
+
+
+def recuperar_expiradas():
+    """Devolve à fila (ou marca FALHOU) as tarefas EXECUTANDO há mais de EPI_TAREFAS_TIMEOUT; retorna quantas."""
+    agora = timezone.now()
+    limite = agora - timedelta(seconds=getattr(settings, 'EPI_TAREFAS_TIMEOUT', 3600))
+    expiradas = Tarefa.objects.filter(status=EXECUTANDO, iniciada_em__lt=limite)
+    erro = f'Worker parou ou passou de {getattr(settings, "EPI_TAREFAS_TIMEOUT", 3600)} s sem concluir a tarefa.'
+    n = expiradas.filter(tentativas__lt=F('max_tentativas')).update(
+        status=PENDENTE, executar_em=agora, trabalhador='', erro=erro, updated_at=agora,
+    )
+    return n + expiradas.update(status=FALHOU, concluida_em=agora, erro=erro, updated_at=agora)
+
+
+def processar(trabalhador='local', tipos=None, limite=None):
+    """Executa as tarefas pendentes até a fila esvaziar (ou ``limite`` tarefas); retorna quantas rodaram."""
+    n = 0
+    while limite is None or n < limite:
+        tarefa = reivindicar(trabalhador, tipos)
+        if tarefa is None:
+            break
+        executar(tarefa)
+        n += 1
+    return n
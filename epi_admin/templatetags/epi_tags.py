@@ -0,0 +1,11 @@
+from django import template
+
+from .. import miniaturas
+
+register = template.Library()
+
+
+@register.filter
+def miniatura(foto, tamanho=256):
+    """URL da miniatura de uma foto: ``{{ colaborador.fotoColaborador|miniatura:256 }}``."""
+    return miniaturas.url(foto, int(tamanho))
@@ -7,6 +7,7 @@ urlpatterns = [
     # Colaborador URLs
     path('colaboradores/', views.ColaboradorListView.as_view(), name='colaborador_list'),
     path('colaboradores/novo/', views.ColaboradorCreateView.as_view(), name='colaborador_create'),
+    path('colaboradores/importar/', views.ColaboradorImportView.as_view(), name='colaborador_import'),
     path('colaboradores/<int:pk>/', views.ColaboradorDetailView.as_view(), name='colaborador_detail'),
     path('colaboradores/<int:pk>/editar/', views.ColaboradorUpdateView.as_view(), name='colaborador_update'),
     path('colaboradores/<int:pk>/deletar/', views.ColaboradorDeleteView.as_view(), name='colaborador_delete'),
@@ -28,7 +29,29 @@ urlpatterns = [
     # Emprestimo URLs
     path('emprestimos/', views.EmprestimoListView.as_view(), name='emprestimo_list'),
     path('emprestimos/novo/', views.EmprestimoCreateView.as_view(), name='emprestimo_create'),
+    path('emprestimos/lote/', views.EmprestimoLoteCreateView.as_view(), name='emprestimo_lote'),
+    path('emprestimos/exportar/', views.EmprestimoExportView.as_view(), name='emprestimo_export'),
     path('emprestimos/<int:pk>/', views.EmprestimoDetailView.as_view(), name='emprestimo_detail'),
     path('emprestimos/<int:pk>/editar/', views.EmprestimoUpdateView.as_view(), name='emprestimo_update'),
     path('emprestimos/<int:pk>/deletar/', views.EmprestimoDeleteView.as_view(), name='emprestimo_delete'),
+
+    # Painel
+    path('painel/atrasos/', views.PainelAtrasosView.as_view(), name='painel_atrasos'),
+
+    # Autocomplete dos selects de colaborador e EPI
+    path('autocomplete/colaboradores/', views.ColaboradorAutocompleteView.as_view(), name='autocomplete_colaboradores'),
+    path('autocomplete/epis/', views.EPIAutocompleteView.as_view(), name='autocomplete_epis'),
+
+    # API JSON somente leitura (integração com o ERP)
+    path('api/colaboradores/', views.ColaboradorApiView.as_view(), name='api_colaboradores'),
+    path('api/epis/', views.EPIApiView.as_view(), name='api_epis'),
+    path('api/emprestimos/', views.EmprestimoApiView.as_view(), name='api_emprestimos'),
+    path('api/alteracoes/', views.AlteracaoApiView.as_view(), name='api_alteracoes'),
+
+    # Tarefas em segundo plano
+    path('tarefas/', views.TarefaListView.as_view(), name='tarefa_list'),
+    path('tarefas/<int:pk>/arquivo/', views.TarefaArquivoView.as_view(), name='tarefa_arquivo'),
+
+    # Miniaturas das fotos
+    path('miniaturas/<int:tamanho>/<path:nome>', views.MiniaturaView.as_view(), name='miniatura'),
 ]
@@ -0,0 +1,118 @@
+"""Verificação de validade dos EPIs e alertas agrupados por gerente.
+
+Busca, pelo índice de ``EPI.validade``, os EPIs vencidos ou que vencem nos
+próximos N dias e os empréstimos em aberto que ainda estão com eles. Cada
+gerente recebe uma única mensagem com:
+
+- os empréstimos em aberto de colaboradores do seu setor;
+- os itens em estoque vencendo (todos os gerentes, ou só os do setor
+  configurado em ``settings.EPI_ALERTAS_ESTOQUE_SETOR``).
+
+As mensagens são enviadas pelo backend de email do Django (``EMAIL_BACKEND``):
+console em desenvolvimento, locmem nos testes, SMTP em produção. Pela fila de
+tarefas (``verificar``, tarefa ``validade``) uma falha do servidor de email é
+repetida mais tarde em vez de perder os alertas do dia.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import EPI, Emprestimo, Gerente
+
+
+FORMATO_DATA = '%d/%m/%Y'
+
+
+class Alerta:
+    """Itens que um gerente precisa receber numa mesma mensagem."""
+
+    def __init__(self, email, nome):
+        self.email = email
+        self.nome = nome
+        self.estoque = []
+        self.emprestimos = []
+
+    def __len__(self):
+        return len(self.estoque) + len(self.emprestimos)
+
+    def assunto(self):
+        return f'[Controle de EPI] {len(self)} item(ns) com validade vencida ou próxima'
+
+    def corpo(self, hoje):
+        linhas = [f'Olá, {self.nome}.', '']
+        if self.emprestimos:
+            linhas.append('Empréstimos em aberto com EPI vencido ou vencendo:')
+            for e in self.emprestimos:
+                situacao = 'VENCIDO' if e['validade'] < hoje else 'vence'
+                linhas.append(
+                    f"- {e['colaborador']} ({e['setor']}): {e['epi']} — {situacao} em "
+                    f"{e['validade'].strftime(FORMATO_DATA)} (empréstimo #{e['id']})"
+                )
+            linhas.append('')
+        if self.estoque:
+            linhas.append('Itens em estoque com validade vencida ou próxima:')
+            for e in self.estoque:
+                situacao = 'VENCIDO' if e['validade'] < hoje else 'vence'
+                linhas.append(
+                    f"- {e['epi']} ({e['quantidade']} un.) — {situacao} em {e['validade'].strftime(FORMATO_DATA)}"
+                )
+        return '\n'.join(linhas)
+
+
+def coletar_alertas(hoje, dias):
+    """Agrupa por email de gerente os EPIs que vencem até ``hoje + dias``."""
+    limite = hoje + timedelta(days=dias)
+    setor_estoque = getattr(settings, 'EPI_ALERTAS_ESTOQUE_SETOR', None)
+
+    gerentes_por_setor = {}
+    alertas = {}
+    for email, nome, setor in Gerente.objects.values_list('email', 'nome', 'setor').iterator():
+        alertas[email] = Alerta(email, nome)
+        gerentes_por_setor.setdefault(setor, []).append(email)
+    if not alertas:
+        return {}
+    responsaveis_estoque = gerentes_por_setor.get(setor_estoque, []) if setor_estoque else list(alertas)
+
+    estoque = (
+        EPI.objects.filter(validade__lte=limite, quantidade__gt=0)
+        .order_by('validade', 'pk')
+        .values_list('pk', 'nomeAparelho', 'quantidade', 'validade')
+    )
+    for pk, nome, quantidade, data in estoque.iterator():
+        item = {'id': pk, 'epi': nome, 'quantidade': quantidade, 'validade': data}
+        for email in responsaveis_estoque:
+            alertas[email].estoque.append(item)
+
+    emprestimos = (
+        Emprestimo.objects.filter(data_devolucao__isnull=True, epi_nome__validade__lte=limite)
+        .order_by('epi_nome__validade', 'pk')
+        .values_list('pk', 'colaborador__nome', 'colaborador__sobrenome', 'colaborador__setor',
+                     'epi_nome__nomeAparelho', 'epi_nome__validade')
+    )
+    for pk, nome, sobrenome, setor, epi, data in emprestimos.iterator():
+        item = {'id': pk, 'colaborador': f'{nome} {sobrenome}', 'setor': setor, 'epi': epi, 'validade': data}
+        # setor sem gerente: quem cuida do estoque recebe
+        for email in gerentes_por_setor.get(setor) or responsaveis_estoque:
+            alertas[email].emprestimos.append(item)
+
+    return {email: alerta for email, alerta in alertas.items() if alerta}
+
+
+def enviar_alertas(alertas, hoje, connection=None):
+    """Envia uma mensagem por gerente numa única conexão; retorna quantas foram enviadas."""
+    mensagens = [
+        EmailMessage(alerta.assunto(), alerta.corpo(hoje), to=[alerta.email])
+        for alerta in alertas.values()
+    ]
+    if not mensagens:
+        return 0
+    connection = connection or get_connection()
+    return connection.send_messages(mensagens) or 0
+
+
+def verificar(dias, hoje=None):
+    """Coleta e envia os alertas de ``hoje`` (padrão: data local); retorna quantas mensagens foram enviadas."""
+    hoje = hoje or timezone.localdate()
+    return enviar_alertas(coletar_alertas(hoje, dias), hoje)
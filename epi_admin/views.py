@@ -1,16 +1,48 @@
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import logout as auth_logout
-from django.http import HttpResponseRedirect
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
+from django.http import FileResponse, Http404, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.views.generic import View, ListView, CreateView, UpdateView, DeleteView, DetailView, FormView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db.models import Count
 from django.utils.crypto import get_random_string
-from .models import Colaborador, Gerente, EPI, Emprestimo
-from .forms import ColaboradorForm, GerenteForm, EPIForm, EmprestimoForm
-
+from PIL import UnidentifiedImageError
+from .models import Colaborador, Gerente, EPI, Emprestimo, Tarefa
+from . import alteracoes, api, busca, estoque, miniaturas, provisionamento, resumo, tarefas
+from .exportacao import linhas_csv
+from .forms import (
+    ColaboradorForm, ColaboradorImportForm, GerenteForm, EPIForm,
+    EmprestimoForm, EmprestimoLoteForm, EmprestimoExportFiltroForm,
+)
+from .importacao import importar_colaboradores, ler_planilha
+from .assincrono import LoginAssincronoMixin, PaginaAssincronaMixin, em_asgi
+from .busca import BuscaMixin
+from .condicional import GetCondicionalMixin
+from .contadores import ContadoresDetalheMixin, ContadoresListaMixin
+from .fragmentos import FragmentoCacheMixin
+from .pagination import KeysetPaginationMixin, apaginate_keyset
+
+
+class ObjetoCacheadoMixin:
+    """Busca o objeto da view uma única vez por requisição.
+
+    test_func() consulta o objeto para decidir a permissão e a view (get/post)
+    consulta de novo; com este mixin a segunda chamada reaproveita a primeira.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_objeto'):
+            self._objeto = super().get_object()
+        return self._objeto
 
 
 # ==================== CUSTOM LOGOUT ====================
@@ -20,9 +52,11 @@ def custom_logout(request):
 
 # ==================== COLABORADOR ====================
 
-class ColaboradorListView(LoginRequiredMixin, ListView):
+class ColaboradorListView(PaginaAssincronaMixin, GetCondicionalMixin, FragmentoCacheMixin, ContadoresListaMixin, BuscaMixin, KeysetPaginationMixin, ListView):
     model = Colaborador
     template_name = 'epi_admin/colaborador_list.html'
+    fragmento_template_name = 'epi_admin/colaborador_list_conteudo.html'
+    fragmento_modelos = (Colaborador,)
     context_object_name = 'colaboradores'
     paginate_by = 10
 
@@ -41,6 +75,26 @@ class ColaboradorCreateView(PermissionRequiredMixin, LoginRequiredMixin, CreateV
         return super().form_valid(form)
 
 
+class ColaboradorImportView(PermissionRequiredMixin, LoginRequiredMixin, FormView):
+    """Importa colaboradores de uma planilha e mostra o relatório por linha."""
+    permission_required = 'epi_admin.add_colaborador'
+    form_class = ColaboradorImportForm
+    template_name = 'epi_admin/colaborador_import.html'
+
+    def form_valid(self, form):
+        arquivo = form.cleaned_data['arquivo']
+        try:
+            relatorio = importar_colaboradores(ler_planilha(arquivo.file, arquivo.name), usuario=self.request.user)
+        except ValueError as e:
+            form.add_error('arquivo', str(e))
+            return self.form_invalid(form)
+        if relatorio.total_erros:
+            messages.warning(self.request, f'Importação concluída com erros: {relatorio}.')
+        else:
+            messages.success(self.request, f'Importação concluída: {relatorio}.')
+        return self.render_to_response(self.get_context_data(form=ColaboradorImportForm(), relatorio=relatorio))
+
+
 class ColaboradorUpdateView(PermissionRequiredMixin, LoginRequiredMixin, UpdateView):
     permission_required = 'epi_admin.change_colaborador'
     model = Colaborador
@@ -53,7 +107,7 @@ class ColaboradorUpdateView(PermissionRequiredMixin, LoginRequiredMixin, UpdateV
         return super().form_valid(form)
 
 
-class ColaboradorDeleteView(UserPassesTestMixin, LoginRequiredMixin, DeleteView):
+class ColaboradorDeleteView(UserPassesTestMixin, LoginRequiredMixin, ObjetoCacheadoMixin, DeleteView):
     model = Colaborador
     template_name = 'epi_admin/colaborador_confirm_delete.html'
     success_url = reverse_lazy('colaborador_list')
@@ -64,29 +118,53 @@ class ColaboradorDeleteView(UserPassesTestMixin, LoginRequiredMixin, DeleteView)
             return True
         obj = self.get_object()
         # require both ownership and delete permission
-        return obj.created_by == user and user.has_perm('epi_admin.delete_colaborador')
+        return obj.created_by_id == user.pk and user.has_perm('epi_admin.delete_colaborador')
 
     def delete(self, request, *args, **kwargs):
         messages.success(request, 'Colaborador deletado com sucesso!')
         return super().delete(request, *args, **kwargs)
 
 
-class ColaboradorDetailView(LoginRequiredMixin, DetailView):
+class ColaboradorDetailView(PaginaAssincronaMixin, GetCondicionalMixin, FragmentoCacheMixin, ContadoresDetalheMixin, DetailView):
     model = Colaborador
     template_name = 'epi_admin/colaborador_detail.html'
+    fragmento_template_name = 'epi_admin/colaborador_detail_conteudo.html'
+    fragmento_modelos = (Colaborador,)
     context_object_name = 'colaborador'
 
 
 # ==================== GERENTE ====================
 
-class GerenteListView(LoginRequiredMixin, ListView):
+class GerenteListView(PaginaAssincronaMixin, GetCondicionalMixin, FragmentoCacheMixin, KeysetPaginationMixin, ListView):
     model = Gerente
     template_name = 'epi_admin/gerente_list.html'
+    fragmento_template_name = 'epi_admin/gerente_list_conteudo.html'
+    fragmento_modelos = (Gerente, get_user_model())
     context_object_name = 'gerentes'
     paginate_by = 10
+    queryset = Gerente.objects.select_related('user')
+
+
+class ProvisionamentoGerenteMixin:
+    """Depois de salvar o gerente, garante o usuário dele (provisionamento.sincronizar).
 
+    Só superusers criam usuários novos; os demais apenas vinculam o gerente a
+    um usuário existente com o mesmo email ou atualizam o email do vinculado.
+    """
 
-class GerenteCreateView(UserPassesTestMixin, LoginRequiredMixin, CreateView):
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        relatorio = provisionamento.sincronizar([self.object], criar_usuarios=self.request.user.is_superuser)
+        for user in relatorio.criados:
+            messages.info(self.request, f'Usuário "{user.username}" criado para o gerente; defina a senha via Admin.')
+        if relatorio.sem_usuario:
+            messages.warning(self.request, 'Usuário com esse email não existe e apenas admin pode criá-lo automaticamente.')
+        for gerente, motivo in relatorio.conflitos:
+            messages.warning(self.request, f'Usuário do gerente não sincronizado: {motivo}.')
+        return response
+
+
+class GerenteCreateView(UserPassesTestMixin, LoginRequiredMixin, ProvisionamentoGerenteMixin, CreateView):
     # Only superusers can create Gerente objects via the UI
     def test_func(self):
         return self.request.user.is_superuser
@@ -96,49 +174,12 @@ class GerenteCreateView(UserPassesTestMixin, LoginRequiredMixin, CreateView):
     success_url = reverse_lazy('gerente_list')
 
     def form_valid(self, form):
-        # salva a instância primeiro
         response = super().form_valid(form)
-        # sincroniza/garante que exista um User associado com o email informado
-        email = form.cleaned_data.get('email')
-        if email:
-            User = get_user_model()
-            gerente = self.object
-            # Se já houver usuário associado, atualiza o email
-            if getattr(gerente, 'user', None):
-                user = gerente.user
-                user.email = email
-                user.save()
-            else:
-                # tenta encontrar um usuário existente com o mesmo email
-                try:
-                    user = User.objects.get(email=email)
-                    gerente.user = user
-                    gerente.save()
-                except User.DoesNotExist:
-                    # somente superuser pode criar novo usuário automaticamente
-                    if self.request.user.is_superuser:
-                        # use the full email as the username so login with email works
-                        username = email
-                        password = User.objects.make_random_password()
-                        user = User.objects.create_user(username=username, email=email, password=password)
-                        # marca como staff e adiciona ao grupo Gerentes se existir
-                        user.is_staff = True
-                        try:
-                            group = Group.objects.get(name='Gerentes')
-                            user.groups.add(group)
-                        except Group.DoesNotExist:
-                            pass
-                        user.save()
-                        gerente.user = user
-                        gerente.save()
-                        messages.info(self.request, f'Usuário "{user.username}" criado para o gerente; defina a senha via Admin.')
-                    else:
-                        messages.warning(self.request, 'Usuário com esse email não existe e apenas admin pode criá-lo automaticamente.')
         messages.success(self.request, f'Gerente {form.cleaned_data["nome"]} criado com sucesso!')
         return response
 
 
-class GerenteUpdateView(UserPassesTestMixin, LoginRequiredMixin, UpdateView):
+class GerenteUpdateView(UserPassesTestMixin, LoginRequiredMixin, ObjetoCacheadoMixin, ProvisionamentoGerenteMixin, UpdateView):
     # Superusers can update any Gerente; regular gerentes can update only themselves
     def test_func(self):
         obj = self.get_object()
@@ -146,7 +187,8 @@ class GerenteUpdateView(UserPassesTestMixin, LoginRequiredMixin, UpdateView):
         if self.request.user.is_superuser:
             return True
         # For non-superusers: check if obj.user exists and matches current user
-        if obj.user and obj.user == self.request.user:
+        # (compara os ids para não carregar obj.user só para a verificação)
+        if obj.user_id and obj.user_id == self.request.user.pk:
             return True
         return False
 
@@ -156,47 +198,12 @@ class GerenteUpdateView(UserPassesTestMixin, LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('gerente_list')
 
     def form_valid(self, form):
-        # salva a instância primeiro
         response = super().form_valid(form)
-        # sincroniza email com o User associado
-        email = form.cleaned_data.get('email')
-        if email:
-            User = get_user_model()
-            gerente = self.object
-            if getattr(gerente, 'user', None):
-                user = gerente.user
-                user.email = email
-                user.save()
-            else:
-                try:
-                    user = User.objects.get(email=email)
-                    gerente.user = user
-                    gerente.save()
-                except User.DoesNotExist:
-                    # se o gerente atual estiver atualizando e não houver user, não criamos automaticamente
-                    # apenas superuser pode criar usuário automaticamente
-                    if self.request.user.is_superuser:
-                        # use the full email as the username so login with email works
-                        username = email
-                        password = User.objects.make_random_password()
-                        user = User.objects.create_user(username=username, email=email, password=password)
-                        user.is_staff = True
-                        try:
-                            group = Group.objects.get(name='Gerentes')
-                            user.groups.add(group)
-                        except Group.DoesNotExist:
-                            pass
-                        user.save()
-                        gerente.user = user
-                        gerente.save()
-                        messages.info(self.request, f'Usuário "{user.username}" criado para o gerente; defina a senha via Admin.')
-                    else:
-                        messages.warning(self.request, 'Usuário com esse email não existe e apenas admin pode criá-lo automaticamente.')
         messages.success(self.request, f'Gerente {form.cleaned_data["nome"]} atualizado com sucesso!')
         return response
 
 
-class GerenteDeleteView(UserPassesTestMixin, LoginRequiredMixin, DeleteView):
+class GerenteDeleteView(UserPassesTestMixin, LoginRequiredMixin, ObjetoCacheadoMixin, DeleteView):
     # Superusers can delete any Gerente; regular gerentes can delete only themselves
     def test_func(self):
         obj = self.get_object()
@@ -204,7 +211,8 @@ class GerenteDeleteView(UserPassesTestMixin, LoginRequiredMixin, DeleteView):
         if self.request.user.is_superuser:
             return True
         # For non-superusers: check if obj.user exists and matches current user
-        if obj.user and obj.user == self.request.user:
+        # (compara os ids para não carregar obj.user só para a verificação)
+        if obj.user_id and obj.user_id == self.request.user.pk:
             return True
         return False
 
@@ -217,17 +225,21 @@ class GerenteDeleteView(UserPassesTestMixin, LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class GerenteDetailView(LoginRequiredMixin, DetailView):
+class GerenteDetailView(PaginaAssincronaMixin, GetCondicionalMixin, FragmentoCacheMixin, DetailView):
     model = Gerente
     template_name = 'epi_admin/gerente_detail.html'
+    fragmento_template_name = 'epi_admin/gerente_detail_conteudo.html'
+    fragmento_modelos = (Gerente, get_user_model())
     context_object_name = 'gerente'
 
 
 # ==================== EPI ====================
 
-class EPIListView(LoginRequiredMixin, ListView):
+class EPIListView(PaginaAssincronaMixin, GetCondicionalMixin, FragmentoCacheMixin, ContadoresListaMixin, BuscaMixin, KeysetPaginationMixin, ListView):
     model = EPI
     template_name = 'epi_admin/epi_list.html'
+    fragmento_template_name = 'epi_admin/epi_list_conteudo.html'
+    fragmento_modelos = (EPI,)
     context_object_name = 'epis'
     paginate_by = 10
 
@@ -267,19 +279,25 @@ class EPIDeleteView(PermissionRequiredMixin, LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class EPIDetailView(LoginRequiredMixin, DetailView):
+class EPIDetailView(PaginaAssincronaMixin, GetCondicionalMixin, FragmentoCacheMixin, ContadoresDetalheMixin, DetailView):
     model = EPI
     template_name = 'epi_admin/epi_detail.html'
+    fragmento_template_name = 'epi_admin/epi_detail_conteudo.html'
+    fragmento_modelos = (EPI,)
     context_object_name = 'epi'
 
 
 # ==================== EMPRESTIMO ====================
 
-class EmprestimoListView(LoginRequiredMixin, ListView):
+class EmprestimoListView(PaginaAssincronaMixin, GetCondicionalMixin, FragmentoCacheMixin, BuscaMixin, KeysetPaginationMixin, ListView):
     model = Emprestimo
     template_name = 'epi_admin/emprestimo_list.html'
+    fragmento_template_name = 'epi_admin/emprestimo_list_conteudo.html'
+    fragmento_modelos = (Emprestimo, Colaborador, EPI)
+    condicional_relacoes = ('colaborador', 'epi_nome')
     context_object_name = 'emprestimos'
     paginate_by = 10
+    queryset = Emprestimo.objects.select_related('colaborador', 'epi_nome')
 
 
 class EmprestimoCreateView(PermissionRequiredMixin, LoginRequiredMixin, CreateView):
@@ -290,7 +308,36 @@ class EmprestimoCreateView(PermissionRequiredMixin, LoginRequiredMixin, CreateVi
     success_url = reverse_lazy('emprestimo_list')
 
     def form_valid(self, form):
+        try:
+            response = super().form_valid(form)
+        except ValidationError as e:
+            # o estoque pode ter acabado entre a validação do formulário e a reserva
+            form.add_error(None, e)
+            return self.form_invalid(form)
         messages.success(self.request, 'Empréstimo criado com sucesso!')
+        return response
+
+
+class EmprestimoLoteCreateView(PermissionRequiredMixin, LoginRequiredMixin, FormView):
+    """Retirada de um kit de EPIs para vários colaboradores numa única transação."""
+    permission_required = 'epi_admin.add_emprestimo'
+    form_class = EmprestimoLoteForm
+    template_name = 'epi_admin/emprestimo_lote_form.html'
+    success_url = reverse_lazy('emprestimo_list')
+
+    def form_valid(self, form):
+        try:
+            emprestimos = estoque.emprestar_kit(
+                form.cleaned_data['colaboradores'],
+                form.cleaned_data['epis'],
+                form.cleaned_data['data_emprestimo'],
+                form.cleaned_data['data_prevista'],
+                form.cleaned_data['condicao_retirada'],
+            )
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
+        messages.success(self.request, f'{len(emprestimos)} empréstimos criados com sucesso!')
         return super().form_valid(form)
 
 
@@ -317,7 +364,250 @@ class EmprestimoDeleteView(PermissionRequiredMixin, LoginRequiredMixin, DeleteVi
         return super().delete(request, *args, **kwargs)
 
 
-class EmprestimoDetailView(LoginRequiredMixin, DetailView):
+class EmprestimoDetailView(PaginaAssincronaMixin, GetCondicionalMixin, FragmentoCacheMixin, DetailView):
     model = Emprestimo
     template_name = 'epi_admin/emprestimo_detail.html'
+    fragmento_template_name = 'epi_admin/emprestimo_detail_conteudo.html'
+    fragmento_modelos = (Emprestimo, Colaborador, EPI)
+    condicional_relacoes = ('colaborador', 'epi_nome')
     context_object_name = 'emprestimo'
+
+
+class EmprestimoExportView(PermissionRequiredMixin, LoginRequiredMixin, View):
+    """Exporta o histórico de empréstimos em CSV, transmitido em stream.
+
+    Filtros opcionais na query string: data_inicio, data_fim (DD/MM/AA ou
+    AAAA-MM-DD), setor, epi (id) e status (abertos/devolvidos). Com
+    ``segundo_plano=1`` o arquivo é gerado pela fila de tarefas e baixado
+    depois pela página de tarefas.
+    """
+    permission_required = 'epi_admin.view_emprestimo'
+
+    def get(self, request, *args, **kwargs):
+        form = EmprestimoExportFiltroForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text(), content_type='text/plain; charset=utf-8')
+        if request.GET.get('segundo_plano'):
+            destino = f'exportacoes/emprestimos-{get_random_string(16)}.csv'
+            tarefas.enfileirar('exportacao', {'filtros': form.cleaned_data, 'destino': destino}, created_by=request.user)
+            messages.success(request, 'Exportação enfileirada: o arquivo aparece aqui quando ficar pronto.')
+            return redirect('tarefa_list')
+        response = StreamingHttpResponse(linhas_csv(form.cleaned_data), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="emprestimos.csv"'
+        return response
+
+
+# ==================== PAINEL ====================
+
+class PainelAtrasosView(LoginRequiredMixin, TemplateView):
+    """Empréstimos em aberto, atrasados e devolvidos hoje por setor e por EPI.
+
+    Lê o resumo pré-agregado (ResumoEmprestimo) com uma única consulta; os
+    totais por setor e por EPI são somados em memória a partir dela.
+    """
+    template_name = 'epi_admin/painel_atrasos.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        hoje = timezone.localdate()
+        linhas = resumo.painel(hoje)
+        por_setor, por_epi = {}, {}
+        for linha in linhas:
+            for grupos, chave, rotulo in ((por_setor, linha['setor'], linha['setor']),
+                                          (por_epi, linha['epi_id'], linha['epi__nomeAparelho'])):
+                total = grupos.setdefault(chave, {'nome': rotulo, 'abertos': 0, 'atrasados': 0, 'devolvidos_hoje': 0})
+                total['abertos'] += linha['total_abertos']
+                total['atrasados'] += linha['atrasados']
+                total['devolvidos_hoje'] += linha['devolvidos_hoje']
+        context.update({
+            'hoje': hoje,
+            'linhas': linhas,
+            'por_setor': sorted(por_setor.values(), key=lambda t: (-t['atrasados'], t['nome'])),
+            'por_epi': sorted(por_epi.values(), key=lambda t: (-t['atrasados'], t['nome'])),
+        })
+        return context
+
+
+# ==================== TAREFAS ====================
+
+class TarefaListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """Tarefas em segundo plano, das mais novas para as mais antigas.
+
+    Cada usuário vê as que pediu (exportações); superusers veem todas e as
+    contagens de pendentes, em execução e com falha por tipo.
+    """
+    model = Tarefa
+    template_name = 'epi_admin/tarefa_list.html'
+    context_object_name = 'tarefas'
+    paginate_by = 25
+    keyset_ordering = ('-pk',)
+
+    def get_queryset(self):
+        queryset = Tarefa.objects.all()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.request.user.is_superuser:
+            context['contagens'] = list(
+                Tarefa.objects.exclude(status=Tarefa.CONCLUIDA)
+                .values('tipo', 'status').annotate(total=Count('pk')).order_by('tipo', 'status')
+            )
+        return context
+
+
+class TarefaArquivoView(LoginRequiredMixin, View):
+    """Baixa o arquivo gerado por uma tarefa concluída, só para quem a pediu."""
+
+    def get(self, request, pk):
+        tarefa = get_object_or_404(Tarefa, pk=pk, status=Tarefa.CONCLUIDA, created_by=request.user)
+        arquivo = tarefa.resultado.get('arquivo') if isinstance(tarefa.resultado, dict) else None
+        if not arquivo or not default_storage.exists(arquivo):
+            raise Http404('Arquivo inexistente.')
+        return FileResponse(default_storage.open(arquivo, 'rb'), as_attachment=True,
+                            filename=os.path.basename(arquivo), content_type='text/csv; charset=utf-8')
+
+
+# ==================== MINIATURAS ====================
+
+class MiniaturaView(LoginRequiredMixin, View):
+    """Serve a miniatura de uma foto, gerando-a se ainda não existir.
+
+    Normalmente a miniatura já foi gerada em segundo plano após o upload; a
+    geração aqui só cobre fotos antigas ou a janela logo após o envio. Como
+    cada upload recebe um nome novo, a resposta pode ficar em cache no
+    navegador indefinidamente.
+    """
+    cache_control = 'private, max-age=31536000, immutable'
+
+    def get(self, request, tamanho, nome):
+        if tamanho not in miniaturas.TAMANHOS or not miniaturas.nome_permitido(nome):
+            raise Http404('Miniatura inexistente.')
+        destino = miniaturas.nome_miniatura(nome, tamanho)
+        if not default_storage.exists(destino):
+            try:
+                miniaturas.gerar(nome)
+            except (OSError, UnidentifiedImageError):
+                raise Http404('Foto inexistente ou inválida.')
+        response = FileResponse(default_storage.open(destino, 'rb'), content_type='image/jpeg')
+        response['Cache-Control'] = self.cache_control
+        return response
+
+
+# ==================== AUTOCOMPLETE ====================
+
+class AutocompleteView(LoginAssincronoMixin, View):
+    """Opções dos selects com autocomplete (AutocompleteSelect), em JSON.
+
+    ``?q=`` filtra pelo índice de busca e ``?cursor=`` pede a próxima página
+    (paginação por chave, na ordem de ``ordering``). Responde
+    ``{"results": [{"id", "text"}], "next": cursor ou null}``; a resposta pode
+    ficar alguns segundos no cache do navegador enquanto o usuário digita.
+    O texto de cada opção é ``formato_texto`` preenchido com os ``campos``
+    (sem ele, os campos separados por espaço).
+    """
+    queryset = None
+    ordering = ('pk',)
+    campos = ()
+    formato_texto = None
+    page_size = 20
+    cache_control = 'private, max-age=30'
+
+    def texto(self, linha):
+        if self.formato_texto is None:
+            return ' '.join(str(linha[campo]) for campo in self.campos) or str(linha['pk'])
+        return self.formato_texto.format(**linha)
+
+    async def get(self, request, *args, **kwargs):
+        queryset = busca.filtrar(self.queryset.all(), request.GET.get('q', '').strip())
+        try:
+            page = await apaginate_keyset(
+                queryset.values('pk', *self.campos), self.ordering, self.page_size, request.GET.get('cursor') or None,
+            )
+        except ValueError:
+            return HttpResponseBadRequest('Cursor inválido.')
+        response = JsonResponse({
+            'results': [{'id': linha['pk'], 'text': self.texto(linha)} for linha in page],
+            'next': page.next_cursor,
+        })
+        response['Cache-Control'] = self.cache_control
+        return response
+
+
+class ColaboradorAutocompleteView(AutocompleteView):
+    """Colaboradores ativos (os únicos que podem receber empréstimos), por nome."""
+    queryset = Colaborador.objects.filter(is_ativo=True)
+    # mesma ordem do índice parcial colaborador_ativo_nome_idx
+    ordering = ('nome', 'sobrenome', 'pk')
+    campos = ('nome', 'sobrenome', 'setor')
+    formato_texto = '{nome} {sobrenome} ({setor})'
+
+
+class EPIAutocompleteView(AutocompleteView):
+    """EPIs com estoque, por nome."""
+    queryset = EPI.objects.filter(quantidade__gt=0)
+    ordering = ('nomeAparelho', 'pk')
+    campos = ('nomeAparelho', 'categoria')
+    formato_texto = '{nomeAparelho} ({categoria})'
+
+
+# ==================== API ====================
+
+class ApiListView(LoginAssincronoMixin, View):
+    """Lista JSON somente leitura de um recurso da API (ver epi_admin.api), em stream.
+
+    Sem permissão ou sem login responde 403, em vez do redirecionamento para a
+    tela de login, que um cliente da API não saberia seguir.
+    """
+    recurso = None
+    raise_exception = True
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            colunas = self.recurso.colunas(request.GET.get('fields'))
+            limite = api.ler_limite(request.GET.get('limit'))
+            janela = api.preparar_pagina(self.recurso, colunas, limite, request.GET.get('cursor') or None)
+        except ValueError as exc:
+            return JsonResponse({'erro': str(exc)}, status=400)
+        # sob WSGI o stream precisa ser síncrono; sob ASGI, assíncrono (senão o Django junta tudo antes de enviar)
+        pagina = api.apagina_json if em_asgi(request) else api.pagina_json
+        response = StreamingHttpResponse(pagina(janela, colunas, limite), content_type='application/json')
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+
+class ColaboradorApiView(ApiListView):
+    permission_required = 'epi_admin.view_colaborador'
+    recurso = api.COLABORADORES
+
+
+class EPIApiView(ApiListView):
+    permission_required = 'epi_admin.view_epi'
+    recurso = api.EPIS
+
+
+class EmprestimoApiView(ApiListView):
+    permission_required = 'epi_admin.view_emprestimo'
+    recurso = api.EMPRESTIMOS
+
+
+class AlteracaoApiView(LoginAssincronoMixin, View):
+    """Feed de alterações (ver epi_admin.alteracoes): o que mudou depois de ``?cursor=``.
+
+    Traz os dados atuais de colaboradores, EPIs e empréstimos, então exige a
+    permissão de visualizar os três.
+    """
+    permission_required = ('epi_admin.view_colaborador', 'epi_admin.view_epi', 'epi_admin.view_emprestimo')
+    raise_exception = True
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            limite = api.ler_limite(request.GET.get('limit'))
+            dados = await alteracoes.apagina(limite, request.GET.get('cursor') or None)
+        except ValueError as exc:
+            return JsonResponse({'erro': str(exc)}, status=400)
+        response = JsonResponse(dados, json_dumps_params={'ensure_ascii': False})
+        response['Cache-Control'] = 'private, no-store'
+        return response
@@ -0,0 +1,16 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def limpar_cache():
+    # o banco volta ao estado inicial a cada teste; o cache (usuários da sessão) também precisa voltar
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def fragmentos_no_cache_local(settings):
+    # os testes rodam num único processo: o cache de fragmentos vale na memória local
+    settings.EPI_FRAGMENTOS_CACHE_LOCAL = True
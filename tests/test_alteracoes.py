@@ -0,0 +1,119 @@
+import io
+from datetime import date
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+from epi_admin import dados_sinteticos, estoque
+from epi_admin.importacao import importar_colaboradores, ler_csv
+from epi_admin.models import Alteracao, Colaborador, EPI, Emprestimo
+
+
+def _log(depois_de=0):
+    return list(Alteracao.objects.filter(pk__gt=depois_de).order_by('pk').values_list('modelo', 'operacao'))
+
+
+@pytest.fixture
+def colaborador():
+    return Colaborador.objects.create(nome='Ana', sobrenome='Silva', setor='Obra', cpf='12345678900')
+
+
+@pytest.fixture
+def luva():
+    return EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=5, validade='2030-12-31')
+
+
+@pytest.mark.django_db
+def test_emprestimo_registra_tambem_o_estoque(colaborador, luva):
+    inicio = Alteracao.objects.latest('pk').pk
+    emprestimo = Emprestimo.objects.create(colaborador=colaborador, epi_nome=luva, data_emprestimo=date(2025, 1, 1))
+    assert _log(inicio) == [('epi', 'ALTERADO'), ('emprestimo', 'CRIADO')]
+
+    inicio = Alteracao.objects.latest('pk').pk
+    emprestimo.data_devolucao, emprestimo.condicao_devolucao = date(2025, 1, 3), 'BOA'
+    emprestimo.save()
+    assert _log(inicio) == [('epi', 'ALTERADO'), ('emprestimo', 'ALTERADO')]
+
+    inicio = Alteracao.objects.latest('pk').pk
+    Emprestimo.objects.create(colaborador=colaborador, epi_nome=luva, data_emprestimo=date(2025, 1, 5)).delete()
+    assert _log(inicio) == [('epi', 'ALTERADO'), ('emprestimo', 'CRIADO'), ('epi', 'ALTERADO'), ('emprestimo', 'APAGADO')]
+
+
+@pytest.mark.django_db
+def test_caminhos_em_massa_registram(colaborador, luva):
+    inicio = Alteracao.objects.latest('pk').pk
+    outro = Colaborador.objects.create(nome='Bia', sobrenome='Souza', setor='Obra', cpf='98765432100')
+    emprestimos = estoque.emprestar_kit([colaborador, outro], [luva], date(2025, 1, 1))
+    registros = Alteracao.objects.filter(pk__gt=inicio, modelo='emprestimo')
+    assert sorted(registros.values_list('objeto_id', flat=True)) == sorted(e.pk for e in emprestimos)
+
+    inicio = Alteracao.objects.latest('pk').pk
+    importar_colaboradores(ler_csv(io.BytesIO(b'Nome;Sobrenome;Setor;CPF;Ativo\nAna;Silva;TI;12345678900;sim\n'
+                                              b'Caio;Lima;Obra;11122233344;sim\n')))
+    novo = Colaborador.objects.get(cpf='11122233344')
+    assert set(Alteracao.objects.filter(pk__gt=inicio).values_list('objeto_id', 'operacao')) == {
+        (colaborador.pk, 'ALTERADO'), (novo.pk, 'CRIADO'),
+    }
+
+
+@pytest.mark.django_db
+def test_falha_desfaz_o_registro(colaborador, luva):
+    luva.quantidade = 0
+    luva.save()
+    inicio = Alteracao.objects.latest('pk').pk
+    with pytest.raises(ValidationError):
+        estoque.emprestar_kit([colaborador], [luva], date(2025, 1, 1))
+    assert _log(inicio) == []
+
+
+@pytest.mark.django_db
+def test_dados_sinteticos_registram_cada_linha():
+    dados_sinteticos.gerar(1, seed=3, hoje=date(2025, 6, 1))
+    for model in (Colaborador, EPI, Emprestimo):
+        criados = Alteracao.objects.filter(modelo=model._meta.model_name, operacao='CRIADO')
+        assert sorted(criados.values_list('objeto_id', flat=True)) == sorted(model.objects.values_list('pk', flat=True))
+
+
+@pytest.mark.django_db
+def test_feed_pagina_as_alteracoes_depois_do_cursor(admin_client, colaborador, luva, django_assert_max_num_queries):
+    url = reverse('api_alteracoes')
+    dados = admin_client.get(url).json()
+    assert [(r['modelo'], r['id'], r['operacao']) for r in dados['results']] == [
+        ('colaborador', colaborador.pk, 'CRIADO'), ('epi', luva.pk, 'CRIADO'),
+    ]
+    assert dados['results'][1]['dados']['quantidade'] == 5 and not dados['has_more']
+    cursor = dados['next']
+
+    # nada novo: o cursor volta igual
+    assert admin_client.get(url, {'cursor': cursor}).json() == {'results': [], 'next': cursor, 'has_more': False}
+
+    for i in range(4):
+        Emprestimo.objects.create(colaborador=colaborador, epi_nome=luva, data_emprestimo=date(2025, 1, 1 + i))
+    botas = [EPI.objects.create(nomeAparelho=f'Bota {i}', categoria='Pés', quantidade=1, validade='2030-12-31')
+             for i in range(6)]
+    botas[-1].delete()
+
+    vistos = []
+    while True:
+        # a sessão e o usuário, as alterações e uma consulta por modelo com objetos ainda existentes
+        with django_assert_max_num_queries(6):
+            dados = admin_client.get(url, {'cursor': cursor, 'limit': 7}).json()
+        vistos += dados['results']
+        cursor = dados['next']
+        if not dados['has_more']:
+            break
+    assert [r['seq'] for r in vistos] == sorted(r['seq'] for r in vistos)
+    assert len(vistos) == 4 * 2 + 6 + 1
+    apagada = vistos[-1]
+    assert apagada['operacao'] == 'APAGADO' and apagada['dados'] is None
+    # dados atuais: o estoque da luva já reflete os quatro empréstimos
+    assert {r['dados']['quantidade'] for r in vistos if r['modelo'] == 'epi' and r['id'] == luva.pk} == {1}
+
+
+@pytest.mark.django_db
+def test_feed_exige_permissoes_e_cursor_valido(admin_client, client, django_user_model):
+    url = reverse('api_alteracoes')
+    assert admin_client.get(url, {'cursor': 'invalido'}).status_code == 400
+    client.force_login(django_user_model.objects.create_user('ana', 'ana@example.com', 'x'))
+    assert client.get(url).status_code == 403
@@ -0,0 +1,77 @@
+import json
+from datetime import date
+
+import pytest
+from django.urls import reverse
+
+from epi_admin.models import Colaborador, EPI, Emprestimo
+
+
+def _json(response):
+    assert response.streaming
+    return json.loads(b''.join(response.streaming_content))
+
+
+@pytest.fixture
+def emprestimos():
+    colaborador = Colaborador.objects.create(nome='João', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    luva = EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=10, validade='2030-12-31')
+    return [Emprestimo.objects.create(colaborador=colaborador, epi_nome=luva, data_emprestimo=date(2025, 1, i))
+            for i in range(1, 6)]
+
+
+@pytest.mark.django_db
+def test_sincronizacao_completa_percorre_as_paginas(admin_client, emprestimos, django_assert_max_num_queries):
+    url = reverse('api_emprestimos')
+    admin_client.get(url)  # aquece o cache do usuário da sessão e das permissões
+    ids, cursor = [], None
+    while True:
+        with django_assert_max_num_queries(2):  # a sessão e a página
+            dados = _json(admin_client.get(url, {'limit': 2, **({'cursor': cursor} if cursor else {})}))
+        ids += [linha['id'] for linha in dados['results']]
+        cursor = dados['next']
+        if cursor is None:
+            break
+    assert ids == [e.pk for e in emprestimos]
+
+
+@pytest.mark.django_db
+def test_fields_seleciona_so_as_colunas_pedidas(admin_client, emprestimos, django_assert_max_num_queries):
+    admin_client.get(reverse('api_emprestimos'))
+    with django_assert_max_num_queries(2) as consultas:
+        dados = _json(admin_client.get(reverse('api_emprestimos'), {'fields': 'id,epi_nome,data_emprestimo', 'limit': 1}))
+    assert dados['results'] == [{'id': emprestimos[0].pk, 'epi_nome': 'Luva', 'data_emprestimo': '2025-01-01'}]
+    sql = consultas.captured_queries[-1]['sql']
+    assert 'JOIN "epi_admin_epi"' in sql and 'epi_admin_colaborador' not in sql
+    assert 'condicao_retirada' not in sql and 'COUNT(' not in sql
+
+    # sem campos de relações, nenhum JOIN
+    with django_assert_max_num_queries(2) as consultas:
+        _json(admin_client.get(reverse('api_emprestimos'), {'fields': 'id,colaborador,epi'}))
+    assert 'JOIN' not in consultas.captured_queries[-1]['sql']
+
+
+@pytest.mark.django_db
+def test_todos_os_campos_por_padrao(admin_client, emprestimos):
+    colaborador = _json(admin_client.get(reverse('api_colaboradores')))['results'][0]
+    assert colaborador['nome'] == 'João' and colaborador['is_ativo'] is True
+    assert set(colaborador) == {'id', 'nome', 'sobrenome', 'setor', 'cpf', 'is_ativo', 'created_at', 'updated_at'}
+    epi = _json(admin_client.get(reverse('api_epis')))['results'][0]
+    assert epi['quantidade'] == 5 and epi['validade'] == '2030-12-31'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('parametros', [{'fields': 'id,senha'}, {'fields': ','}, {'limit': 'x'}, {'limit': 5000},
+                                        {'cursor': 'invalido'}])
+def test_parametros_invalidos(admin_client, parametros):
+    response = admin_client.get(reverse('api_epis'), parametros)
+    assert response.status_code == 400
+    assert 'erro' in response.json()
+
+
+@pytest.mark.django_db
+def test_exige_login_e_permissao(client, django_user_model):
+    url = reverse('api_colaboradores')
+    assert client.get(url).status_code == 403
+    client.force_login(django_user_model.objects.create_user('ana', 'ana@example.com', 'x'))
+    assert client.get(url).status_code == 403
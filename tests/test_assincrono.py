@@ -0,0 +1,122 @@
+import json
+from datetime import date
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Permission
+from django.test import AsyncClient
+from django.urls import reverse
+
+from epi_admin.models import Colaborador, EPI, Emprestimo
+
+
+async def _conteudo(response):
+    if response.streaming:
+        return b''.join([parte async for parte in response.streaming_content])
+    return response.content
+
+
+def _get(cliente, url, **kwargs):
+    """GET pelo handler ASGI; devolve a resposta e o corpo já lido."""
+    async def pedir():
+        response = await cliente.get(url, **kwargs)
+        return response, await _conteudo(response)
+    return async_to_sync(pedir)()
+
+
+@pytest.fixture
+def asgi(admin_user):
+    cliente = AsyncClient()
+    cliente.force_login(admin_user)
+    return cliente
+
+
+@pytest.fixture
+def luva():
+    return EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=5, validade='2030-12-31')
+
+
+@pytest.mark.django_db
+def test_lista_sob_asgi_responde_304_e_usa_o_fragmento(asgi, client, admin_user, luva, django_assert_max_num_queries):
+    url = reverse('epi_list')
+    primeira, html = _get(asgi, url)
+    assert primeira.status_code == 200 and 'Luva' in html.decode()
+
+    with django_assert_max_num_queries(2):  # a sessão e os validadores
+        response, _ = _get(asgi, url, headers={'if-none-match': primeira['ETag']})
+    assert response.status_code == 304
+    assert response['ETag'] == primeira['ETag']
+
+    with django_assert_max_num_queries(2):
+        response, cacheado = _get(asgi, url)
+    assert cacheado == html
+
+    # WSGI e ASGI servem a mesma página
+    client.force_login(admin_user)
+    assert client.get(url).content == html
+
+
+@pytest.mark.django_db
+def test_detalhe_sob_asgi_le_o_objeto_e_responde_404(asgi, luva, django_assert_max_num_queries):
+    url = reverse('epi_detail', args=[luva.pk])
+    assert _get(asgi, url)[0].status_code == 200
+    with django_assert_max_num_queries(3):  # a sessão, os validadores e o objeto
+        response, html = _get(asgi, url)
+    assert '<strong>Quantidade:</strong> 5' in html.decode()
+    assert response.context['epi'] == luva
+
+    EPI.objects.filter(pk=luva.pk).delete()
+    assert _get(asgi, url)[0].status_code == 404
+
+
+@pytest.mark.django_db
+def test_busca_sob_asgi_usa_o_caminho_sincrono(asgi, luva):
+    EPI.objects.create(nomeAparelho='Capacete', categoria='Cabeça', quantidade=2, validade='2030-12-31')
+    response, html = _get(asgi, reverse('epi_list'), query_params={'q': 'capacete'})
+    assert response.status_code == 200
+    assert 'Capacete' in html.decode() and 'Luva' not in html.decode()
+
+
+@pytest.mark.django_db
+def test_api_sob_asgi_envia_stream_assincrono(asgi, luva):
+    colaborador = Colaborador.objects.create(nome='João', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    emprestimos = [Emprestimo.objects.create(colaborador=colaborador, epi_nome=luva, data_emprestimo=date(2025, 1, i))
+                   for i in range(1, 4)]
+    url = reverse('api_emprestimos')
+
+    response, corpo = _get(asgi, url, query_params={'limit': 2, 'fields': 'id'})
+    assert response.streaming and response.is_async
+    dados = json.loads(corpo)
+    assert dados['results'] == [{'id': emprestimos[0].pk}, {'id': emprestimos[1].pk}]
+
+    _, corpo = _get(asgi, url, query_params={'limit': 2, 'fields': 'id', 'cursor': dados['next']})
+    assert json.loads(corpo) == {'results': [{'id': emprestimos[2].pk}], 'next': None}
+
+    _, corpo = _get(asgi, reverse('api_alteracoes'))
+    assert [linha['id'] for linha in json.loads(corpo)['results'] if linha['modelo'] == 'emprestimo'] == \
+        [e.pk for e in emprestimos]
+
+
+@pytest.mark.django_db
+def test_permissoes_sob_asgi_vem_do_cache(asgi, django_user_model, django_assert_max_num_queries):
+    url = reverse('api_colaboradores')
+    _get(asgi, url)  # aquece o cache do usuário da sessão e das permissões
+    with django_assert_max_num_queries(2):  # a sessão e a página
+        assert _get(asgi, url)[0].status_code == 200
+
+    leitor = django_user_model.objects.create_user('leitor', 'leitor@example.com', 'x')
+    cliente = AsyncClient()
+    cliente.force_login(leitor)
+    assert _get(cliente, url)[0].status_code == 403
+    leitor.user_permissions.add(Permission.objects.get(codename='view_colaborador'))
+    assert _get(cliente, url)[0].status_code == 200
+
+
+@pytest.mark.django_db
+def test_sem_login_sob_asgi_redireciona_ou_nega():
+    cliente = AsyncClient()
+    for nome in ('colaborador_list', 'autocomplete_colaboradores'):
+        response, _ = _get(cliente, reverse(nome))
+        assert response.status_code == 302
+        assert response['Location'].startswith(reverse('login'))
+    assert _get(cliente, reverse('api_alteracoes'))[0].status_code == 403
@@ -0,0 +1,103 @@
+import pytest
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from epi_admin.auth_backends import CachedModelBackend, EmailBackend, _chave_usuario
+from epi_admin.models import Colaborador, Gerente
+
+
+@pytest.fixture
+def gerente_user(django_user_model):
+    user = django_user_model.objects.create_user(username='g1', email='g1@example.com', password='pass')
+    grupo = Group.objects.create(name='Teste')
+    grupo.permissions.add(Permission.objects.get(codename='delete_colaborador'))
+    user.groups.add(grupo)
+    return user
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('backend', [EmailBackend, CachedModelBackend])
+def test_get_user_and_permissions_are_cached(backend, gerente_user, django_assert_num_queries):
+    backend().get_user(gerente_user.pk)
+
+    with django_assert_num_queries(0):
+        user = backend().get_user(gerente_user.pk)
+        assert user.has_perm('epi_admin.delete_colaborador')
+        assert not user.has_perm('epi_admin.add_colaborador')
+
+
+@pytest.mark.django_db
+def test_cache_nao_guarda_o_hash_da_senha(client, gerente_user, django_assert_num_queries):
+    client.force_login(gerente_user)
+    assert client.get(reverse('colaborador_list')).status_code == 200
+
+    dados = cache.get(_chave_usuario(gerente_user.pk))
+    assert 'password' not in dados['campos']
+    assert gerente_user.password not in repr(dados)
+    # a sessão continua valendo com o usuário do cache
+    assert client.get(reverse('colaborador_list')).status_code == 200
+
+    user = EmailBackend().get_user(gerente_user.pk)
+    assert user.email == 'g1@example.com' and user.has_perm('epi_admin.delete_colaborador')
+    with django_assert_num_queries(1):  # a senha é lida do banco só quando usada
+        assert user.check_password('pass')
+    user.first_name = 'G'
+    user.save()
+    gerente_user.refresh_from_db()
+    assert gerente_user.check_password('pass') and gerente_user.first_name == 'G'
+
+
+@pytest.mark.django_db
+def test_group_permission_change_invalidates_cache(gerente_user):
+    assert not EmailBackend().get_user(gerente_user.pk).has_perm('epi_admin.add_colaborador')
+
+    Group.objects.get(name='Teste').permissions.add(Permission.objects.get(codename='add_colaborador'))
+
+    assert EmailBackend().get_user(gerente_user.pk).has_perm('epi_admin.add_colaborador')
+
+
+@pytest.mark.django_db
+def test_user_change_invalidates_cache(gerente_user):
+    EmailBackend().get_user(gerente_user.pk)
+
+    gerente_user.is_active = False
+    gerente_user.save()
+
+    assert not CachedModelBackend().get_user(gerente_user.pk)
+    gerente_user.delete()
+    assert EmailBackend().get_user(gerente_user.pk) is None
+
+
+def _selects_on(queries, table):
+    return [q for q in queries if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql']]
+
+
+@pytest.mark.django_db
+def test_delete_view_fetches_object_once(client, gerente_user):
+    colaborador = Colaborador.objects.create(nome='A', sobrenome='B', setor='TI', cpf='1', created_by=gerente_user)
+    client.force_login(gerente_user)
+    client.get(reverse('colaborador_list'))  # aquece o cache do usuário
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse('colaborador_delete', args=[colaborador.pk]))
+
+    assert response.status_code == 200
+    assert len(_selects_on(ctx.captured_queries, 'epi_admin_colaborador')) == 1
+    assert not _selects_on(ctx.captured_queries, 'auth_user')
+    assert not _selects_on(ctx.captured_queries, 'auth_permission')
+
+
+@pytest.mark.django_db
+def test_gerente_update_view_fetches_object_once(client, gerente_user):
+    gerente = Gerente.objects.create(nome='G', sobrenome='Um', email='g1@example.com', setor='TI', cpf='2',
+                                     user=gerente_user)
+    client.force_login(gerente_user)
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse('gerente_update', args=[gerente.pk]))
+
+    assert response.status_code == 200
+    assert len(_selects_on(ctx.captured_queries, 'epi_admin_gerente')) == 1
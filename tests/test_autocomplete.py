@@ -0,0 +1,86 @@
+from datetime import date
+
+import pytest
+from django.urls import reverse
+
+from epi_admin.forms import EmprestimoForm
+from epi_admin.views import AutocompleteView
+from epi_admin.models import Colaborador, EPI, Emprestimo
+
+
+@pytest.fixture
+def cadastro():
+    ativos = [Colaborador.objects.create(nome=f'Ana{i:02d}', sobrenome='Silva', setor='Obra', cpf=f'{i:011d}')
+              for i in range(25)]
+    inativo = Colaborador.objects.create(nome='Ana', sobrenome='Inativa', setor='Obra', cpf='99999999999', is_ativo=False)
+    joao = Colaborador.objects.create(nome='João', sobrenome='Souza', setor='TI', cpf='88888888888')
+    luva = EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=5, validade='2030-12-31')
+    sem_estoque = EPI.objects.create(nomeAparelho='Luva Térmica', categoria='Mãos', quantidade=0, validade='2030-12-31')
+    return ativos, inativo, joao, luva, sem_estoque
+
+
+@pytest.mark.django_db
+def test_autocomplete_colaboradores_pagina_e_ignora_inativos(admin_client, cadastro):
+    ativos, inativo, joao, luva, sem_estoque = cadastro
+    url = reverse('autocomplete_colaboradores')
+
+    response = admin_client.get(url, {'q': 'ana'})
+    assert response['Cache-Control'] == 'private, max-age=30'
+    dados = response.json()
+    assert [r['id'] for r in dados['results']] == [c.pk for c in ativos[:20]]
+    assert dados['results'][0]['text'] == 'Ana00 Silva (Obra)'
+
+    dados = admin_client.get(url, {'q': 'ana', 'cursor': dados['next']}).json()
+    assert [r['id'] for r in dados['results']] == [c.pk for c in ativos[20:]]
+    assert dados['next'] is None
+
+    assert [r['id'] for r in admin_client.get(url, {'q': 'joão'}).json()['results']] == [joao.pk]
+    assert admin_client.get(url, {'cursor': 'invalido'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_autocomplete_epis_so_com_estoque(admin_client, cadastro):
+    ativos, inativo, joao, luva, sem_estoque = cadastro
+    dados = admin_client.get(reverse('autocomplete_epis'), {'q': 'luva'}).json()
+    assert dados == {'results': [{'id': luva.pk, 'text': 'Luva (Mãos)'}], 'next': None}
+
+
+@pytest.mark.django_db
+def test_autocomplete_exige_login(client):
+    response = client.get(reverse('autocomplete_colaboradores'))
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_formulario_nao_lista_as_tabelas(admin_client, cadastro, django_assert_max_num_queries):
+    ativos, inativo, joao, luva, sem_estoque = cadastro
+    admin_client.get(reverse('emprestimo_create'))  # aquece o cache do usuário
+    with django_assert_max_num_queries(4):
+        html = admin_client.get(reverse('emprestimo_create')).content.decode()
+    assert 'Ana00' not in html and 'Luva' not in html
+    assert f'data-autocomplete-url="{reverse("autocomplete_colaboradores")}"' in html
+    assert 'epi_admin/js/autocomplete.js' in html
+
+
+@pytest.mark.django_db
+def test_formulario_renderiza_e_valida_o_selecionado(admin_client, cadastro):
+    ativos, inativo, joao, luva, sem_estoque = cadastro
+    emprestimo = Emprestimo.objects.create(colaborador=joao, epi_nome=luva, data_emprestimo=date(2025, 1, 1))
+    html = admin_client.get(reverse('emprestimo_update', args=[emprestimo.pk])).content.decode()
+    assert f'<option value="{joao.pk}" selected>João Souza</option>' in html
+    assert 'Ana00' not in html
+
+    form = EmprestimoForm(data={
+        'colaborador': ativos[3].pk, 'epi_nome': luva.pk, 'data_emprestimo': '01/02/25',
+        'data_prevista': '08/02/25', 'condicao_retirada': 'BOA',
+    })
+    assert form.is_valid(), form.errors
+    assert form.cleaned_data['colaborador'] == ativos[3]
+
+
+def test_texto_padrao_junta_os_campos():
+    class GerenteAutocomplete(AutocompleteView):
+        campos = ('nome', 'setor')
+
+    assert GerenteAutocomplete().texto({'pk': 3, 'nome': 'Ana', 'setor': 'TI'}) == 'Ana TI'
+    assert AutocompleteView().texto({'pk': 3}) == '3'
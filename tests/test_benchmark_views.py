@@ -0,0 +1,352 @@
+"""Benchmark das views: latência (p50/p95) e número de consultas SQL por rota.
+
+Para cada escala (``generate_dataset``) todas as rotas de ``epi_admin/urls.py``
+e o login são chamados pelo test client algumas vezes, depois de uma rodada
+de aquecimento que não entra na medida. As rotas vêm de um superuser e os GETs
+também de um usuário da equipe sem superuser, com as permissões de um grupo
+(chaves ``... (equipe)``): é por ele que passam as verificações de permissão
+e os trechos dos templates que comparam objetos com o usuário. Os resultados
+vão para um JSON (chaves ordenadas, para dar para comparar entre commits) e o
+teste falha se alguma requisição passar do orçamento de consultas da rota ou
+se o p95 passar do orçamento de latência.
+
+Variáveis de ambiente:
+
+- ``EPI_BENCH_ESCALAS``: escalas separadas por vírgula (padrão ``1,10``);
+- ``EPI_BENCH_REPETICOES``: requisições por rota (padrão ``5``);
+- ``EPI_BENCH_SAIDA``: arquivo JSON que recebe os resultados (padrão: um
+  arquivo no diretório temporário do teste, descartado).
+
+O benchmark fica fora de um ``pytest`` simples (``addopts`` do pytest.ini);
+para rodá-lo: ``pytest -m benchmark``.
+"""
+import io
+import json
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from PIL import Image
+
+from epi_admin import dados_sinteticos, tarefas
+from epi_admin.models import EPI, Colaborador, Emprestimo, Gerente
+
+
+ESCALAS = [int(e) for e in os.environ.get('EPI_BENCH_ESCALAS', '1,10').split(',')]
+REPETICOES = int(os.environ.get('EPI_BENCH_REPETICOES', '5'))
+SAIDA = os.environ.get('EPI_BENCH_SAIDA')
+SEED = 42
+HOJE = date.today()
+SENHA = 'benchmark'
+# a rodada 0 aquece os caches (usuários da sessão, fragmentos) e não é medida
+RODADAS = REPETICOES + 1
+
+# Máximo de consultas de qualquer requisição medida da rota (os dois usuários),
+# com os caches já aquecidos. Não dependem da escala: uma rota que cresce com o
+# volume de dados estoura aqui.
+ORCAMENTO_CONSULTAS = {
+    'login POST': 9,
+    'custom_logout GET': 3,
+    'colaborador_list GET': 6,
+    'colaborador_create GET': 1,
+    'colaborador_create POST': 4,
+    'colaborador_import GET': 1,
+    'colaborador_import POST': 7,
+    'colaborador_detail GET': 4,
+    'colaborador_update GET': 2,
+    'colaborador_update POST': 6,
+    'colaborador_delete GET': 2,
+    'colaborador_delete POST': 6,
+    'gerente_list GET': 3,
+    'gerente_create GET': 1,
+    'gerente_create POST': 10,
+    'gerente_detail GET': 4,
+    'gerente_update GET': 2,
+    'gerente_update POST': 8,
+    'gerente_delete GET': 2,
+    'gerente_delete POST': 3,
+    'epi_list GET': 3,
+    'epi_create GET': 1,
+    'epi_create POST': 4,
+    'epi_detail GET': 3,
+    'epi_update GET': 2,
+    'epi_update POST': 6,
+    'epi_delete GET': 2,
+    'epi_delete POST': 7,
+    'emprestimo_list GET': 3,
+    'emprestimo_create GET': 1,
+    'emprestimo_create POST': 22,
+    'emprestimo_lote GET': 1,
+    'emprestimo_lote POST': 14,
+    'emprestimo_export GET': 2,
+    'emprestimo_detail GET': 5,
+    'emprestimo_update GET': 4,
+    'emprestimo_update POST': 20,
+    'emprestimo_delete GET': 4,
+    'emprestimo_delete POST': 12,
+    'painel_atrasos GET': 2,
+    'miniatura GET': 1,
+    'autocomplete_colaboradores GET': 2,
+    'autocomplete_epis GET': 2,
+    'api_colaboradores GET': 2,
+    'api_epis GET': 2,
+    'api_emprestimos GET': 2,
+    'api_alteracoes GET': 5,
+    'tarefa_list GET': 3,
+    'tarefa_arquivo GET': 2,
+}
+# Latência p95 máxima (ms) de qualquer rota; folgada, pega só regressões grosseiras.
+ORCAMENTO_P95_MS = float(os.environ.get('EPI_BENCH_P95_MS', '1500'))
+
+# Rotas que só o superuser (ou o dono do objeto) acessa: a equipe não as chama.
+SO_SUPERUSER = {'gerente_create', 'gerente_update', 'gerente_delete', 'colaborador_delete', 'tarefa_arquivo'}
+EQUIPE = ' (equipe)'
+
+
+def _data(d):
+    return d.strftime('%d/%m/%y')
+
+
+def _csv(i):
+    linhas = ['nome;sobrenome;setor;cpf;ativo'] + [
+        f'Import{i};Linha{n};Produção;{90_000_000_000 + i * 100 + n};sim' for n in range(10)
+    ]
+    return io.BytesIO('\n'.join(linhas).encode())
+
+
+def _preparar(django_user_model, media_root):
+    """Objetos usados pelas requisições (além do dataset sintético)."""
+    admin = django_user_model.objects.create_superuser(username='bench', email='bench@example.com', password=SENHA)
+    equipe = django_user_model.objects.create_user(username='equipe', email='equipe@example.com', is_staff=True)
+    grupo = Group.objects.create(name='Bench')
+    grupo.permissions.set(Permission.objects.filter(content_type__app_label='epi_admin'))
+    equipe.groups.add(grupo)
+    # colaboradores cadastrados pela equipe: as listas comparam o dono de cada linha com o usuário
+    primeiros = Colaborador.objects.order_by('pk').values_list('pk', flat=True)[:100]
+    Colaborador.objects.filter(pk__in=list(primeiros)).update(created_by=equipe)
+    buffer = io.BytesIO()
+    Image.new('RGB', (800, 600), 'red').save(buffer, format='JPEG')
+    (media_root / 'static/fotos_epi').mkdir(parents=True)
+    (media_root / 'static/fotos_epi/bench.jpg').write_bytes(buffer.getvalue())
+
+    epi = EPI.objects.create(nomeAparelho='Bench', categoria='Bench', quantidade=10_000,
+                             validade=HOJE + timedelta(days=365), fotoEPI='static/fotos_epi/bench.jpg')
+    colaborador = Colaborador.objects.filter(is_ativo=True).order_by('pk').first()
+    emprestimo = Emprestimo.objects.create(colaborador=colaborador, epi_nome=epi, data_emprestimo=HOJE)
+    descartaveis = {
+        'colaborador': [Colaborador.objects.create(nome='Apagar', sobrenome=str(i), setor='X', cpf=f'8{i:010d}').pk
+                        for i in range(RODADAS)],
+        'epi': [EPI.objects.create(nomeAparelho=f'Apagar {i}', categoria='X', quantidade=1, validade=HOJE).pk
+                for i in range(RODADAS)],
+        'gerente': [Gerente.objects.create(nome='Apagar', sobrenome=str(i), setor='X', cpf=str(i),
+                                           email=f'apagar{i}@example.com').pk for i in range(RODADAS)],
+        'emprestimo': [Emprestimo.objects.create(colaborador=colaborador, epi_nome=epi, data_emprestimo=HOJE).pk
+                       for i in range(RODADAS)],
+    }
+    gerente = Gerente.objects.order_by('pk').first()
+    gerente.user = django_user_model.objects.create_user(username=gerente.email, email=gerente.email)
+    gerente.save()
+    # uma exportação em segundo plano pronta para baixar
+    exportacao = tarefas.enfileirar('exportacao', {'filtros': {'epi': epi.pk}, 'destino': 'exportacoes/bench.csv'},
+                                    created_by=admin)
+    tarefas.processar(tipos=['exportacao'])
+    return {
+        'admin': admin,
+        'equipe': equipe,
+        'colaborador': colaborador,
+        'gerente': gerente,
+        'epi': epi,
+        'emprestimo': emprestimo,
+        'colaboradores_lote': list(Colaborador.objects.filter(is_ativo=True).order_by('pk').values_list('pk', flat=True)[:2]),
+        'descartaveis': descartaveis,
+        'tarefa': exportacao,
+    }
+
+
+def _requisicoes(ctx):
+    """(rota, método, args da URL, dados) para a i-ésima repetição, na ordem de execução."""
+    c, g, e, emp = ctx['colaborador'], ctx['gerente'], ctx['epi'], ctx['emprestimo']
+    d = ctx['descartaveis']
+    amanha = HOJE + timedelta(days=7)
+    colaborador_dados = lambda i: {'nome': 'Bench', 'sobrenome': str(i), 'setor': 'TI', 'cpf': f'7{i:010d}', 'is_ativo': 'on'}
+    epi_dados = lambda i: {'nomeAparelho': f'Bench {i}', 'categoria': 'Bench', 'quantidade': 5, 'validade': _data(amanha)}
+    return [
+        ('colaborador_list', 'GET', lambda i: [], None),
+        ('colaborador_create', 'GET', lambda i: [], None),
+        ('colaborador_create', 'POST', lambda i: [], colaborador_dados),
+        ('colaborador_import', 'GET', lambda i: [], None),
+        ('colaborador_import', 'POST', lambda i: [], lambda i: {'arquivo': _csv_upload(i)}),
+        ('colaborador_detail', 'GET', lambda i: [c.pk], None),
+        ('colaborador_update', 'GET', lambda i: [c.pk], None),
+        ('colaborador_update', 'POST', lambda i: [c.pk],
+         lambda i: {'nome': c.nome, 'sobrenome': c.sobrenome, 'setor': c.setor, 'cpf': c.cpf, 'is_ativo': 'on'}),
+        ('colaborador_delete', 'GET', lambda i: [d['colaborador'][i]], None),
+        ('colaborador_delete', 'POST', lambda i: [d['colaborador'][i]], lambda i: {}),
+        ('gerente_list', 'GET', lambda i: [], None),
+        ('gerente_create', 'GET', lambda i: [], None),
+        ('gerente_create', 'POST', lambda i: [],
+         lambda i: {'nome': 'Novo', 'sobrenome': str(i), 'email': f'novo{i}@example.com', 'setor': 'TI', 'cpf': str(i)}),
+        ('gerente_detail', 'GET', lambda i: [g.pk], None),
+        ('gerente_update', 'GET', lambda i: [g.pk], None),
+        ('gerente_update', 'POST', lambda i: [g.pk],
+         lambda i: {'nome': g.nome, 'sobrenome': g.sobrenome, 'email': g.email, 'setor': g.setor, 'cpf': g.cpf}),
+        ('gerente_delete', 'GET', lambda i: [d['gerente'][i]], None),
+        ('gerente_delete', 'POST', lambda i: [d['gerente'][i]], lambda i: {}),
+        ('epi_list', 'GET', lambda i: [], None),
+        ('epi_create', 'GET', lambda i: [], None),
+        ('epi_create', 'POST', lambda i: [], epi_dados),
+        ('epi_detail', 'GET', lambda i: [e.pk], None),
+        ('epi_update', 'GET', lambda i: [e.pk], None),
+        ('epi_update', 'POST', lambda i: [e.pk],
+         lambda i: {'nomeAparelho': e.nomeAparelho, 'categoria': e.categoria, 'quantidade': 10_000,
+                    'validade': _data(e.validade)}),
+        ('epi_delete', 'GET', lambda i: [d['epi'][i]], None),
+        ('epi_delete', 'POST', lambda i: [d['epi'][i]], lambda i: {}),
+        ('emprestimo_list', 'GET', lambda i: [], None),
+        ('emprestimo_create', 'GET', lambda i: [], None),
+        ('emprestimo_create', 'POST', lambda i: [],
+         lambda i: {'colaborador': c.pk, 'epi_nome': e.pk, 'data_emprestimo': _data(HOJE),
+                    'data_prevista': _data(amanha), 'condicao_retirada': 'BOA'}),
+        ('emprestimo_lote', 'GET', lambda i: [], None),
+        ('emprestimo_lote', 'POST', lambda i: [],
+         lambda i: {'colaboradores': ctx['colaboradores_lote'], 'epis': [e.pk], 'data_emprestimo': _data(HOJE),
+                    'data_prevista': _data(amanha), 'condicao_retirada': 'BOA'}),
+        ('emprestimo_export', 'GET', lambda i: [], None),
+        ('emprestimo_detail', 'GET', lambda i: [emp.pk], None),
+        ('emprestimo_update', 'GET', lambda i: [emp.pk], None),
+        ('emprestimo_update', 'POST', lambda i: [emp.pk],
+         lambda i: {'colaborador': c.pk, 'epi_nome': e.pk, 'data_emprestimo': _data(HOJE),
+                    'data_prevista': _data(HOJE + timedelta(days=8 + i % 2)), 'condicao_retirada': 'BOA'}),
+        ('emprestimo_delete', 'GET', lambda i: [d['emprestimo'][i]], None),
+        ('emprestimo_delete', 'POST', lambda i: [d['emprestimo'][i]], lambda i: {}),
+        ('painel_atrasos', 'GET', lambda i: [], None),
+        ('miniatura', 'GET', lambda i: [256, e.fotoEPI.name], None),
+        ('autocomplete_colaboradores', 'GET', lambda i: [], lambda i: {'q': 'ana'}),
+        ('autocomplete_epis', 'GET', lambda i: [], lambda i: {'q': 'luva'}),
+        ('api_colaboradores', 'GET', lambda i: [], lambda i: {'limit': 1000}),
+        ('api_epis', 'GET', lambda i: [], lambda i: {'fields': 'id,nomeAparelho,quantidade'}),
+        ('api_emprestimos', 'GET', lambda i: [], lambda i: {'limit': 1000}),
+        ('api_alteracoes', 'GET', lambda i: [], lambda i: {'limit': 1000}),
+        ('tarefa_list', 'GET', lambda i: [], None),
+        ('tarefa_arquivo', 'GET', lambda i: [ctx['tarefa'].pk], None),
+        ('custom_logout', 'GET', lambda i: [], None),
+    ]
+
+
+def _csv_upload(i):
+    arquivo = _csv(i)
+    arquivo.name = f'colaboradores{i}.csv'
+    return arquivo
+
+
+def _medir(client, metodo, url, dados):
+    with CaptureQueriesContext(connection) as ctx:
+        inicio = time.perf_counter()
+        if metodo == 'GET':
+            response = client.get(url, dados)
+        else:
+            response = client.post(url, dados)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        decorrido = time.perf_counter() - inicio
+    return response, decorrido, len(ctx.captured_queries)
+
+
+def _resumo(latencias, consultas):
+    latencias = sorted(latencias)
+    return {
+        'n': len(latencias),
+        'p50_ms': round(statistics.median(latencias) * 1000, 2),
+        'p95_ms': round(latencias[max(int(len(latencias) * 0.95 + 0.5) - 1, 0)] * 1000, 2),
+        'queries': max(consultas),
+    }
+
+
+def _gravar(saida, escala, resultados):
+    dados = json.loads(saida.read_text()) if saida.exists() else {}
+    dados.setdefault('escalas', {})[str(escala)] = resultados
+    dados['repeticoes'] = REPETICOES
+    saida.write_text(json.dumps(dados, indent=2, sort_keys=True, ensure_ascii=False) + '\n')
+
+
+def test_every_route_has_a_benchmark_request():
+    nomes = {p.name for p in get_resolver('epi_admin.urls').url_patterns if p.name}
+    cobertos = {rota for rota, *_ in _requisicoes(_ctx_vazio())}
+    assert nomes <= cobertos, f'rotas sem benchmark: {sorted(nomes - cobertos)}'
+    assert {f'{rota} {metodo}' for rota, metodo, *_ in _requisicoes(_ctx_vazio())} | {'login POST'} == set(ORCAMENTO_CONSULTAS)
+
+
+def _ctx_vazio():
+    class Qualquer:
+        pk = 0
+        nome = sobrenome = setor = cpf = email = nomeAparelho = categoria = ''
+        validade = HOJE
+        fotoEPI = type('Foto', (), {'name': ''})()
+    return {'colaborador': Qualquer, 'gerente': Qualquer, 'epi': Qualquer, 'emprestimo': Qualquer, 'tarefa': Qualquer,
+            'colaboradores_lote': [], 'descartaveis': {}}
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('escala', ESCALAS)
+def test_view_benchmark(escala, client, django_user_model, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    # o custo do hash de senha (PBKDF2) não interessa aqui e dominaria o login
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    dados_sinteticos.gerar(escala, SEED, HOJE)
+    ctx = _preparar(django_user_model, tmp_path)
+
+    medidas = {}
+
+    def anotar(i, chave, decorrido, consultas):
+        if i:
+            latencias, contagens = medidas.setdefault(chave, ([], []))
+            latencias.append(decorrido)
+            contagens.append(consultas)
+
+    # login pelo formulário (EmailBackend)
+    for i in range(RODADAS):
+        client.logout()
+        response, decorrido, consultas = _medir(
+            client, 'POST', reverse('login'), {'username': 'BENCH@example.com', 'password': SENHA},
+        )
+        assert response.status_code == 302, 'login falhou'
+        anotar(i, 'login POST', decorrido, consultas)
+
+    clientes = {'': client, EQUIPE: Client()}
+    for i in range(RODADAS):
+        for rota, metodo, args, dados in _requisicoes(ctx):
+            usuarios = [('', ctx['admin'])]
+            if metodo == 'GET' and rota not in SO_SUPERUSER | {'custom_logout'}:
+                usuarios.append((EQUIPE, ctx['equipe']))
+            for sufixo, usuario in usuarios:
+                cliente = clientes[sufixo]
+                # login só depois do logout: cada login grava last_login e tira o usuário do cache
+                if SESSION_KEY not in cliente.session:
+                    cliente.force_login(usuario)
+                url = reverse(rota, args=args(i))
+                response, decorrido, consultas = _medir(cliente, metodo, url, dados(i) if dados else None)
+                esperado = (302,) if metodo == 'POST' and rota != 'colaborador_import' else (200, 302)
+                assert response.status_code in esperado, f'{rota} {metodo}{sufixo}: {response.status_code}'
+                anotar(i, f'{rota} {metodo}{sufixo}', decorrido, consultas)
+
+    resultados = {chave: _resumo(*valores) for chave, valores in medidas.items()}
+    _gravar(Path(SAIDA) if SAIDA else tmp_path / 'benchmark_views.json', escala, resultados)
+
+    estouros = {
+        chave: r['queries'] for chave, r in resultados.items()
+        if r['queries'] > ORCAMENTO_CONSULTAS[chave.removesuffix(EQUIPE)]
+    }
+    assert not estouros, f'escala {escala}: rotas acima do orçamento de consultas: {estouros}'
+    lentas = {chave: r['p95_ms'] for chave, r in resultados.items() if r['p95_ms'] > ORCAMENTO_P95_MS}
+    assert not lentas, f'escala {escala}: rotas acima de {ORCAMENTO_P95_MS} ms (p95): {lentas}'
@@ -0,0 +1,117 @@
+import io
+from datetime import date
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from epi_admin import busca, dados_sinteticos
+from epi_admin.importacao import importar_colaboradores, ler_csv
+from epi_admin.models import Colaborador, EPI, Emprestimo, TermoBusca
+
+
+def _ids(queryset, consulta):
+    return set(busca.filtrar(queryset, consulta).values_list('pk', flat=True))
+
+
+@pytest.fixture
+def cenario():
+    joao = Colaborador.objects.create(nome='João', sobrenome='Silva', setor='Manutenção', cpf='12345678900')
+    ana = Colaborador.objects.create(nome='Ana', sobrenome='Silveira', setor='TI', cpf='98765432100')
+    capacete = EPI.objects.create(nomeAparelho='Capacete Aba Frontal', categoria='Cabeça', quantidade=10, validade='2030-12-31')
+    luva = EPI.objects.create(nomeAparelho='Luva Nitrílica', categoria='Mãos', quantidade=10, validade='2030-12-31')
+    return joao, ana, capacete, luva
+
+
+def test_normalizacao_ignora_acentos_e_pontuacao_de_cpf():
+    assert busca.palavras('João  da SILVA') == ['joao', 'da', 'silva']
+    assert busca.palavras('123.456.789-00') == ['12345678900']
+    assert busca.palavras('Manutenção / Elétrica') == ['manutencao', 'eletrica']
+
+
+@pytest.mark.django_db
+def test_busca_por_prefixo_sem_acento(cenario):
+    joao, ana, capacete, luva = cenario
+    colaboradores = Colaborador.objects.all()
+    assert _ids(colaboradores, 'joao') == {joao.pk}
+    assert _ids(colaboradores, 'JOÃO') == {joao.pk}
+    assert _ids(colaboradores, 'silv') == {joao.pk, ana.pk}
+    assert _ids(colaboradores, 'silv manut') == {joao.pk}
+    assert _ids(colaboradores, '123.456') == {joao.pk}
+    assert _ids(colaboradores, 'xyz') == set()
+    assert _ids(EPI.objects.all(), 'maos') == {luva.pk}
+    assert _ids(EPI.objects.all(), 'capacete fron') == {capacete.pk}
+
+
+@pytest.mark.django_db
+def test_emprestimo_casa_por_numero_colaborador_ou_epi(cenario):
+    joao, ana, capacete, luva = cenario
+    e1 = Emprestimo.objects.create(colaborador=joao, epi_nome=capacete, data_emprestimo=date(2025, 1, 1))
+    e2 = Emprestimo.objects.create(colaborador=ana, epi_nome=luva, data_emprestimo=date(2025, 1, 1))
+    emprestimos = Emprestimo.objects.all()
+    assert _ids(emprestimos, 'joão') == {e1.pk}
+    assert _ids(emprestimos, 'luva') == {e2.pk}
+    assert _ids(emprestimos, 'silv') == {e1.pk, e2.pk}
+    assert _ids(emprestimos, 'ana luva') == {e2.pk}
+    assert e2.pk in _ids(emprestimos, f'#{e2.pk}')
+
+
+@pytest.mark.django_db
+def test_busca_ampla_de_emprestimos_percorre_a_chave_com_o_mesmo_resultado(cenario, monkeypatch):
+    joao, ana, capacete, luva = cenario
+    for colaborador, epi in ((joao, capacete), (ana, luva), (ana, capacete)):
+        Emprestimo.objects.create(colaborador=colaborador, epi_nome=epi, data_emprestimo=date(2025, 1, 1))
+    consultas = ['silv', 'ana capacete', 'cabeca', 'zzz']
+    indexado = {c: _ids(Emprestimo.objects.all(), c) for c in consultas}
+
+    monkeypatch.setattr(busca, 'LIMITE_BUSCA_INDEXADA', 0)
+    assert '+ 0' in str(busca.filtrar(Emprestimo.objects.all(), 'silv').query)
+    assert {c: _ids(Emprestimo.objects.all(), c) for c in consultas} == indexado
+
+
+@pytest.mark.django_db
+def test_indice_acompanha_edicao_e_exclusao(cenario):
+    joao, ana, capacete, luva = cenario
+    joao.sobrenome = 'Araújo'
+    joao.save()
+    assert _ids(Colaborador.objects.all(), 'silva') == set()
+    assert _ids(Colaborador.objects.all(), 'arau') == {joao.pk}
+
+    luva.delete()
+    assert not TermoBusca.objects.filter(modelo='epi', objeto_id=luva.pk).exists()
+
+
+@pytest.mark.django_db
+def test_caminhos_em_massa_indexam():
+    csv = 'nome,sobrenome,setor,cpf\nÍcaro,Souza,Pintura,11122233344\n'.encode()
+    importar_colaboradores(ler_csv(io.BytesIO(csv)))
+    assert _ids(Colaborador.objects.all(), 'icaro pint') == set(Colaborador.objects.values_list('pk', flat=True))
+
+    dados_sinteticos.gerar(escala=1, seed=1, hoje=date(2026, 1, 1))
+    assert TermoBusca.objects.filter(modelo='colaborador').values('objeto_id').distinct().count() == Colaborador.objects.count()
+    assert TermoBusca.objects.filter(modelo='epi').values('objeto_id').distinct().count() == EPI.objects.count()
+
+
+@pytest.mark.django_db
+def test_rebuild_busca_reconstroi_o_indice(cenario):
+    antes = set(TermoBusca.objects.values_list('modelo', 'objeto_id', 'termo'))
+    TermoBusca.objects.all().delete()
+    out = io.StringIO()
+    call_command('rebuild_busca', stdout=out)
+    assert set(TermoBusca.objects.values_list('modelo', 'objeto_id', 'termo')) == antes
+    assert 'rebuild_busca finished' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_listas_filtram_por_q(admin_client, cenario):
+    joao, ana, capacete, luva = cenario
+
+    response = admin_client.get(reverse('colaborador_list'), {'q': 'joao'})
+    assert [c.pk for c in response.context['colaboradores']] == [joao.pk]
+    assert 'value="joao"' in response.content.decode()
+
+    response = admin_client.get(reverse('epi_list'), {'q': 'inexistente'})
+    assert 'Nenhum EPI encontrado' in response.content.decode()
+
+    response = admin_client.get(reverse('emprestimo_list'), {'q': 'capacete'})
+    assert response.status_code == 200
@@ -0,0 +1,112 @@
+from datetime import date
+
+import pytest
+from django.urls import reverse
+from django.utils.http import http_date
+
+from epi_admin.models import Colaborador, EPI, Emprestimo
+
+
+@pytest.fixture
+def emprestimo():
+    colaborador = Colaborador.objects.create(nome='Ana', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    luva = EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=5, validade='2030-12-31')
+    return Emprestimo.objects.create(colaborador=colaborador, epi_nome=luva, data_emprestimo=date(2025, 1, 1))
+
+
+@pytest.mark.django_db
+def test_lista_sem_alteracao_responde_304(admin_client, emprestimo, django_assert_max_num_queries):
+    url = reverse('emprestimo_list')
+    primeira = admin_client.get(url)
+    assert primeira.status_code == 200
+    assert 'private' in primeira['Cache-Control'] and 'no-cache' in primeira['Cache-Control']
+
+    with django_assert_max_num_queries(2):  # a sessão e os validadores
+        resposta = admin_client.get(url, HTTP_IF_NONE_MATCH=primeira['ETag'])
+    assert resposta.status_code == 304
+    assert resposta.content == b''
+    assert resposta['ETag'] == primeira['ETag']
+
+
+@pytest.mark.django_db
+def test_etag_muda_com_relacao_exibida_e_com_linha_apagada(admin_client, emprestimo):
+    url = reverse('emprestimo_list')
+    etag = admin_client.get(url)['ETag']
+
+    emprestimo.epi_nome.nomeAparelho = 'Luva Nitrílica'
+    emprestimo.epi_nome.save()
+    resposta = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resposta.status_code == 200 and 'Luva Nitrílica' in resposta.content.decode()
+
+    outro = Emprestimo.objects.create(
+        colaborador=emprestimo.colaborador, epi_nome=emprestimo.epi_nome, data_emprestimo=date(2025, 1, 2),
+    )
+    etag = admin_client.get(url)['ETag']
+    Emprestimo.objects.filter(pk=outro.pk).delete()
+    assert admin_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_estoque_baixado_por_update_muda_o_detalhe(admin_client, emprestimo):
+    url = reverse('epi_detail', args=[emprestimo.epi_nome.pk])
+    etag = admin_client.get(url)['ETag']
+    assert admin_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    # Emprestimo.save() baixa o estoque com update(), que também grava updated_at
+    Emprestimo.objects.create(
+        colaborador=emprestimo.colaborador, epi_nome=emprestimo.epi_nome, data_emprestimo=date(2025, 1, 2),
+    )
+    resposta = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resposta.status_code == 200
+    assert '<strong>Quantidade:</strong> 3' in resposta.content.decode()
+
+
+@pytest.mark.django_db
+def test_if_modified_since(admin_client, emprestimo):
+    url = reverse('colaborador_detail', args=[emprestimo.colaborador.pk])
+    ultima = admin_client.get(url)['Last-Modified']
+    assert ultima == http_date(int(Colaborador.objects.get().updated_at.timestamp()))
+    assert admin_client.get(url, HTTP_IF_MODIFIED_SINCE=ultima).status_code == 304
+
+
+@pytest.mark.django_db
+def test_lista_sem_last_modified_nao_responde_304_a_if_modified_since(admin_client, emprestimo):
+    url = reverse('emprestimo_list')
+    outro = Emprestimo.objects.create(
+        colaborador=emprestimo.colaborador, epi_nome=emprestimo.epi_nome, data_emprestimo=date(2025, 1, 2),
+    )
+    primeira = admin_client.get(url)
+    assert 'Last-Modified' not in primeira
+    # apagar uma linha não move o maior updated_at das que restam na página
+    Emprestimo.objects.filter(pk=outro.pk).delete()
+    resposta = admin_client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+    assert resposta.status_code == 200
+    assert [e.pk for e in resposta.context['emprestimos']] == [emprestimo.pk]
+
+
+@pytest.mark.django_db
+def test_etag_varia_com_o_usuario(admin_client, emprestimo, client, django_user_model):
+    url = reverse('emprestimo_list')
+    etag = admin_client.get(url)['ETag']
+    client.force_login(django_user_model.objects.create_user('gerente', 'gerente@example.com', 'x'))
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_mensagem_pendente_nunca_recebe_304(admin_client, emprestimo):
+    url = reverse('emprestimo_list')
+    etag = admin_client.get(url)['ETag']
+    # o cadastro não muda a lista de empréstimos, mas deixa uma mensagem na sessão
+    admin_client.post(reverse('colaborador_create'), {'nome': 'Bia', 'sobrenome': 'Souza', 'setor': 'Obra', 'cpf': '98765432100'})
+
+    resposta = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resposta.status_code == 200
+    assert 'Colaborador Bia criado com sucesso!' in resposta.content.decode()
+    assert admin_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+@pytest.mark.django_db
+def test_sem_linhas_nao_ha_validadores(admin_client):
+    resposta = admin_client.get(reverse('epi_list'))
+    assert resposta.status_code == 200 and 'ETag' not in resposta
+    assert admin_client.get(reverse('epi_detail', args=[999])).status_code == 404
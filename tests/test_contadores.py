@@ -0,0 +1,215 @@
+import io
+from datetime import date, timedelta
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from epi_admin import contadores
+from epi_admin.models import Colaborador, EPI, Emprestimo, Tarefa
+
+
+HOJE = date.today()
+
+
+def _contadores(objeto):
+    objeto.refresh_from_db()
+    return objeto.emprestimos_abertos, objeto.emprestimos_total, objeto.prevista_mais_antiga
+
+
+def assert_contadores_consistentes():
+    assert contadores.divergencias(Colaborador) == []
+    assert contadores.divergencias(EPI) == []
+
+
+@pytest.fixture
+def cenario():
+    joao = Colaborador.objects.create(nome='João', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    ana = Colaborador.objects.create(nome='Ana', sobrenome='Lima', setor='TI', cpf='98765432100')
+    capacete = EPI.objects.create(nomeAparelho='Capacete', categoria='Cabeça', quantidade=50, validade='2030-12-31')
+    luva = EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=50, validade='2030-12-31')
+    return joao, ana, capacete, luva
+
+
+def _emprestar(colaborador, epi, dias_atras, prazo=7):
+    inicio = HOJE - timedelta(days=dias_atras)
+    return Emprestimo.objects.create(colaborador=colaborador, epi_nome=epi, data_emprestimo=inicio,
+                                     data_prevista=inicio + timedelta(days=prazo))
+
+
+@pytest.mark.django_db
+def test_contadores_acompanham_o_ciclo_do_emprestimo(cenario):
+    joao, ana, capacete, luva = cenario
+    atrasado = _emprestar(joao, capacete, 10)  # previsto para 3 dias atrás
+    no_prazo = _emprestar(joao, luva, 1)
+    assert _contadores(joao) == (2, 2, HOJE - timedelta(days=3))
+    assert _contadores(capacete) == (1, 1, HOJE - timedelta(days=3))
+    assert contadores.atrasados(joao) == 1 and contadores.atrasados(luva) == 0
+    assert_contadores_consistentes()
+
+    atrasado = Emprestimo.objects.get(pk=atrasado.pk)
+    atrasado.data_devolucao, atrasado.condicao_devolucao = HOJE, 'BOA'
+    atrasado.save()
+    assert _contadores(joao) == (1, 2, no_prazo.data_prevista)
+    assert _contadores(capacete) == (0, 1, None)
+
+    # troca de colaborador e de data prevista: os dois lados mudam
+    no_prazo = Emprestimo.objects.get(pk=no_prazo.pk)
+    no_prazo.colaborador, no_prazo.data_prevista = ana, HOJE + timedelta(days=30)
+    no_prazo.save()
+    assert _contadores(joao) == (0, 1, None)
+    assert _contadores(ana) == (1, 1, HOJE + timedelta(days=30))
+    assert_contadores_consistentes()
+
+    Emprestimo.objects.get(pk=no_prazo.pk).delete()
+    assert _contadores(ana) == (0, 0, None) and _contadores(luva) == (0, 0, None)
+    assert_contadores_consistentes()
+
+
+@pytest.mark.django_db
+def test_devolucao_registrada_por_dois_objetos_lidos_antes_conta_uma_vez(cenario):
+    joao, ana, capacete, luva = cenario
+    emprestimo = _emprestar(joao, capacete, 1)
+    primeiro = Emprestimo.objects.get(pk=emprestimo.pk)
+    segundo = Emprestimo.objects.get(pk=emprestimo.pk)
+
+    for objeto in (primeiro, segundo):
+        objeto.data_devolucao, objeto.condicao_devolucao = HOJE, 'BOA'
+        objeto.save()
+
+    assert _contadores(joao) == (0, 1, None)
+    assert _contadores(capacete) == (0, 1, None)
+    assert_contadores_consistentes()
+
+
+@pytest.mark.django_db
+def test_exclusao_em_cascata_e_save_do_formulario(cenario):
+    joao, ana, capacete, luva = cenario
+    antigo = Colaborador.objects.get(pk=ana.pk)  # lido antes dos empréstimos
+    _emprestar(joao, capacete, 1)
+    _emprestar(ana, capacete, 1)
+    _emprestar(ana, luva, 1)
+
+    # um save() com os contadores lidos antes não grava por cima deles
+    antigo.setor = 'Obra'
+    antigo.save()
+    assert _contadores(ana)[:2] == (2, 2)
+
+    joao.delete()
+    assert _contadores(capacete)[:2] == (1, 1)
+    luva.delete()
+    assert _contadores(ana)[:2] == (1, 1)
+    assert_contadores_consistentes()
+
+
+@pytest.mark.django_db
+def test_save_respeita_update_fields_e_campos_adiados(cenario):
+    joao, ana, capacete, luva = cenario
+    _emprestar(joao, capacete, 1)
+    Colaborador.objects.filter(pk=joao.pk).update(setor='Elétrica')
+    antes = Colaborador.objects.get(pk=joao.pk).updated_at
+
+    # só o nome foi lido: o setor e o cpf gravados não voltam ao valor antigo
+    parcial = Colaborador.objects.only('nome').get(pk=joao.pk)
+    parcial.nome = 'Joãozinho'
+    parcial.save()
+    joao.refresh_from_db()
+    assert (joao.nome, joao.setor) == ('Joãozinho', 'Elétrica')
+    assert joao.updated_at > antes
+
+    adiado = Colaborador.objects.defer('setor', 'emprestimos_total').get(pk=joao.pk)
+    adiado.sobrenome = 'Souza'
+    adiado.save()
+    joao.refresh_from_db()
+    assert (joao.sobrenome, joao.setor) == ('Souza', 'Elétrica')
+
+    # update_fields do chamador: só esses campos, nunca os contadores
+    capacete.nomeAparelho, capacete.categoria = 'Capacete aba', 'Outra'
+    capacete.emprestimos_total = 99
+    capacete.save(update_fields=['nomeAparelho', 'emprestimos_total'])
+    capacete.refresh_from_db()
+    assert (capacete.nomeAparelho, capacete.categoria) == ('Capacete aba', 'Cabeça')
+    assert_contadores_consistentes()
+
+
+@pytest.mark.django_db
+def test_rebuild_contadores_verifica_e_corrige(cenario):
+    joao, ana, capacete, luva = cenario
+    _emprestar(joao, capacete, 10)
+    # update() não passa pelo save(): os contadores ficam defasados
+    Colaborador.objects.filter(pk=ana.pk).update(emprestimos_total=5)
+    Emprestimo.objects.update(data_devolucao=HOJE)
+
+    out = io.StringIO()
+    with pytest.raises(CommandError, match='3 row'):
+        call_command('rebuild_contadores_emprestimos', '--verificar', stdout=out)
+    assert f'colaborador #{ana.pk}: total=5 open=0 oldest_due=-, expected total=0 open=0 oldest_due=-' in out.getvalue()
+
+    call_command('rebuild_contadores_emprestimos', stdout=out)
+    assert 'fixed 2 colaborador(s), 1 epi(s)' in out.getvalue()
+    assert _contadores(joao) == (0, 1, None)
+    call_command('rebuild_contadores_emprestimos', '--verificar', stdout=out)
+    assert 'all loan counters match' in out.getvalue()
+
+    call_command('rebuild_contadores_emprestimos', '--enfileirar', stdout=out)
+    assert Tarefa.objects.filter(tipo='contadores').exists()
+
+
+@pytest.mark.django_db
+def test_lista_ordena_e_filtra_pelos_contadores(admin_client, cenario):
+    joao, ana, capacete, luva = cenario
+    _emprestar(ana, capacete, 10)
+    _emprestar(ana, luva, 1)
+    _emprestar(joao, luva, 1)
+    url = reverse('colaborador_list')
+
+    pagina = admin_client.get(url, {'ordem': 'abertos'}).context['colaboradores']
+    assert [c.pk for c in pagina] == [ana.pk, joao.pk]
+    pagina = admin_client.get(url, {'filtro': 'atrasados'}).context['colaboradores']
+    assert [c.pk for c in pagina] == [ana.pk]
+    html = admin_client.get(url, {'filtro': 'atrasados', 'q': 'joao'}).content.decode()
+    assert 'Nenhum colaborador com esse filtro para "joao"' in html
+    # valores desconhecidos são ignorados
+    assert admin_client.get(url, {'ordem': 'nome', 'filtro': 'x'}).context['ordem'] == ''
+
+    pagina = admin_client.get(reverse('epi_list'), {'ordem': 'total', 'filtro': 'abertos'}).context['epis']
+    assert [e.pk for e in pagina] == [luva.pk, capacete.pk]
+
+
+@pytest.mark.django_db
+def test_lista_pagina_pela_ordem_dos_contadores(admin_client):
+    colaboradores = Colaborador.objects.bulk_create(
+        Colaborador(nome=f'C{i}', sobrenome='X', setor='Obra', cpf=f'{i:011d}', emprestimos_abertos=i % 4)
+        for i in range(25)
+    )
+    url = reverse('colaborador_list')
+    vistos = []
+    params = {'ordem': 'abertos'}
+    while True:
+        response = admin_client.get(url, params)
+        vistos += [(c.emprestimos_abertos, c.pk) for c in response.context['colaboradores']]
+        cursor = response.context['page_obj'].next_cursor
+        if not cursor:
+            break
+        params['cursor'] = cursor
+    assert vistos == sorted(((c.emprestimos_abertos, c.pk) for c in colaboradores), reverse=True)
+
+
+@pytest.mark.django_db
+def test_detalhe_mostra_contadores_e_muda_com_o_dia(admin_client, cenario, monkeypatch, django_assert_max_num_queries):
+    joao, ana, capacete, luva = cenario
+    _emprestar(joao, capacete, 6)  # vence amanhã
+    url = reverse('colaborador_detail', args=[joao.pk])
+
+    primeira = admin_client.get(url)
+    assert '1 em aberto, 0 atrasados, 1 no total' in primeira.content.decode()
+    with django_assert_max_num_queries(2):  # a sessão e os validadores
+        assert admin_client.get(url, HTTP_IF_NONE_MATCH=primeira['ETag']).status_code == 304
+
+    # dois dias depois o mesmo empréstimo está atrasado, sem nenhuma linha alterada
+    monkeypatch.setattr(timezone, 'localdate', lambda *args, **kwargs: HOJE + timedelta(days=2))
+    response = admin_client.get(url, HTTP_IF_NONE_MATCH=primeira['ETag'])
+    assert response.status_code == 200 and response['ETag'] != primeira['ETag']
+    assert '1 em aberto, 1 atrasado, 1 no total' in response.content.decode()
+    assert '⚠️' in admin_client.get(reverse('epi_list')).content.decode()
@@ -0,0 +1,73 @@
+from datetime import date
+
+import pytest
+from django.core.management import call_command
+
+from epi_admin import contadores, dados_sinteticos, tarefas
+from epi_admin.models import EPI, Alteracao, Colaborador, Emprestimo, Gerente, ResumoEmprestimo, Tarefa, TermoBusca
+
+HOJE = date(2026, 3, 1)
+
+
+def _snapshot():
+    return list(
+        Emprestimo.objects.order_by('pk').values_list(
+            'colaborador__cpf', 'epi_nome__nomeAparelho', 'data_emprestimo', 'data_prevista',
+            'data_devolucao', 'condicao_devolucao',
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_gerar_cobre_todos_os_estados_com_estoque_coerente():
+    contagens = dados_sinteticos.gerar(2, seed=7, hoje=HOJE)
+
+    assert contagens == {'gerentes': 20, 'colaboradores': 100, 'epis': 20, 'emprestimos': 2000}
+    assert Emprestimo.objects.count() == 2000 and Gerente.objects.count() == 20
+    assert Emprestimo.objects.filter(data_devolucao__isnull=False).exists()
+    assert Emprestimo.objects.filter(data_devolucao__isnull=True, data_prevista__lt=HOJE).exists()
+    assert Emprestimo.objects.filter(data_devolucao__isnull=True, data_prevista__gte=HOJE).exists()
+    assert not Emprestimo.objects.filter(data_devolucao__gt=HOJE).exists()
+    assert not Emprestimo.objects.filter(colaborador__is_ativo=False).exists()
+    assert not EPI.objects.filter(quantidade__lt=0).exists()
+    assert ResumoEmprestimo.objects.exists()
+    assert contadores.divergencias(Colaborador) == [] and contadores.divergencias(EPI) == []
+    assert Colaborador.objects.filter(prevista_mais_antiga__lt=HOJE).exists()
+
+
+@pytest.mark.django_db
+def test_mesma_seed_gera_os_mesmos_dados():
+    dados_sinteticos.gerar(1, seed=3, hoje=HOJE)
+    primeira = _snapshot()
+    dados_sinteticos.limpar()
+    dados_sinteticos.gerar(1, seed=3, hoje=HOJE)
+
+    assert _snapshot() == primeira
+    dados_sinteticos.limpar()
+    dados_sinteticos.gerar(1, seed=4, hoje=HOJE)
+    assert _snapshot() != primeira
+
+
+@pytest.mark.django_db
+def test_limpar_esvazia_tudo_sem_consultas_por_linha(django_assert_max_num_queries):
+    dados_sinteticos.gerar(3, seed=5, hoje=HOJE)
+    tarefas.enfileirar('contadores')
+    assert Alteracao.objects.exists()
+
+    # um DELETE por tabela, e não algumas consultas por empréstimo apagado
+    with django_assert_max_num_queries(12):
+        dados_sinteticos.limpar()
+
+    for model in (Emprestimo, EPI, Colaborador, Gerente, ResumoEmprestimo, TermoBusca, Alteracao, Tarefa):
+        assert not model.objects.exists(), model
+
+
+@pytest.mark.django_db
+def test_generate_dataset_command(capsys):
+    Colaborador.objects.create(nome='Antigo', sobrenome='X', setor='TI', cpf='1')
+
+    call_command('generate_dataset', scale=1, seed=1, clear=True)
+
+    assert 'generate_dataset finished' in capsys.readouterr().out
+    assert not Colaborador.objects.filter(nome='Antigo').exists()
+    assert Emprestimo.objects.count() == 1000
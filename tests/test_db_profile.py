@@ -0,0 +1,28 @@
+import pytest
+from django.db import connection, connections
+
+
+pytestmark = pytest.mark.skipif(connection.vendor != 'sqlite', reason='PRAGMAs são específicos do SQLite')
+
+
+@pytest.mark.django_db
+def test_pragmas_are_applied_to_new_connections(settings):
+    settings.EPI_SQLITE_PRAGMAS = {'busy_timeout': 1234, 'cache_size': -4000}
+    nova = connections.create_connection('default')
+    try:
+        with nova.cursor() as cursor:
+            assert cursor.execute('PRAGMA busy_timeout').fetchone()[0] == 1234
+            assert cursor.execute('PRAGMA cache_size').fetchone()[0] == -4000
+    finally:
+        nova.close()
+
+
+@pytest.mark.django_db
+def test_no_pragmas_by_default(settings):
+    settings.EPI_SQLITE_PRAGMAS = {}
+    nova = connections.create_connection('default')
+    try:
+        with nova.cursor() as cursor:
+            assert cursor.execute('PRAGMA busy_timeout').fetchone()[0] != 1234
+    finally:
+        nova.close()
@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+from datetime import date
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, close_old_connections, connection
+
+from epi_admin import estoque
+from epi_admin.models import Colaborador, EPI, Emprestimo
+
+
+@pytest.fixture
+def colaborador():
+    return Colaborador.objects.create(nome='Ana', sobrenome='Silva', setor='TI', cpf='12345678900')
+
+
+@pytest.fixture
+def epi():
+    return EPI.objects.create(nomeAparelho='Capacete', categoria='Proteção', quantidade=2, validade='2030-12-31')
+
+
+@pytest.mark.django_db
+def test_reservar_only_succeeds_while_there_is_stock(epi):
+    assert estoque.reservar(epi.pk)
+    assert estoque.reservar(epi.pk)
+    assert not estoque.reservar(epi.pk)
+    epi.refresh_from_db()
+    assert epi.quantidade == 0
+
+
+@pytest.mark.django_db
+def test_checkout_and_return_adjust_stock(colaborador, epi, django_assert_max_num_queries):
+    emprestimo = Emprestimo.objects.create(colaborador=colaborador, epi_nome=epi, data_emprestimo=date(2026, 3, 1))
+    assert emprestimo.data_prevista == date(2026, 3, 8)
+    epi.refresh_from_db()
+    assert epi.quantidade == 1
+
+    emprestimo = Emprestimo.objects.get(pk=emprestimo.pk)
+    emprestimo.data_devolucao = date(2026, 3, 5)
+    emprestimo.condicao_devolucao = 'BOA'
+    # devolução: UPDATE condicional do empréstimo + UPDATE do estoque + save (+ resumo do painel,
+    # contadores do colaborador e do EPI e log de alterações), sem buscar o empréstimo novamente
+    with django_assert_max_num_queries(15) as captured:
+        emprestimo.save()
+    assert not any(
+        q['sql'].startswith('SELECT') and 'FROM "epi_admin_emprestimo"' in q['sql'] for q in captured.captured_queries
+    )
+    epi.refresh_from_db()
+    assert epi.quantidade == 2
+
+    # salvar novamente não repõe o estoque duas vezes
+    emprestimo.save()
+    Emprestimo.objects.get(pk=emprestimo.pk).save()
+    epi.refresh_from_db()
+    assert epi.quantidade == 2
+
+
+@pytest.mark.django_db
+def test_return_in_bad_condition_does_not_restock(colaborador, epi):
+    emprestimo = Emprestimo.objects.create(colaborador=colaborador, epi_nome=epi, data_emprestimo=date(2026, 3, 1))
+    emprestimo = Emprestimo.objects.get(pk=emprestimo.pk)
+    emprestimo.data_devolucao = date(2026, 3, 5)
+    emprestimo.condicao_devolucao = 'RUIM'
+    emprestimo.save()
+    epi.refresh_from_db()
+    assert epi.quantidade == 1
+
+
+@pytest.mark.django_db
+def test_checkout_fails_when_stock_ran_out_after_validation(colaborador, epi):
+    EPI.objects.filter(pk=epi.pk).update(quantidade=0)
+    # a instância em memória ainda acha que há estoque; a reserva no banco decide
+    with pytest.raises(ValidationError):
+        Emprestimo.objects.create(colaborador=colaborador, epi_nome=epi, data_emprestimo=date(2026, 3, 1))
+    assert not Emprestimo.objects.exists()
+
+
+@pytest.mark.django_db
+def test_delete_restocks(colaborador, epi):
+    emprestimo = Emprestimo.objects.create(colaborador=colaborador, epi_nome=epi, data_emprestimo=date(2026, 3, 1))
+    emprestimo.delete()
+    epi.refresh_from_db()
+    assert epi.quantidade == 2
+
+
+@pytest.mark.slow
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_checkouts_never_oversell(colaborador):
+    estoque_inicial = 5
+    epi = EPI.objects.create(nomeAparelho='Luva', categoria='Proteção', quantidade=estoque_inicial, validade='2030-12-31')
+    resultados = []
+    barreira = threading.Barrier(20)
+
+    def retirar():
+        try:
+            barreira.wait()
+            while True:
+                try:
+                    emprestimo = Emprestimo(
+                        colaborador_id=colaborador.pk, epi_nome=EPI.objects.get(pk=epi.pk), data_emprestimo=date(2026, 3, 1)
+                    )
+                    emprestimo.save()
+                    resultados.append(True)
+                    return
+                except ValidationError:
+                    resultados.append(False)
+                    return
+                except OperationalError:
+                    # banco ocupado por outra thread: espera um pouco e tenta de novo
+                    time.sleep(random.uniform(0.001, 0.02))
+        finally:
+            close_old_connections()
+            connection.close()
+
+    threads = [threading.Thread(target=retirar) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    epi.refresh_from_db()
+    assert resultados.count(True) == estoque_inicial
+    assert epi.quantidade == 0
+    assert Emprestimo.objects.filter(epi_nome=epi).count() == estoque_inicial
+
+
+def _crew(n):
+    return Colaborador.objects.bulk_create(
+        Colaborador(nome=f'Col{i}', sobrenome='Kit', setor='Obra', cpf=f'{i:011d}') for i in range(n)
+    )
+
+
+@pytest.mark.django_db
+def test_emprestar_kit_uses_a_handful_of_queries(django_assert_max_num_queries):
+    crew = _crew(200)
+    kit = [
+        EPI.objects.create(nomeAparelho=nome, categoria='Kit', quantidade=250, validade='2030-12-31')
+        for nome in ('Capacete', 'Luva', 'Bota', 'Óculos')
+    ]
+
+    # independe do tamanho da equipe: validação, 1 UPDATE por EPI, INSERTs em lote, o resumo por EPI
+    # e os contadores (um UPDATE para a equipe toda, outro para os EPIs)
+    with django_assert_max_num_queries(40):
+        emprestimos = estoque.emprestar_kit(crew, kit, date(2026, 3, 1))
+
+    assert len(emprestimos) == 800
+    assert Emprestimo.objects.count() == 800
+    assert set(EPI.objects.values_list('quantidade', flat=True)) == {50}
+    assert set(EPI.objects.values_list('emprestimos_abertos', 'emprestimos_total')) == {(200, 200)}
+    assert set(Colaborador.objects.values_list('emprestimos_abertos', 'prevista_mais_antiga')) == {(4, date(2026, 3, 8))}
+    assert set(Emprestimo.objects.values_list('data_prevista', flat=True)) == {date(2026, 3, 8)}
+
+
+@pytest.mark.django_db
+def test_emprestar_kit_is_all_or_nothing():
+    crew = _crew(3)
+    capacete = EPI.objects.create(nomeAparelho='Capacete', categoria='Kit', quantidade=10, validade='2030-12-31')
+    luva = EPI.objects.create(nomeAparelho='Luva', categoria='Kit', quantidade=2, validade='2030-12-31')
+
+    with pytest.raises(ValidationError) as excinfo:
+        estoque.emprestar_kit(crew, [capacete, luva], date(2026, 3, 1))
+    assert 'Luva' in str(excinfo.value)
+    assert not Emprestimo.objects.exists()
+    capacete.refresh_from_db()
+    assert capacete.quantidade == 10
+
+
+@pytest.mark.django_db
+def test_emprestar_kit_rejects_inactive_colaborador():
+    crew = _crew(2)
+    Colaborador.objects.filter(pk=crew[0].pk).update(is_ativo=False)
+    crew[0].is_ativo = False
+    epi = EPI.objects.create(nomeAparelho='Capacete', categoria='Kit', quantidade=10, validade='2030-12-31')
+    with pytest.raises(ValidationError):
+        estoque.emprestar_kit(crew, [epi], date(2026, 3, 1))
+    assert not Emprestimo.objects.exists()
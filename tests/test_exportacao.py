@@ -0,0 +1,71 @@
+import csv
+import io
+from datetime import date
+
+import pytest
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+
+from epi_admin.models import Colaborador, EPI, Emprestimo
+
+
+@pytest.fixture
+def emprestimos():
+    obra = Colaborador.objects.create(nome='João', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    ti = Colaborador.objects.create(nome='Ana', sobrenome='Lima', setor='TI', cpf='98765432100')
+    capacete = EPI.objects.create(nomeAparelho='Capacete', categoria='Cabeça', quantidade=10, validade='2030-12-31')
+    luva = EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=10, validade='2030-12-31')
+    aberto = Emprestimo.objects.create(colaborador=obra, epi_nome=capacete, data_emprestimo=date(2026, 3, 1))
+    devolvido = Emprestimo.objects.create(colaborador=ti, epi_nome=luva, data_emprestimo=date(2026, 4, 1))
+    devolvido.data_devolucao = date(2026, 4, 3)
+    devolvido.condicao_devolucao = 'BOA'
+    devolvido.save()
+    return aberto, devolvido
+
+
+def _linhas(response):
+    conteudo = b''.join(response.streaming_content).decode('utf-8-sig')
+    return list(csv.reader(io.StringIO(conteudo), delimiter=';'))
+
+
+@pytest.mark.django_db
+def test_export_streams_all_loans(admin_client, emprestimos):
+    response = admin_client.get(reverse('emprestimo_export'))
+    assert isinstance(response, StreamingHttpResponse)
+    assert response['Content-Type'].startswith('text/csv')
+    linhas = _linhas(response)
+    assert linhas[0][0] == 'ID'
+    assert [linha[1] for linha in linhas[1:]] == ['João Silva', 'Ana Lima']
+    assert linhas[2][8] == '03/04/2026'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, esperado', [
+    ({'status': 'abertos'}, ['Capacete']),
+    ({'status': 'devolvidos'}, ['Luva']),
+    ({'setor': 'TI'}, ['Luva']),
+    ({'data_inicio': '2026-03-15'}, ['Luva']),
+    ({'data_fim': '15/03/26'}, ['Capacete']),
+])
+def test_export_filters(admin_client, emprestimos, params, esperado):
+    linhas = _linhas(admin_client.get(reverse('emprestimo_export'), params))
+    assert [linha[4] for linha in linhas[1:]] == esperado
+
+
+@pytest.mark.django_db
+def test_export_filter_by_epi(admin_client, emprestimos):
+    _, devolvido = emprestimos
+    linhas = _linhas(admin_client.get(reverse('emprestimo_export'), {'epi': devolvido.epi_nome_id}))
+    assert [linha[0] for linha in linhas[1:]] == [str(devolvido.pk)]
+
+
+@pytest.mark.django_db
+def test_export_rejects_invalid_filters(admin_client):
+    response = admin_client.get(reverse('emprestimo_export'), {'data_inicio': 'ontem'})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_export_requires_permission(client, django_user_model):
+    client.force_login(django_user_model.objects.create_user(username='u', email='u@example.com', password='p'))
+    assert client.get(reverse('emprestimo_export')).status_code == 403
@@ -0,0 +1,104 @@
+from datetime import date
+
+import pytest
+from django.contrib.auth.models import Permission
+from django.db import transaction
+from django.urls import reverse
+
+from epi_admin import estoque, fragmentos
+from epi_admin.models import Colaborador, EPI, Emprestimo
+
+
+@pytest.fixture
+def luva():
+    return EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=5, validade='2030-12-31')
+
+
+@pytest.mark.django_db
+def test_lista_vem_do_cache_ate_os_dados_mudarem(client, admin_user, luva, django_assert_max_num_queries):
+    client.force_login(admin_user)
+    url = reverse('epi_list')
+    primeira = client.get(url).content.decode()
+    with django_assert_max_num_queries(2):  # a sessão e os validadores do GET condicional
+        assert client.get(url).content.decode() == primeira
+
+    luva.nomeAparelho = 'Luva Nitrílica'
+    luva.save()
+    assert 'Luva Nitrílica' in client.get(url).content.decode()
+
+
+@pytest.mark.django_db
+def test_estoque_alterado_por_emprestimo_invalida_epi(client, admin_user, luva):
+    colaborador = Colaborador.objects.create(nome='Ana', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    client.force_login(admin_user)
+    url = reverse('epi_detail', args=[luva.pk])
+    assert '<strong>Quantidade:</strong> 5' in client.get(url).content.decode()
+
+    # Emprestimo.save() baixa o estoque com update(), sem post_save do EPI
+    Emprestimo.objects.create(colaborador=colaborador, epi_nome=luva, data_emprestimo=date(2025, 1, 1))
+    assert '<strong>Quantidade:</strong> 4' in client.get(url).content.decode()
+
+    # o lote usa bulk_create
+    estoque.emprestar_kit([colaborador], [luva], date(2025, 1, 2))
+    assert '<strong>Quantidade:</strong> 3' in client.get(url).content.decode()
+    assert client.get(reverse('emprestimo_list')).content.decode().count('Luva') == 2
+
+
+@pytest.mark.django_db
+def test_fragmento_varia_com_usuario_e_permissoes(client, admin_user, django_user_model):
+    colaborador = Colaborador.objects.create(nome='Ana', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    gerente = django_user_model.objects.create_user('gerente', 'gerente@example.com', 'x')
+    url = reverse('colaborador_list')
+    editar = reverse('colaborador_update', args=[colaborador.pk])
+
+    client.force_login(admin_user)
+    assert editar in client.get(url).content.decode()
+    client.force_login(gerente)
+    assert editar not in client.get(url).content.decode()
+
+    Colaborador.objects.filter(pk=colaborador.pk).update(created_by=gerente)  # sem sinal: fragmento antigo
+    gerente.user_permissions.add(Permission.objects.get(codename='change_colaborador'))
+    assert editar in client.get(url).content.decode()
+
+
+@pytest.mark.django_db
+def test_cache_local_de_varios_processos_nao_guarda_fragmentos(client, admin_user, luva, settings, tmp_path):
+    settings.EPI_FRAGMENTOS_CACHE_LOCAL = False
+    assert not fragmentos.ativo()
+    client.force_login(admin_user)
+    url = reverse('epi_list')
+    assert 'Luva' in client.get(url).content.decode()
+
+    # outro processo, com outro cache local, altera o EPI: nada antigo fica guardado aqui
+    EPI.objects.filter(pk=luva.pk).update(nomeAparelho='Luva Nitrílica')
+    assert 'Luva Nitrílica' in client.get(url).content.decode()
+    assert 'Luva Nitrílica' in client.get(reverse('epi_detail', args=[luva.pk])).content.decode()
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                   'LOCATION': str(tmp_path)}}
+    assert fragmentos.ativo()
+    settings.EPI_FRAGMENTOS_TIMEOUT = 0
+    assert not fragmentos.ativo()
+
+
+@pytest.mark.django_db
+def test_detalhe_em_cache_ainda_responde_404(client, admin_user, luva):
+    client.force_login(admin_user)
+    url = reverse('epi_detail', args=[luva.pk])
+    assert client.get(url).status_code == 200
+    EPI.objects.filter(pk=luva.pk).delete()
+    assert client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_invalidar_numa_transacao_troca_de_novo_no_commit(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        with transaction.atomic():
+            antes = fragmentos.versoes([EPI])
+            for _ in range(100):
+                fragmentos.invalidar(EPI)
+            durante = fragmentos.versoes([EPI])
+    assert durante != antes
+    assert len(callbacks) == 1
+    callbacks[0]()
+    assert fragmentos.versoes([EPI]) != durante
@@ -0,0 +1,100 @@
+import io
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+
+from epi_admin import importacao
+from epi_admin.importacao import importar_colaboradores, ler_csv
+from epi_admin.models import Colaborador
+
+
+CSV = (
+    "Nome;Sobrenome;Setor;CPF;Ativo\n"
+    "João;Silva;Obra;123.456.789-00;sim\n"
+    "Maria;Souza;Almoxarifado;98765432100;não\n"
+    ";Sem Nome;Obra;11111111111;sim\n"
+    "Pedro;Costa;Obra;123;sim\n"
+    "\n"
+    "João;Silva;Elétrica;12345678900;sim\n"
+).encode()
+
+
+@pytest.mark.django_db
+def test_import_csv_upserts_by_cpf_and_reports_errors(django_user_model):
+    user = django_user_model.objects.create_user(username='rh', email='rh@example.com', password='pass')
+    existente = Colaborador.objects.create(nome='Maria', sobrenome='Antiga', setor='TI', cpf='98765432100')
+
+    relatorio = importar_colaboradores(ler_csv(io.BytesIO(CSV)), usuario=user)
+
+    assert (relatorio.criados, relatorio.atualizados) == (1, 1)
+    assert [linha for linha, _ in relatorio.erros] == [4, 5]
+
+    joao = Colaborador.objects.get(cpf='12345678900')
+    assert joao.setor == 'Elétrica'  # a última ocorrência do CPF vence
+    assert joao.created_by == user
+
+    existente.refresh_from_db()
+    assert existente.sobrenome == 'Souza' and existente.is_ativo is False
+    assert existente.created_by is None  # atualização não troca o dono
+
+
+@pytest.mark.django_db
+def test_import_csv_fora_do_utf8_vira_erro_da_linha():
+    linhas = [f"N{i};S;Obra;{i:011d};sim" for i in range(5)]
+    linhas[3] = "Jo\xe3o;S;Obra;00000000003;sim"  # Latin-1, depois do primeiro lote
+    arquivo = io.BytesIO("Nome;Sobrenome;Setor;CPF;Ativo\n".encode() + "\n".join(linhas).encode('latin-1'))
+
+    relatorio = importar_colaboradores(ler_csv(arquivo), batch_size=2)
+
+    assert relatorio.criados == 4
+    assert relatorio.erros == [(5, importacao.ERRO_CODIFICACAO)]
+    with pytest.raises(ValueError, match='UTF-8'):
+        list(ler_csv(io.BytesIO("Nome;Situa\xe7\xe3o\n".encode('latin-1'))))
+
+
+@pytest.mark.django_db
+def test_import_writes_in_batches(django_assert_max_num_queries):
+    linhas = ((i + 2, {'nome': f'N{i}', 'sobrenome': 'S', 'setor': 'Obra', 'cpf': f'{i:011d}'}) for i in range(2500))
+    # 3 lotes: um SELECT por CPF e os INSERTs (o SQLite limita o nº de parâmetros por INSERT)
+    with django_assert_max_num_queries(50):
+        relatorio = importar_colaboradores(linhas, batch_size=1000)
+    assert relatorio.criados == 2500
+    assert Colaborador.objects.count() == 2500
+
+
+@pytest.mark.django_db
+def test_import_command(tmp_path, django_user_model):
+    django_user_model.objects.create_user(username='rh', email='rh@example.com', password='pass')
+    arquivo = tmp_path / 'colaboradores.csv'
+    arquivo.write_bytes(CSV)
+    out = io.StringIO()
+    call_command('import_colaboradores', str(arquivo), '--usuario', 'rh@example.com', stdout=out)
+    assert '2 criados, 0 atualizados, 2 erros' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_xlsx(django_user_model):
+    openpyxl = pytest.importorskip('openpyxl')
+    from epi_admin.importacao import ler_xlsx
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['nome', 'sobrenome', 'setor', 'cpf'])
+    sheet.append(['Ana', 'Lima', 'Obra', '22233344455'])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    relatorio = importar_colaboradores(ler_xlsx(buffer))
+    assert relatorio.criados == 1
+
+
+@pytest.mark.django_db
+def test_import_view_sets_created_by(admin_client, admin_user):
+    upload = SimpleUploadedFile('colaboradores.csv', CSV, content_type='text/csv')
+    response = admin_client.post(reverse('colaborador_import'), {'arquivo': upload})
+    assert response.status_code == 200
+    assert response.context['relatorio'].criados == 2
+    assert set(Colaborador.objects.values_list('created_by', flat=True)) == {admin_user.pk}
@@ -0,0 +1,51 @@
+import pytest
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+
+from epi_admin.auth_backends import EmailBackend
+
+
+@pytest.fixture(autouse=True)
+def hasher_rapido(settings):
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@pytest.mark.django_db
+def test_login_is_case_insensitive(django_user_model):
+    user = django_user_model.objects.create_user(username='ana', email='Ana@Example.com', password='p')
+
+    assert EmailBackend().authenticate(None, username='  ana@EXAMPLE.com ', password='p') == user
+    assert EmailBackend().authenticate(None, username='ana@example.com', password='errada') is None
+
+
+@pytest.mark.django_db
+def test_email_is_unique_ignoring_case_but_blank_is_allowed(django_user_model):
+    django_user_model.objects.create_user(username='a', email='a@example.com')
+    django_user_model.objects.create_user(username='b', email='')
+    django_user_model.objects.create_user(username='c', email='')
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        django_user_model.objects.create_user(username='d', email='A@Example.COM')
+
+
+@pytest.mark.django_db
+def test_negative_cache_skips_database_for_unknown_email(settings, django_user_model, django_assert_num_queries):
+    settings.EPI_LOGIN_NEGATIVE_CACHE_TIMEOUT = 30
+    backend = EmailBackend()
+    assert backend.authenticate(None, username='novo@example.com', password='p') is None
+
+    with django_assert_num_queries(0):
+        assert backend.authenticate(None, username='NOVO@example.com', password='p') is None
+
+    # criar o usuário tira o email do cache negativo
+    user = django_user_model.objects.create_user(username='novo', email='novo@example.com', password='p')
+    assert backend.authenticate(None, username='novo@example.com', password='p') == user
+
+
+@pytest.mark.django_db
+def test_benchmark_login_rolls_back_synthetic_users(django_user_model, capsys):
+    call_command('benchmark_login', usuarios=[30, 60], consultas=10, logins=2)
+
+    saida = capsys.readouterr().out
+    assert '30 users' in saida and '60 users' in saida
+    assert not django_user_model.objects.filter(username__startswith='bench').exists()
@@ -0,0 +1,63 @@
+import json
+import re
+
+import pytest
+from django.http import HttpResponse
+from django.urls import reverse
+
+from epi_admin.middleware import InstrumentacaoMiddleware
+from epi_admin.models import Colaborador
+
+
+@pytest.fixture
+def instrumentado(settings):
+    settings.EPI_INSTRUMENTACAO = True
+    settings.EPI_INSTRUMENTACAO_LIMITE_MS = 60_000
+    return settings
+
+
+def _metricas(response):
+    return {
+        m.group(1): (float(m.group(2)), m.group(3))
+        for m in re.finditer(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response['Server-Timing'])
+    }
+
+
+@pytest.mark.django_db
+def test_server_timing_header(instrumentado, admin_client):
+    response = admin_client.get(reverse('colaborador_list'))
+
+    metricas = _metricas(response)
+    assert set(metricas) == {'db', 'view', 'tpl', 'total'}
+    assert re.fullmatch(r'\d+ consultas', metricas['db'][1]) and metricas['db'][1] != '0 consultas'
+    assert metricas['tpl'][0] > 0
+    assert metricas['total'][0] >= metricas['view'][0]
+
+
+@pytest.mark.django_db
+def test_disabled_by_default(settings, admin_client):
+    settings.EPI_INSTRUMENTACAO = False
+
+    assert 'Server-Timing' not in admin_client.get(reverse('colaborador_list'))
+
+
+@pytest.mark.django_db
+def test_slow_request_log_lists_repeated_sql(instrumentado, rf, caplog):
+    instrumentado.EPI_INSTRUMENTACAO_LIMITE_MS = 0
+    colaboradores = [Colaborador.objects.create(nome=str(i), sobrenome='B', setor='TI', cpf=str(i)) for i in range(3)]
+
+    def view_n_mais_1(request):
+        # uma consulta por colaborador: o padrão que o log deve destacar
+        for colaborador in colaboradores:
+            Colaborador.objects.get(pk=colaborador.pk)
+        return HttpResponse('ok')
+
+    with caplog.at_level('WARNING', logger='epi_admin.performance'):
+        response = InstrumentacaoMiddleware(view_n_mais_1)(rf.get('/lenta/'))
+
+    assert _metricas(response)['db'][1] == '3 consultas'
+    registro = next(r for r in caplog.records if r.name == 'epi_admin.performance')
+    dados = json.loads(registro.getMessage().split(' ', 1)[1])
+    assert dados['caminho'] == '/lenta/' and dados['status'] == 200 and dados['consultas'] == 3
+    assert [item['vezes'] for item in dados['sql_repetido']] == [3]
+    assert 'epi_admin_colaborador' in dados['sql_repetido'][0]['sql']
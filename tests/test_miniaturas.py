@@ -0,0 +1,101 @@
+import io
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+
+from epi_admin import miniaturas, tarefas
+from epi_admin.models import Colaborador, Tarefa
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def _foto(nome='foto.png', tamanho=(1200, 800), modo='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(modo, tamanho, (200, 30, 30, 128) if modo == 'RGBA' else (200, 30, 30)).save(buffer, format='PNG')
+    return SimpleUploadedFile(nome, buffer.getvalue(), content_type='image/png')
+
+
+def _colaborador_com_foto():
+    return Colaborador.objects.create(
+        nome='Ana', sobrenome='Silva', setor='TI', cpf='12345678901', fotoColaborador=_foto(),
+    )
+
+
+def test_nome_permitido():
+    assert miniaturas.nome_permitido('static/fotos_epi/luva.jpg')
+    assert not miniaturas.nome_permitido('static/fotos_epi/../../settings.py')
+    assert not miniaturas.nome_permitido('outro/luva.jpg')
+    assert not miniaturas.nome_permitido('static/fotos_epi/luva.jpg.256px.jpg')
+
+
+def test_fotos_com_mesmo_nome_e_extensoes_diferentes_tem_miniaturas_diferentes():
+    png = miniaturas.nome_miniatura('static/fotos_epi/foto.png', 256)
+    jpg = miniaturas.nome_miniatura('static/fotos_epi/foto.jpg', 256)
+    assert png == 'static/fotos_epi/foto.png.256px.jpg' and png != jpg
+
+
+@pytest.mark.django_db
+def test_gerar_cria_miniaturas_jpeg_ao_lado_do_original():
+    colaborador = _colaborador_com_foto()
+    nome = colaborador.fotoColaborador.name
+
+    gerados = miniaturas.gerar(nome)
+
+    assert gerados == [miniaturas.nome_miniatura(nome, t) for t in miniaturas.TAMANHOS]
+    for tamanho, gerado in zip(miniaturas.TAMANHOS, gerados):
+        with default_storage.open(gerado) as arquivo, Image.open(arquivo) as imagem:
+            assert imagem.format == 'JPEG' and imagem.mode == 'RGB'
+            assert max(imagem.size) == tamanho
+
+
+@pytest.mark.django_db
+def test_upload_enfileira_a_geracao():
+    colaborador = _colaborador_com_foto()
+    nome = colaborador.fotoColaborador.name
+
+    tarefa = Tarefa.objects.get(tipo='miniaturas')
+    assert tarefa.argumentos == {'nome': nome}
+    assert not default_storage.exists(miniaturas.nome_miniatura(nome, 256))
+
+    assert tarefas.processar() == 1
+    tarefa.refresh_from_db()
+    assert tarefa.status == Tarefa.CONCLUIDA
+    assert default_storage.exists(miniaturas.nome_miniatura(nome, 256))
+
+
+@pytest.mark.django_db
+def test_miniatura_view_gera_sob_demanda_com_cache_longo(admin_client):
+    colaborador = _colaborador_com_foto()
+    url = miniaturas.url(colaborador.fotoColaborador, 256)
+
+    response = admin_client.get(url)
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'image/jpeg'
+    assert 'immutable' in response['Cache-Control']
+    assert default_storage.exists(miniaturas.nome_miniatura(colaborador.fotoColaborador.name, 256))
+    b''.join(response.streaming_content)
+
+
+@pytest.mark.django_db
+def test_miniatura_view_rejeita_tamanho_ou_caminho_invalidos(admin_client):
+    assert admin_client.get(reverse('miniatura', args=[100, 'static/fotos_epi/a.jpg'])).status_code == 404
+    assert admin_client.get(reverse('miniatura', args=[64, 'static/fotos_epi/a.jpg'])).status_code == 404
+    assert admin_client.get(reverse('miniatura', args=[256, 'static/fotos_epi/../x.jpg'])).status_code == 404
+    assert admin_client.get(reverse('miniatura', args=[256, 'static/fotos_epi/inexistente.jpg'])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_detalhe_usa_miniatura(admin_client):
+    colaborador = _colaborador_com_foto()
+
+    response = admin_client.get(reverse('colaborador_detail', args=[colaborador.pk]))
+
+    assert miniaturas.url(colaborador.fotoColaborador, 256) in response.content.decode()
@@ -0,0 +1,121 @@
+import io
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from epi_admin import provisionamento
+from epi_admin.forms import GerenteForm
+from epi_admin.models import Gerente
+
+
+def _gerentes(n, inicio=0):
+    return [Gerente.objects.create(nome='G', sobrenome=str(i), setor='X', cpf=f'{i:011d}',
+                                   email=f'Gerente{i}@Example.com') for i in range(inicio, inicio + n)]
+
+
+def _consultas(gerentes, **kwargs):
+    with CaptureQueriesContext(connection) as ctx:
+        provisionamento.sincronizar(gerentes, **kwargs)
+    return len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_sincronizar_cria_vincula_e_agrupa(django_user_model):
+    novo, existente, vinculado = _gerentes(3)
+    user_existente = django_user_model.objects.create_user(username='existente', email='gerente1@example.com')
+    vinculado.user = django_user_model.objects.create_user(username='vinculado', email='antigo@example.com')
+    vinculado.save()
+
+    relatorio = provisionamento.sincronizar([novo, existente, vinculado])
+
+    assert (len(relatorio.criados), relatorio.vinculados, relatorio.emails_atualizados,
+            relatorio.adicionados_ao_grupo) == (1, 1, 1, 3)
+    novo.refresh_from_db()
+    assert novo.user.username == 'Gerente0@Example.com' and novo.user.is_staff
+    assert not novo.user.has_usable_password()
+    assert Gerente.objects.get(pk=existente.pk).user_id == user_existente.pk
+    assert django_user_model.objects.get(username='vinculado').email == 'Gerente2@Example.com'
+    grupo = Group.objects.get(name=provisionamento.GRUPO_GERENTES)
+    assert set(grupo.user_set.values_list('pk', flat=True)) == {novo.user_id, user_existente.pk, vinculado.user_id}
+
+    # idempotente
+    relatorio = provisionamento.sincronizar(Gerente.objects.all())
+    assert str(relatorio) == ('0 usuários criados, 0 vinculados, 0 emails atualizados, '
+                              '0 adicionados ao grupo, 0 sem usuário, 0 conflitos')
+
+
+@pytest.mark.django_db
+def test_sincronizar_reporta_conflitos_e_sem_usuario(django_user_model):
+    dono, disputado, sem_usuario, username_ocupado = _gerentes(4)
+    user = django_user_model.objects.create_user(username='dono', email='gerente1@example.com')
+    dono.user = user
+    dono.save()
+    django_user_model.objects.create_user(username='gerente3@example.com', email='outro@example.com')
+
+    relatorio = provisionamento.sincronizar([disputado, sem_usuario, username_ocupado], criar_usuarios=False)
+
+    assert [g for g, _ in relatorio.conflitos] == [disputado, username_ocupado]
+    assert relatorio.sem_usuario == [sem_usuario]
+    assert not Gerente.objects.filter(pk__in=[disputado.pk, sem_usuario.pk, username_ocupado.pk], user__isnull=False).exists()
+
+
+@pytest.mark.django_db
+def test_sincronizar_usa_numero_fixo_de_consultas(django_user_model):
+    poucos = _gerentes(5)
+    dezenas = _gerentes(50, inicio=5)
+    muitos = _gerentes(500, inicio=55)
+    # metade dos usuários já existe, sem vínculo
+    for gerente in poucos[::2] + dezenas[::2] + muitos[::2]:
+        django_user_model.objects.create_user(username=f'u{gerente.pk}', email=gerente.email.lower())
+
+    assert _consultas(poucos) == _consultas(dezenas) == 6
+    # 500 gerentes: os bulk_* passam a se dividir em lotes (limite de parâmetros do SQLite)
+    assert _consultas(muitos) <= 11
+    # reexecutar (tudo já sincronizado) não depende do tamanho
+    assert _consultas(poucos) == _consultas(muitos) == 3
+
+
+@pytest.mark.django_db
+def test_sync_gerentes_dry_run_nao_grava(django_user_model):
+    _gerentes(2)
+    saida = io.StringIO()
+    call_command('sync_gerentes', '--dry-run', stdout=saida)
+    assert 'sync_gerentes dry run: 2 usuários criados' in saida.getvalue()
+    assert not django_user_model.objects.exists()
+
+    call_command('sync_gerentes', stdout=saida)
+    assert django_user_model.objects.count() == 2
+    assert not Gerente.objects.filter(user__isnull=True).exists()
+
+
+@pytest.mark.django_db
+def test_gerente_create_view_cria_usuario(client, django_user_model):
+    client.force_login(django_user_model.objects.create_superuser('admin', 'admin@example.com', 'x'))
+    response = client.post(reverse('gerente_create'), {
+        'nome': 'Nova', 'sobrenome': 'Gerente', 'email': 'nova@example.com', 'setor': 'Obra', 'cpf': '12345678900',
+    }, follow=True)
+    gerente = Gerente.objects.get(email='nova@example.com')
+    assert gerente.user.username == 'nova@example.com'
+    assert gerente.user.groups.filter(name=provisionamento.GRUPO_GERENTES).exists()
+    assert 'defina a senha via Admin' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_clean_email_em_uma_consulta(django_user_model, django_assert_num_queries):
+    gerente, outro = _gerentes(2)
+    outro.user = django_user_model.objects.create_user(username='outro', email='vinculado@example.com')
+    outro.save()
+    dados = {'nome': 'N', 'sobrenome': 'S', 'setor': 'X', 'cpf': '1'}
+
+    with django_assert_num_queries(1):
+        form = GerenteForm(data={**dados, 'email': 'GERENTE1@example.com'}, instance=gerente)
+        form.full_clean()
+    assert form.errors['email'] == ['Já existe um gerente com este email.']
+
+    form = GerenteForm(data={**dados, 'email': 'Vinculado@example.com'}, instance=gerente)
+    assert form.errors['email'] == ['Esse email já está vinculado a outro gerente.']
+    assert GerenteForm(data={**dados, 'email': 'gerente0@example.com'}, instance=gerente).is_valid()
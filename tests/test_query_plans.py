@@ -0,0 +1,71 @@
+"""Garante que as consultas quentes usam índice (EXPLAIN QUERY PLAN do SQLite).
+
+Cada consulta abaixo falha o teste se o plano tiver um ``SCAN`` da tabela sem
+índice, ou seja, uma leitura completa da tabela.
+"""
+import re
+from datetime import date
+
+import pytest
+from django.db import connection
+from django.db.models.functions import Lower
+
+from epi_admin import busca, contadores
+from epi_admin.auth_backends import usuarios_por_email
+from epi_admin.models import Colaborador, EPI, Emprestimo, Gerente
+
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != 'sqlite', reason='EXPLAIN QUERY PLAN é específico do SQLite'),
+]
+
+FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+
+
+def query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def assert_uses_index(queryset):
+    plan = query_plan(queryset)
+    scans = [linha for linha in plan if FULL_SCAN.match(linha.strip())]
+    assert not scans, f'consulta faz leitura completa da tabela: {plan}'
+
+
+HOJE = date(2026, 3, 1)
+
+QUERIES = {
+    'busca_colaboradores': lambda: busca.filtrar(Colaborador.objects.order_by('pk'), 'joão sil'),
+    'busca_emprestimos': lambda: busca.filtrar(Emprestimo.objects.order_by('-pk'), 'joão capacete'),
+    'colaborador_por_cpf': lambda: Colaborador.objects.filter(cpf='12345678900'),
+    'colaboradores_ativos': lambda: Colaborador.objects.filter(is_ativo=True).order_by('nome', 'sobrenome'),
+    'colaboradores_por_dono': lambda: Colaborador.objects.filter(created_by_id=1),
+    'colaboradores_por_abertos': lambda: Colaborador.objects.order_by('-emprestimos_abertos', '-pk')[:11],
+    'colaboradores_com_atraso': lambda: Colaborador.objects.filter(prevista_mais_antiga__lt=HOJE),
+    'atrasados_do_colaborador': lambda: Emprestimo.objects.filter(
+        colaborador_id=1, data_devolucao__isnull=True, data_prevista__lt=HOJE,
+    ),
+    'contadores_do_epi': lambda: EPI.objects.filter(pk=1).annotate(mais_antiga=contadores._mais_antiga('epi_nome')),
+    'emprestimos_abertos': lambda: Emprestimo.objects.filter(data_devolucao__isnull=True).order_by('data_prevista'),
+    'emprestimos_atrasados': lambda: Emprestimo.objects.filter(data_devolucao__isnull=True, data_prevista__lt=HOJE),
+    'emprestimos_por_periodo': lambda: Emprestimo.objects.filter(data_emprestimo__gte=HOJE),
+    'epis_por_total': lambda: EPI.objects.order_by('-emprestimos_total', '-pk')[:11],
+    'epis_disponiveis_por_nome': lambda: EPI.objects.filter(quantidade__gt=0).order_by('nomeAparelho', 'pk'),
+    'epis_vencendo': lambda: EPI.objects.filter(validade__lte=HOJE),
+    'gerente_por_email': lambda: Gerente.objects.alias(e=Lower('email')).filter(e='a@example.com'),
+    'usuario_por_email': lambda: usuarios_por_email('A@example.com'),
+}
+
+
+@pytest.mark.parametrize('nome', sorted(QUERIES))
+def test_hot_query_uses_an_index(nome):
+    assert_uses_index(QUERIES[nome]())
+
+
+def test_detector_flags_unindexed_query():
+    plan = query_plan(Colaborador.objects.filter(sobrenome='Silva'))
+    assert any(FULL_SCAN.match(linha.strip()) for linha in plan)
@@ -0,0 +1,128 @@
+import io
+from datetime import date
+
+import pytest
+from django.urls import reverse
+
+from epi_admin import estoque, resumo
+from epi_admin.importacao import importar_colaboradores
+from epi_admin.models import Colaborador, EPI, Emprestimo, ResumoEmprestimo
+
+
+def _snapshot():
+    return {
+        (r.setor, r.epi_id, r.data): (r.abertos, r.devolvidos)
+        for r in ResumoEmprestimo.objects.all()
+        if r.abertos or r.devolvidos
+    }
+
+
+def assert_resumo_consistente():
+    incremental = _snapshot()
+    # reconstruir a partir de uma data antiga inclui todas as devoluções
+    resumo.reconstruir(date(2000, 1, 1))
+    assert incremental == _snapshot()
+
+
+@pytest.fixture
+def cenario():
+    obra = Colaborador.objects.create(nome='João', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    ti = Colaborador.objects.create(nome='Ana', sobrenome='Lima', setor='TI', cpf='98765432100')
+    capacete = EPI.objects.create(nomeAparelho='Capacete', categoria='Cabeça', quantidade=50, validade='2030-12-31')
+    luva = EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=50, validade='2030-12-31')
+    return obra, ti, capacete, luva
+
+
+def _devolver(emprestimo, dia, condicao='BOA'):
+    emprestimo = Emprestimo.objects.get(pk=emprestimo.pk)
+    emprestimo.data_devolucao = dia
+    emprestimo.condicao_devolucao = condicao
+    emprestimo.save()
+    return emprestimo
+
+
+@pytest.mark.django_db
+def test_resumo_follows_loan_lifecycle(cenario):
+    obra, ti, capacete, luva = cenario
+    e1 = Emprestimo.objects.create(colaborador=obra, epi_nome=capacete, data_emprestimo=date(2026, 3, 1))
+    e2 = Emprestimo.objects.create(colaborador=obra, epi_nome=capacete, data_emprestimo=date(2026, 3, 1))
+    e3 = Emprestimo.objects.create(colaborador=ti, epi_nome=luva, data_emprestimo=date(2026, 3, 2),
+                                   data_prevista=date(2026, 3, 20))
+    assert _snapshot() == {
+        ('Obra', capacete.pk, date(2026, 3, 8)): (2, 0),
+        ('TI', luva.pk, date(2026, 3, 20)): (1, 0),
+    }
+    assert_resumo_consistente()
+
+    _devolver(e1, date(2026, 3, 5))
+    assert _snapshot()[('Obra', capacete.pk, date(2026, 3, 5))] == (0, 1)
+    assert_resumo_consistente()
+
+    # edição que muda a data prevista move o empréstimo de bucket
+    e3 = Emprestimo.objects.get(pk=e3.pk)
+    e3.data_prevista = date(2026, 3, 25)
+    e3.save()
+    assert_resumo_consistente()
+
+    Emprestimo.objects.get(pk=e2.pk).delete()
+    assert_resumo_consistente()
+
+    # troca de setor do colaborador move as contagens
+    ti = Colaborador.objects.get(pk=ti.pk)
+    ti.setor = 'Manutenção'
+    ti.save()
+    assert ('Manutenção', luva.pk, date(2026, 3, 25)) in _snapshot()
+    assert_resumo_consistente()
+
+    # apagar o colaborador apaga (em cascata) os empréstimos e as contagens
+    ti.delete()
+    assert_resumo_consistente()
+
+
+@pytest.mark.django_db
+def test_devolucao_registrada_por_dois_objetos_lidos_antes_conta_uma_vez(cenario):
+    obra, ti, capacete, luva = cenario
+    emprestimo = Emprestimo.objects.create(colaborador=obra, epi_nome=capacete, data_emprestimo=date(2026, 3, 1))
+    primeiro = Emprestimo.objects.get(pk=emprestimo.pk)
+    segundo = Emprestimo.objects.get(pk=emprestimo.pk)
+
+    primeiro.data_devolucao, primeiro.condicao_devolucao = date(2026, 3, 5), 'BOA'
+    primeiro.save()
+    # o segundo perde a devolução, mas grava a sua data: o devolvido muda de dia
+    segundo.data_devolucao, segundo.condicao_devolucao = date(2026, 3, 6), 'BOA'
+    segundo.save()
+
+    assert _snapshot() == {('Obra', capacete.pk, date(2026, 3, 6)): (0, 1)}
+    assert_resumo_consistente()
+
+
+@pytest.mark.django_db
+def test_resumo_covers_bulk_paths(cenario):
+    obra, ti, capacete, luva = cenario
+    estoque.emprestar_kit([obra, ti], [capacete, luva], date(2026, 3, 1))
+    assert _snapshot()[('Obra', luva.pk, date(2026, 3, 8))] == (1, 0)
+    assert_resumo_consistente()
+
+    csv = f"nome,sobrenome,setor,cpf\nJoão,Silva,Elétrica,{obra.cpf}\n".encode()
+    from epi_admin.importacao import ler_csv
+    importar_colaboradores(ler_csv(io.BytesIO(csv)))
+    assert ('Elétrica', luva.pk, date(2026, 3, 8)) in _snapshot()
+    assert_resumo_consistente()
+
+
+@pytest.mark.django_db
+def test_painel_reads_summary_in_constant_queries(client, django_user_model, cenario, django_assert_max_num_queries):
+    obra, ti, capacete, luva = cenario
+    hoje = date.today()
+    Emprestimo.objects.create(colaborador=obra, epi_nome=capacete, data_emprestimo=date(2020, 1, 1))
+    for _ in range(3):
+        Emprestimo.objects.create(colaborador=ti, epi_nome=luva, data_emprestimo=hoje)
+    client.force_login(django_user_model.objects.create_user(username='u', email='u@example.com', password='p'))
+    client.get(reverse('painel_atrasos'))  # carrega o usuário da sessão (e permissões) no cache
+
+    with django_assert_max_num_queries(4):
+        response = client.get(reverse('painel_atrasos'))
+    assert response.status_code == 200
+    por_setor = {t['nome']: t for t in response.context['por_setor']}
+    assert por_setor['Obra']['atrasados'] == 1
+    assert por_setor['TI']['abertos'] == 3 and por_setor['TI']['atrasados'] == 0
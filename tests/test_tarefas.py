@@ -0,0 +1,151 @@
+import io
+from datetime import date, timedelta
+
+import pytest
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from epi_admin import tarefas
+from epi_admin.models import Colaborador, EPI, Emprestimo, Gerente, Tarefa
+
+
+FALHAS = []
+
+
+def falhar(vezes):
+    """Tarefa de teste: falha nas primeiras ``vezes`` execuções."""
+    FALHAS.append(1)
+    if len(FALHAS) <= vezes:
+        raise RuntimeError(f'falha {len(FALHAS)}')
+    return len(FALHAS)
+
+
+@pytest.fixture
+def tipo_teste(monkeypatch):
+    FALHAS.clear()
+    monkeypatch.setitem(tarefas.TIPOS, 'teste', tarefas.TipoTarefa('tests.test_tarefas.falhar', max_tentativas=3))
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_falha_volta_para_a_fila_com_espera_ate_esgotar(tipo_teste, settings):
+    settings.EPI_TAREFAS_ESPERA = 10
+    tarefa = tarefas.enfileirar('teste', {'vezes': 5})
+
+    assert tarefas.processar() == 1
+    tarefa.refresh_from_db()
+    assert tarefa.status == Tarefa.PENDENTE and tarefa.tentativas == 1
+    assert 'RuntimeError: falha 1' in tarefa.ultima_linha_do_erro()
+    espera = tarefa.executar_em - timezone.now()
+    assert timedelta(seconds=8) < espera <= timedelta(seconds=10)
+    assert tarefas.processar() == 0  # ainda esperando
+
+    for _ in range(2):
+        Tarefa.objects.filter(pk=tarefa.pk).update(executar_em=timezone.now())
+        assert tarefas.processar() == 1
+    tarefa.refresh_from_db()
+    assert tarefa.status == Tarefa.FALHOU and tarefa.tentativas == 3
+    assert 'falha 3' in tarefa.erro
+    assert tarefas.espera(2) == 20 and tarefas.espera(20) == settings.EPI_TAREFAS_ESPERA_MAXIMA
+
+
+@pytest.mark.django_db
+def test_sucesso_depois_de_uma_falha_grava_o_resultado(tipo_teste):
+    tarefa = tarefas.enfileirar('teste', {'vezes': 1})
+    tarefas.processar()
+    Tarefa.objects.filter(pk=tarefa.pk).update(executar_em=timezone.now())
+    tarefas.processar()
+    tarefa.refresh_from_db()
+    assert (tarefa.status, tarefa.resultado, tarefa.erro, tarefa.tentativas) == (Tarefa.CONCLUIDA, 2, '', 2)
+
+    with pytest.raises(ValueError):
+        tarefas.enfileirar('inexistente')
+
+
+@pytest.mark.django_db
+def test_reivindicar_respeita_ordem_status_e_limite_de_concorrencia(tipo_teste, django_assert_max_num_queries):
+    Tarefa.objects.create(tipo='resumo', status=Tarefa.EXECUTANDO, trabalhador='outro')
+    resumo = tarefas.enfileirar('resumo')
+    futura = tarefas.enfileirar('teste', {'vezes': 0}, executar_em=timezone.now() + timedelta(hours=1))
+    primeira = tarefas.enfileirar('teste', {'vezes': 0})
+    segunda = tarefas.enfileirar('teste', {'vezes': 0})
+
+    # a contagem, a fila, o UPDATE condicional e a leitura (+ SAVEPOINT/RELEASE dentro do teste)
+    with django_assert_max_num_queries(6):
+        assert tarefas.reivindicar('w1').pk == primeira.pk
+    assert tarefas.reivindicar('w2').pk == segunda.pk
+    # 'resumo' tem concorrencia=1 e já há uma rodando; a futura ainda não venceu
+    assert tarefas.reivindicar('w3') is None
+    assert Tarefa.objects.get(pk=resumo.pk).status == Tarefa.PENDENTE
+    assert Tarefa.objects.get(pk=futura.pk).status == Tarefa.PENDENTE
+    assert Tarefa.objects.get(pk=primeira.pk).trabalhador == 'w1'
+
+
+@pytest.mark.django_db
+def test_tarefa_de_worker_morto_volta_e_o_resultado_atrasado_e_ignorado(tipo_teste, settings):
+    tarefa = tarefas.enfileirar('teste', {'vezes': 0})
+    antiga = tarefas.reivindicar('morto')
+    Tarefa.objects.filter(pk=tarefa.pk).update(iniciada_em=timezone.now() - timedelta(seconds=settings.EPI_TAREFAS_TIMEOUT + 1))
+
+    assert tarefas.recuperar_expiradas() == 1
+    assert tarefas.reivindicar('vivo').tentativas == 2
+    tarefas.executar(antiga)  # o worker "morto" termina depois
+    tarefa.refresh_from_db()
+    assert (tarefa.status, tarefa.trabalhador) == (Tarefa.EXECUTANDO, 'vivo')
+
+
+@pytest.mark.django_db
+def test_exportacao_em_segundo_plano(client, django_user_model, media_root):
+    colaborador = Colaborador.objects.create(nome='Ana', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    luva = EPI.objects.create(nomeAparelho='Luva', categoria='Mãos', quantidade=5, validade='2030-12-31')
+    Emprestimo.objects.create(colaborador=colaborador, epi_nome=luva, data_emprestimo=date(2025, 1, 2))
+    admin = django_user_model.objects.create_superuser('admin', 'admin@example.com', 'x')
+    client.force_login(admin)
+
+    response = client.get(reverse('emprestimo_export'), {'segundo_plano': '1', 'data_inicio': '2025-01-01'})
+    assert response.status_code == 302 and response['Location'] == reverse('tarefa_list')
+    tarefa = Tarefa.objects.get(tipo='exportacao')
+    assert tarefa.created_by == admin and tarefa.argumentos['filtros']['data_inicio'] == '2025-01-01'
+    html = client.get(reverse('tarefa_list')).content.decode()
+    assert 'Exportação enfileirada' in html
+    assert '<td>exportacao</td>' in html  # contagens da fila (superuser)
+
+    tarefas.processar()
+    tarefa.refresh_from_db()
+    assert tarefa.status == Tarefa.CONCLUIDA and default_storage.exists(tarefa.resultado['arquivo'])
+    html = client.get(reverse('tarefa_list')).content.decode()
+    assert reverse('tarefa_arquivo', args=[tarefa.pk]) in html
+
+    response = client.get(reverse('tarefa_arquivo', args=[tarefa.pk]))
+    csv = b''.join(response.streaming_content).decode('utf-8-sig')
+    assert 'attachment' in response['Content-Disposition']
+    assert 'Ana Silva' in csv and 'Luva' in csv
+
+    # só quem pediu baixa; os outros nem veem a tarefa
+    client.force_login(django_user_model.objects.create_user('outro', 'outro@example.com', 'x'))
+    assert client.get(reverse('tarefa_arquivo', args=[tarefa.pk])).status_code == 404
+    assert f'<td>{tarefa.pk}</td>' not in client.get(reverse('tarefa_list')).content.decode()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_worker_envia_os_alertas_enfileirados():
+    Gerente.objects.create(email='obra@example.com', nome='Gil', sobrenome='Obra', setor='Obra', cpf='1')
+    EPI.objects.create(nomeAparelho='Capacete', categoria='C', quantidade=5, validade=date.today())
+    call_command('verificar_validade', '--enfileirar', '--dias', '10', stdout=io.StringIO())
+    call_command('rebuild_resumo_emprestimos', '--enfileirar', stdout=io.StringIO())
+    assert not mail.outbox
+
+    out = io.StringIO()
+    call_command('run_worker', '--once', '--threads', '2', stdout=out)
+
+    assert 'run_worker finished: 2 task(s) run.' in out.getvalue()
+    assert [m.to for m in mail.outbox] == [['obra@example.com']]
+    assert set(Tarefa.objects.values_list('status', flat=True)) == {Tarefa.CONCLUIDA}
@@ -0,0 +1,61 @@
+import io
+from datetime import date, timedelta
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+
+from epi_admin.models import Colaborador, EPI, Emprestimo, Gerente
+from epi_admin.validade import coletar_alertas
+
+
+HOJE = date(2026, 3, 1)
+
+
+@pytest.fixture
+def cenario():
+    obra = Gerente.objects.create(email='obra@example.com', nome='Gil', sobrenome='Obra', setor='Obra', cpf='1')
+    almox = Gerente.objects.create(email='almox@example.com', nome='Ana', sobrenome='Almox', setor='Almoxarifado', cpf='2')
+    joao = Colaborador.objects.create(nome='João', sobrenome='Silva', setor='Obra', cpf='12345678900')
+    vencido = EPI.objects.create(nomeAparelho='Capacete', categoria='C', quantidade=5, validade=HOJE - timedelta(days=1))
+    vencendo = EPI.objects.create(nomeAparelho='Luva', categoria='M', quantidade=1, validade=HOJE + timedelta(days=10))
+    EPI.objects.create(nomeAparelho='Bota', categoria='P', quantidade=5, validade=HOJE + timedelta(days=365))
+    # a única luva está emprestada: aparece só na lista de empréstimos
+    Emprestimo.objects.create(colaborador=joao, epi_nome=vencendo, data_emprestimo=HOJE - timedelta(days=2))
+    return obra, almox, vencido, vencendo
+
+
+@pytest.mark.django_db
+def test_coletar_alertas_groups_by_gerente(cenario):
+    obra, almox, vencido, vencendo = cenario
+    alertas = coletar_alertas(HOJE, 30)
+
+    assert [e['epi'] for e in alertas[obra.email].emprestimos] == ['Luva']
+    assert not alertas[almox.email].emprestimos
+    # sem setor de estoque configurado, todo gerente recebe a lista de estoque
+    assert [e['epi'] for e in alertas[almox.email].estoque] == ['Capacete']
+    assert 'Bota' not in alertas[obra.email].corpo(HOJE)
+
+
+@pytest.mark.django_db
+def test_estoque_goes_to_configured_setor(cenario, settings):
+    settings.EPI_ALERTAS_ESTOQUE_SETOR = 'Almoxarifado'
+    obra, almox, _, _ = cenario
+    alertas = coletar_alertas(HOJE, 30)
+    assert not alertas[obra.email].estoque
+    assert alertas[almox.email].estoque
+
+
+@pytest.mark.django_db
+def test_command_sends_one_message_per_gerente(cenario):
+    call_command('verificar_validade', '--dias', '3650', stdout=io.StringIO())
+    destinatarios = sorted(m.to[0] for m in mail.outbox)
+    assert destinatarios == ['almox@example.com', 'obra@example.com']
+
+
+@pytest.mark.django_db
+def test_command_dry_run_sends_nothing(cenario):
+    out = io.StringIO()
+    call_command('verificar_validade', '--dias', '3650', '--dry-run', stdout=out)
+    assert not mail.outbox
+    assert 'obra@example.com' in out.getvalue()
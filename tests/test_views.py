@@ -0,0 +1,138 @@
+import pytest
+from django.urls import reverse
+
+from epi_admin.models import Colaborador, EPI
+from epi_admin.pagination import decode_cursor, encode_cursor, paginate_keyset
+
+
+@pytest.fixture
+def superuser_client(client, django_user_model):
+    user = django_user_model.objects.create_superuser(username='admin', email='admin@example.com', password='pass')
+    client.force_login(user)
+    client.user = user
+    return client
+
+
+def _criar_colaboradores(n):
+    return Colaborador.objects.bulk_create(
+        Colaborador(nome=f'Col{i}', sobrenome='Teste', setor='TI', cpf=f'{i:011d}') for i in range(n)
+    )
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor('n', [3, 42])
+    assert decode_cursor(cursor) == ('n', [3, 42])
+    with pytest.raises(ValueError):
+        decode_cursor('nao-e-um-cursor')
+    # valores que não são escalares ou em número diferente do da ordenação
+    for valores in ([[1, 2]], [{'a': 1}], [2 ** 64], [1, 2]):
+        with pytest.raises(ValueError):
+            decode_cursor(encode_cursor('n', valores), 1)
+
+
+@pytest.mark.django_db
+def test_cursor_adulterado_responde_404(admin_client):
+    _criar_colaboradores(3)
+    for valores in ([[1]], [{'pk': 1}], ['abc']):
+        response = admin_client.get(reverse('colaborador_list'), {'cursor': encode_cursor('n', valores)})
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_paginate_keyset_walks_forward_and_back():
+    _criar_colaboradores(25)
+    qs = Colaborador.objects.all()
+
+    first = paginate_keyset(qs, ('pk',), 10)
+    assert not first.has_previous() and first.has_next()
+    second = paginate_keyset(qs, ('pk',), 10, first.next_cursor)
+    third = paginate_keyset(qs, ('pk',), 10, second.next_cursor)
+    assert len(third) == 5 and not third.has_next()
+
+    ids = [c.pk for page in (first, second, third) for c in page]
+    assert ids == list(qs.order_by('pk').values_list('pk', flat=True))
+
+    back = paginate_keyset(qs, ('pk',), 10, third.previous_cursor)
+    assert [c.pk for c in back] == [c.pk for c in second]
+
+
+@pytest.mark.django_db
+def test_paginate_keyset_composite_descending_ordering():
+    EPI.objects.bulk_create(
+        EPI(nomeAparelho=f'EPI{i}', categoria='C', quantidade=i % 3, validade='2030-01-01') for i in range(9)
+    )
+    ordering = ('-quantidade', 'pk')
+    qs = EPI.objects.all()
+    seen = []
+    cursor = None
+    while True:
+        page = paginate_keyset(qs, ordering, 4, cursor)
+        seen.extend(e.pk for e in page)
+        if not page.has_next():
+            break
+        cursor = page.next_cursor
+    assert seen == list(qs.order_by(*ordering).values_list('pk', flat=True))
+
+
+@pytest.mark.django_db
+def test_list_view_uses_cursor_without_count(superuser_client, django_assert_max_num_queries):
+    _criar_colaboradores(15)
+    url = reverse('colaborador_list')
+
+    response = superuser_client.get(url)
+    assert response.status_code == 200
+    page = response.context['page_obj']
+    assert len(page) == 10 and page.has_next()
+
+    with django_assert_max_num_queries(4) as captured:
+        response = superuser_client.get(url, {'cursor': page.next_cursor})
+    assert not any('COUNT(' in q['sql'] for q in captured.captured_queries)
+    assert len(response.context['colaboradores']) == 5
+
+
+@pytest.mark.django_db
+def test_list_view_rejects_invalid_cursor(superuser_client):
+    response = superuser_client.get(reverse('emprestimo_list'), {'cursor': 'lixo'})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_list_view_approximate_total(superuser_client):
+    _criar_colaboradores(12)
+    response = superuser_client.get(reverse('colaborador_list'), {'total': '1'})
+    assert response.context['page_obj'].approximate_total >= 12
+
+
+@pytest.mark.django_db
+def test_emprestimo_lote_view_creates_all_loans(superuser_client):
+    from epi_admin.models import Emprestimo
+
+    crew = _criar_colaboradores(3)
+    epis = EPI.objects.bulk_create(
+        EPI(nomeAparelho=nome, categoria='Kit', quantidade=5, validade='2030-12-31') for nome in ('Capacete', 'Luva')
+    )
+    response = superuser_client.post(reverse('emprestimo_lote'), {
+        'colaboradores': [c.pk for c in crew],
+        'epis': [e.pk for e in epis],
+        'data_emprestimo': '01/03/26',
+        'data_prevista': '08/03/26',
+        'condicao_retirada': 'BOA',
+    })
+    assert response.status_code == 302
+    assert Emprestimo.objects.count() == 6
+    assert set(EPI.objects.values_list('quantidade', flat=True)) == {2}
+
+
+@pytest.mark.django_db
+def test_emprestimo_lote_view_reports_missing_stock(superuser_client):
+    crew = _criar_colaboradores(3)
+    epi = EPI.objects.create(nomeAparelho='Luva', categoria='Kit', quantidade=1, validade='2030-12-31')
+    response = superuser_client.post(reverse('emprestimo_lote'), {
+        'colaboradores': [c.pk for c in crew],
+        'epis': [epi.pk],
+        'data_emprestimo': '01/03/26',
+        'data_prevista': '08/03/26',
+        'condicao_retirada': 'BOA',
+    })
+    assert response.status_code == 200
+    assert response.context['form'].non_field_errors()